@@ -0,0 +1,139 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from main import load_stage  # noqa: E402
+from lookup import Dictionary, build_index, index_path_for  # noqa: E402
+from synthetic import BALLA_ENTRIES, write_source  # noqa: E402
+
+MISS = "zzqx"  # A word no dictionary has
+MISS_RATE = 0.1  # Share of sampled words that are misses
+
+
+def percentiles(times):
+    """Return the median and 99th percentile of times in seconds, in microseconds."""
+    times = sorted(times)
+    return times[len(times) // 2] * 1e6, times[min(len(times) - 1, int(len(times) * 0.99))] * 1e6
+
+
+def prepare_source(scale, work_dir, seed=0):
+    """Generate a synthetic dictionary at the given scale and run 00 and 12 on it, returning the cleaned file."""
+    source = os.path.join(work_dir, "source.txt")
+    sanitized = os.path.join(work_dir, "00.sanitize.txt")
+    cleaned = os.path.join(work_dir, "12.clean-markup.txt")
+    write_source(source, int(BALLA_ENTRIES * scale), seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        load_stage("00.sanitize.py").remove_curly_braces_and_unwanted_lines(source, sanitized)
+        load_stage("12.clean-markup.py").process_dictionary_file(sanitized, cleaned)
+    return cleaned
+
+
+def time_process(source_path, word):
+    """Time a lookup from a new process, including the interpreter start and the imports."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT_DIR, "scripts", "lookup.py"), "--source", source_path, "lookup", word],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def measure(source_path, label, lookups=10000, seed=0):
+    """
+    Measure the index build, the cold start and the lookup latency of a Dictionary.
+    Args:
+        source_path (str): Intermediate file in either format.
+        label (str): Name of the measured dictionary in the results.
+        lookups (int): Number of timed lookups per measurement.
+        seed (int): Seed of the sampled words.
+    Returns:
+        dict: The results.
+    """
+    start = time.perf_counter()
+    keys = build_index(source_path, index_path_for(source_path))
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dictionary = Dictionary(source_path, cache_size=lookups)
+    opened = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    words = [
+        MISS if rng.random() < MISS_RATE else dictionary.keys[rng.randrange(dictionary.count)].decode("utf-8")
+        for _ in range(lookups)
+    ]
+    clock = time.perf_counter
+    result = {
+        "source": label,
+        "keys": keys,
+        "build_ms": round(build * 1e3, 1),
+        "open_us": round(opened * 1e6),
+        "process_ms": round(time_process(source_path, words[0]) * 1e3, 1),
+    }
+    # The first lookup pass fills the caches, the second is answered from them
+    for name, call in (("find", dictionary.find), ("lookup_cold", dictionary.lookup), ("lookup_warm", dictionary.lookup)):
+        times = []
+        for word in words:
+            start = clock()
+            call(word)
+            times.append(clock() - start)
+        median, p99 = percentiles(times)
+        result[f"{name}_median_us"] = round(median, 2)
+        result[f"{name}_p99_us"] = round(p99, 2)
+    dictionary.close()
+
+    print(f"\033[1;35m{label}: {keys} keys\033[0m")
+    print(f"  index built in {result['build_ms']} ms, opened in {result['open_us']} µs, "
+          f"one lookup from a new process in {result['process_ms']} ms")
+    for name in ("find", "lookup_cold", "lookup_warm"):
+        print(f"  {name:<12} median {result[f'{name}_median_us']:8.2f} µs, p99 {result[f'{name}_p99_us']:8.2f} µs")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cold start and latency of scripts/lookup.py.")
+    parser.add_argument(
+        "--scales", type=float, nargs="+", default=[1, 10],
+        help="sizes of synthetic dictionaries relative to Balla's 75k entries (default: 1 10)",
+    )
+    parser.add_argument("--source", help="measure this intermediate file instead, e.g. temp/12.clean-markup.txt")
+    parser.add_argument("--lookups", type=int, default=10000, metavar="N", help="timed lookups per measurement")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic dictionary and the sampled words")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    # Stage scripts use paths relative to the repository root
+    if args.source:
+        args.source = os.path.abspath(args.source)
+    os.chdir(ROOT_DIR)
+
+    results = []
+    if args.source:
+        results.append(measure(args.source, args.source, args.lookups, args.seed))
+    for scale in [] if args.source else args.scales:
+        work_dir = tempfile.mkdtemp(prefix="lookup-benchmark-")
+        try:
+            source_path = prepare_source(scale, work_dir, args.seed)
+            results.append(measure(source_path, f"{scale:g}x", args.lookups, args.seed))
+        finally:
+            shutil.rmtree(work_dir)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+            file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from main import load_stage  # noqa: E402
+from entries import read_entries  # noqa: E402
+from inflection_cache import CACHE_ENV as INFLECTION_CACHE_ENV  # noqa: E402
+from synthetic import BALLA_ENTRIES, write_source  # noqa: E402
+
+# Benchmarked functions in pipeline order: (stage, function, input files, output files).
+# Stages listed with a None function prepare inputs for later stages and are not timed.
+BENCHMARKS = [
+    ("00.sanitize.py", None, ["source.txt"], ["00.sanitize.txt"]),
+    ("01.crosslinks.py", "process_cross_links", ["00.sanitize.txt"], ["01.crosslinks.txt"]),
+    ("04.irregular-nouns.py", "process_file", ["01.crosslinks.txt"], ["nouns-irregular.csv"]),
+    ("05.filter-irregular-nouns.py", "process_file", ["01.crosslinks.txt"], ["05.filter-irregular-nouns.txt"]),
+    ("06.regular-nouns.py", "process_file", ["05.filter-irregular-nouns.txt", "nouns-irregular.csv"], ["nouns-regular.csv"]),
+    ("07.adjectives.py", "process_file", ["05.filter-irregular-nouns.txt"], ["adjectives.csv"]),
+    ("08.filter-irregular-verbs.py", "process_irregular_verbs", ["05.filter-irregular-nouns.txt"], ["08.filter-irregular-verbs.txt"]),
+    ("09.irregular-verbs.py", None, ["05.filter-irregular-nouns.txt"], ["verbs-irregular.csv"]),
+    ("10.regular-verbs.py", "process_file", ["05.filter-irregular-nouns.txt", "verbs-irregular.csv"], ["verbs-regular.csv"]),
+    ("12.clean-markup.py", "process_dictionary_file", ["08.filter-irregular-verbs.txt"], ["12.clean-markup.txt"]),
+    ("13.convert-to-xhtml.py", "convert_to_xhtml", ["12.clean-markup.txt"], ["xhtml"]),
+]
+
+# Functions that prepare the inputs of later benchmarks
+PREPARE = {
+    "00.sanitize.py": "remove_curly_braces_and_unwanted_lines",
+    "09.irregular-verbs.py": "process_irregular_verbs_to_csv",
+}
+
+
+def count_entries(path):
+    """Count the non-empty lines of a dictionary file."""
+    with open(path, "r", encoding="utf-8") as file:
+        return sum(1 for line in file if line.strip())
+
+
+def call_stage(module, function_name, paths):
+    """Call a stage function with its input and output paths, hiding what it prints."""
+    function = getattr(module, function_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if function_name == "convert_to_xhtml":
+            os.makedirs(paths[1], exist_ok=True)
+            function(read_entries(paths[0]), paths[1])
+        else:
+            function(*paths)
+
+
+def required_stages(stages):
+    """Return the stages to run: the selected ones and, transitively, the stages producing their inputs."""
+    producers = {output: script for script, _, _, outputs in BENCHMARKS for output in outputs}
+    inputs = {script: script_inputs for script, _, script_inputs, _ in BENCHMARKS}
+    pending = [
+        script for script, function_name, _, _ in BENCHMARKS
+        if function_name and (not stages or script[:2] in stages)
+    ]
+    required = set()
+    while pending:
+        script = pending.pop()
+        if script not in required:
+            required.add(script)
+            pending.extend(producers[name] for name in inputs[script] if name in producers)
+    return required
+
+
+def run_scale(scale, stages, work_dir, seed=0):
+    """
+    Generate a synthetic dictionary at the given scale and time every selected stage on it.
+    Args:
+        scale (float): Size relative to Balla.
+        stages (list): Stage prefixes to time, e.g. ["01", "12"]; all stages if empty.
+        work_dir (str): Directory for the generated input and stage outputs.
+        seed (int): Seed of the synthetic dictionary.
+    Returns:
+        list: One result dict per timed stage.
+    """
+    entries = int(BALLA_ENTRIES * scale)
+    write_source(os.path.join(work_dir, "source.txt"), entries, seed)
+    print(f"\033[1;35mScale {scale:g}x: {entries} entries\033[0m")
+
+    results = []
+    required = required_stages(stages)
+    missing = set()  # Outputs of stages that could not run
+    for script_name, function_name, inputs, outputs in BENCHMARKS:
+        if script_name not in required:
+            continue
+        name = function_name or PREPARE[script_name]
+        timed = function_name and (not stages or script_name[:2] in stages)
+        paths = [os.path.join(work_dir, path) for path in inputs + outputs]
+
+        if missing.intersection(inputs):
+            missing.update(outputs)
+            continue
+
+        try:
+            module = load_stage(script_name)
+            start = time.perf_counter()
+            call_stage(module, name, paths)
+            seconds = time.perf_counter() - start
+        except (ImportError, OSError) as e:
+            # Missing NLP libraries; spaCy raises OSError when its model is not installed
+            print(f"  {script_name:<30} skipped: {e}")
+            results.append({"scale": scale, "stage": script_name, "function": name, "skipped": str(e)})
+            missing.update(outputs)
+            continue
+
+        if not timed:
+            continue
+        input_entries = count_entries(paths[0])
+        result = {
+            "scale": scale,
+            "stage": script_name,
+            "function": name,
+            "entries": input_entries,
+            "seconds": round(seconds, 3),
+            "entries_per_second": round(input_entries / seconds) if seconds else None,
+        }
+        results.append(result)
+        print(f"  {script_name:<30} {name:<26} {seconds:9.3f} s {result['entries_per_second']:>12,} entries/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every stage on synthetic dictionaries of growing size.")
+    parser.add_argument(
+        "--scales", type=float, nargs="+", default=[1, 10, 100],
+        help="sizes relative to Balla's 75k entries (default: 1 10 100)",
+    )
+    parser.add_argument("--stages", nargs="+", default=[], help="stage prefixes to time, e.g. 01 12 (default: all)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic dictionary (default: 0)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    parser.add_argument(
+        "--inflection-cache", action="store_true",
+        help="let 06, 07 and 10 use the persistent inflection cache (default: time the NLP libraries)",
+    )
+    args = parser.parse_args()
+    if not args.inflection_cache:
+        os.environ[INFLECTION_CACHE_ENV] = ""
+
+    # Stage scripts use paths relative to the repository root
+    os.chdir(ROOT_DIR)
+
+    results = []
+    for scale in args.scales:
+        work_dir = tempfile.mkdtemp(prefix="dictionary-benchmark-")
+        try:
+            results.extend(run_scale(scale, args.stages, work_dir, args.seed))
+        finally:
+            shutil.rmtree(work_dir)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+            file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import os
+import random
+import zipfile
+
+# Size of the Balla dictionary in articles, the 1x scale of the benchmarks
+BALLA_ENTRIES = 75000
+
+# Name of the dictionary inside src/eng-ukr_Balla_v1.3.zip
+BALLA_MEMBER = "eng-ukr_Balla_v1.3.txt"
+
+CONSONANTS = "bcdfghklmnprstvw"
+VOWELS = "aeiou"
+SYLLABLES = [consonant + vowel for consonant in CONSONANTS for vowel in VOWELS]
+ENDINGS = ["", "n", "r", "t", "l", "ng", "st", "ck"]
+
+# Part-of-speech markers and how often they occur in Balla
+PARTS_OF_SPEECH = ["n", "v", "adj", "adv", "prep", "int"]
+POS_WEIGHTS = [45, 20, 22, 8, 3, 2]
+
+TRANSLATIONS = [
+    "слово", "річ", "світло", "дім", "дорога", "вода", "час", "рука", "книжка", "земля",
+    "робити", "бачити", "знати", "іти", "брати", "давати", "говорити", "жити", "писати", "читати",
+    "великий", "малий", "новий", "старий", "добрий", "швидкий", "тихий", "легкий", "темний", "ясний",
+]
+LABELS = ["розм.", "перен.", "амер.", "тех.", "юр.", "заст.", "спорт.", "мор."]
+
+METADATA = [
+    "##name\tEnglish-Ukrainian Dictionary (Balla)",
+    "##index_language\tEnglish",
+    "##contents_language\tUkrainian",
+    "_about\tSynthetic dictionary in the format of the Balla source, generated for benchmarks",
+]
+
+
+def word(index):
+    """Return a unique pronounceable pseudo-English word for an index."""
+    syllables = []
+    number = index + len(SYLLABLES)  # At least two syllables
+    while number:
+        number, digit = divmod(number, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+    return "".join(syllables) + ENDINGS[index % len(ENDINGS)]
+
+
+def green(text):
+    return f'<i class="p"><font color="green">{text}</font></i>'
+
+
+def definition(rng, pos):
+    """Build a definition with the markup found in Balla articles."""
+    parts = [f'<div style="margin-left:1em">{green(pos)} [m1]']
+    if rng.random() < 0.3:
+        parts.append(f' <font color="steelblue">{rng.choice(LABELS)}</font>')
+    parts.append('</div>')
+
+    for sense in range(1, rng.randint(1, 3) + 1):
+        translations = ", ".join(rng.sample(TRANSLATIONS, rng.randint(1, 4)))
+        parts.append(f'<div style="margin-left:2em"><font color="darkred">{sense})</font> {translations}')
+        if rng.random() < 0.4:
+            example = " ".join(word(rng.randrange(BALLA_ENTRIES)) for _ in range(rng.randint(2, 5)))
+            parts.append(
+                f'\\n<span class="ex"><font color="royalblue">{example}</font> '
+                f'<font color="brown">□</font> {rng.choice(TRANSLATIONS)}</span>'
+            )
+        parts.append('</div>')
+
+    if rng.random() < 0.1:
+        parts.append(
+            '<div style="margin-left:3em"><span class="sec">'
+            f'<font color="darkslateblue">{rng.choice(LABELS)}</font> {rng.choice(TRANSLATIONS)}</span></div>'
+        )
+    return "".join(parts)
+
+
+def link(pos, target):
+    """Build the definition of a link line pointing to another headword."""
+    if pos == "див.":
+        return f'<div style="margin-left:1em">{green("див.")} &lt;&lt;{target}&gt;&gt;</div>'
+    if pos == "pl":
+        return f'<div style="margin-left:1em">{green("pl")} від &lt;&lt;{target}&gt;&gt;</div>'
+    return f'<div style="margin-left:1em">{green(pos)} {green("від")} &lt;&lt;{target}&gt;&gt;</div>'
+
+
+def iter_source_lines(entries, seed=0):
+    """
+    Generate a synthetic dictionary in the format of the Balla source.
+    Regular articles carry POS markers, and link lines make up the rest:
+    plurals (pl), past tense (past), past participles (p.p.) and cross-links (див.).
+    Link forms use an "x" that never occurs in regular headwords, so all headwords are unique.
+    Args:
+        entries (int): Number of dictionary lines to generate, excluding metadata.
+        seed (int): Seed of the random generator.
+    Yields:
+        str: Tab-separated lines without trailing newlines.
+    """
+    rng = random.Random(seed)
+    yield from METADATA
+
+    generated = 0
+    index = 0
+    while generated < entries:
+        headword = word(index)
+        index += 1
+        pos = rng.choices(PARTS_OF_SPEECH, POS_WEIGHTS)[0]
+
+        keys = headword
+        if rng.random() < 0.05:
+            keys += f"|{headword}xy"  # A variant spelling in the same article
+        if rng.random() < 0.02:
+            keys += " {амер.}"  # Metadata in curly braces, removed by 00.sanitize.py
+        lines = [f"{keys}\t{definition(rng, pos)}"]
+
+        if pos == "n" and rng.random() < 0.03:
+            lines.append(f"{headword}xen\t{link('pl', headword)}")
+        if pos == "v" and rng.random() < 0.1:
+            lines.append(f"{headword}xt\t{link('past', headword)}")
+            lines.append(f"{headword}xn\t{link('p.p.', headword)}")
+        if rng.random() < 0.03:
+            lines.append(f"{headword}xe\t{link('див.', headword)}")
+
+        for line in lines[:entries - generated]:
+            yield line
+        generated += len(lines)
+
+
+def write_source(path, entries, seed=0):
+    """
+    Write a synthetic dictionary as a text file, or as a zip archive shaped like
+    src/eng-ukr_Balla_v1.3.zip if the path ends with .zip.
+    Args:
+        path (str): Path to the output file.
+        entries (int): Number of dictionary lines to generate.
+        seed (int): Seed of the random generator.
+    """
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+            with zip_ref.open(BALLA_MEMBER, "w") as member:
+                for line in iter_source_lines(entries, seed):
+                    member.write(f"{line}\n".encode("utf-8"))
+    else:
+        with open(path, "w", encoding="utf-8") as file:
+            for line in iter_source_lines(entries, seed):
+                file.write(f"{line}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic dictionary in the Balla source format.")
+    parser.add_argument("output", help="output .txt file, or .zip to replace src/eng-ukr_Balla_v1.3.zip")
+    parser.add_argument("--scale", type=float, default=1, help="size relative to Balla (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    args = parser.parse_args()
+
+    entries = int(BALLA_ENTRIES * args.scale)
+    write_source(args.output, entries, args.seed)
+    print(f"Generated {entries} entries in {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
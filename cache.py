@@ -0,0 +1,131 @@
+import ast
+import hashlib
+import importlib.metadata
+import os
+import shutil
+import sys
+
+CACHE_DIR = ".cache"
+SCRIPTS_DIR = "scripts"
+
+# Libraries whose versions can change the output of a stage
+LIBRARIES = ["inflect", "pyinflect", "spacy", "en_core_web_sm"]
+
+
+def library_versions():
+    """Return the installed versions of Python and the NLP libraries used by the stages."""
+    versions = {"python": sys.version.split()[0]}
+    for name in LIBRARIES:
+        try:
+            versions[name] = importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def digest_bytes(data):
+    """Return the SHA-256 hex digest of the given bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def digest_file(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def imported_modules(path):
+    """Return the top-level names of every module a Python file imports, including imports inside functions."""
+    with open(path, 'rb') as file:
+        tree = ast.parse(file.read(), filename=path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.add(node.module.split(".")[0])
+    return names
+
+
+def stage_modules(script_name):
+    """
+    Return a script and the helper modules in scripts/ it imports, directly or through other helpers.
+    Args:
+        script_name (str): Name of the script in the scripts/ directory.
+    Returns:
+        list: File names in scripts/, sorted.
+    """
+    closure = set()
+    pending = [script_name]
+    while pending:
+        name = pending.pop()
+        if name in closure:
+            continue
+        closure.add(name)
+        for module in imported_modules(os.path.join(SCRIPTS_DIR, name)):
+            if os.path.isfile(os.path.join(SCRIPTS_DIR, f"{module}.py")):
+                pending.append(f"{module}.py")
+    return sorted(closure)
+
+
+def stage_key(script_name, input_digests, options=None):
+    """
+    Compute the cache key of a stage.
+    Args:
+        script_name (str): Name of the script in the scripts/ directory.
+        input_digests (list): (input path, content digest) pairs of the stage inputs.
+        options (dict): Build options that change the stage outputs.
+    Returns:
+        str: A hex digest covering the sources of the script and the helper modules it imports,
+        library versions, options and inputs.
+    """
+    digest = hashlib.sha256()
+    for name in stage_modules(script_name):
+        digest.update(f"{name}\n".encode('utf-8'))
+        with open(os.path.join(SCRIPTS_DIR, name), 'rb') as file:
+            digest.update(file.read())
+    digest.update(repr(sorted(library_versions().items())).encode('utf-8'))
+    digest.update(repr(sorted((options or {}).items())).encode('utf-8'))
+    for path, input_digest in input_digests:
+        digest.update(f"{path}={input_digest}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def entry_dir(script_name, key, cache_dir=CACHE_DIR):
+    """Return the directory holding the cached outputs of a stage for the given key."""
+    return os.path.join(cache_dir, "stages", os.path.splitext(script_name)[0], key)
+
+
+def lookup(script_name, key, cache_dir=CACHE_DIR):
+    """Return the cache entry directory for a stage key, or None on a miss."""
+    path = entry_dir(script_name, key, cache_dir)
+    return path if os.path.isdir(path) else None
+
+
+def store(script_name, key, output_paths, cache_dir=CACHE_DIR):
+    """
+    Copy the outputs of a stage into the cache.
+    Args:
+        script_name (str): Name of the script in the scripts/ directory.
+        key (str): Cache key of the stage.
+        output_paths (list): Paths of the files produced by the stage.
+    """
+    path = entry_dir(script_name, key, cache_dir)
+    staging_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(staging_path, exist_ok=True)
+    for output_path in output_paths:
+        shutil.copyfile(output_path, os.path.join(staging_path, os.path.basename(output_path)))
+
+    # Publish the entry atomically, so an interrupted build never leaves a partial entry
+    try:
+        os.rename(staging_path, path)
+    except OSError:
+        shutil.rmtree(staging_path)  # Another build stored the same entry first
+
+
+def cached_file(entry, output_path):
+    """Return the path of a cached copy of a stage output."""
+    return os.path.join(entry, os.path.basename(output_path))
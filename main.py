@@ -1,6 +1,36 @@
+import argparse
+import csv
+import glob
+import importlib.util
+import io
 import os
 import subprocess
 import shutil
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+
+import cache
+import report
+import validate
+
+# Let main.py and the scripts import the shared modules in scripts/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from archives import extracted_size
+from entries import FORMAT_ENV, EntryFile, is_binary, read_entries, serialize_entries, write_entries
+from inflection import BACKEND_ENV as INFLECTION_BACKEND_ENV
+from inflection import BACKENDS as INFLECTION_BACKENDS
+from inflection import DEFAULT_BACKEND as DEFAULT_INFLECTION_BACKEND
+from inflection import DEFAULT_SPACY_BATCH_SIZE, NOUN_WORKERS_ENV, SPACY_BATCH_SIZE_ENV, SPACY_WORKERS_ENV
+from inflection_cache import CACHE_ENV as INFLECTION_CACHE_ENV
+from markup import PROFILE_ENV as MARKUP_PROFILE_ENV
+from markup import WORKERS_ENV as MARKUP_WORKERS_ENV
+from mobi import WORKERS_ENV as MOBI_WORKERS_ENV
+from varcon import CACHE_ENV as VARCON_CACHE_ENV, VariantTable, load_table, pack_table
+from xhtml import DEFAULT_SHARD_BYTES, SHARD_BYTES_ENV
+from xhtml import WORKERS_ENV as XHTML_WORKERS_ENV
 
 # List of scripts to execute
 scripts = [
@@ -18,6 +48,8 @@ scripts = [
     "11.all-inflections.py",
     "12.clean-markup.py",
     "13.convert-to-xhtml.py",
+    "14.convert-to-mobi.py",
+    "15.convert-to-stardict.py",
 ]
 
 # Mapping of scripts to specific validation output files
@@ -31,11 +63,58 @@ validation_mapping = {
     "12.clean-markup.py": "temp/12.clean-markup.txt",
 }
 
+# Artifacts consumed and produced by each script's in-process run() function.
+# Inputs under src/ are passed to run() as paths, everything else as in-memory data:
+# entries for .txt files, lists of rows for .csv files and the compiled VarCon table for .bin files.
+stage_artifacts = {
+    "00.sanitize.py": (["src/eng-ukr_Balla_v1.3.zip"], ["temp/00.sanitize.txt"]),
+    "01.crosslinks.py": (["temp/00.sanitize.txt"], ["temp/01.crosslinks.txt"]),
+    "02.varcon-csv.py": (["src/varcon.zip"], ["temp/varcon-clusters.bin"]),
+    "03.variants.py": (
+        ["temp/varcon-clusters.bin", "temp/01.crosslinks.txt"],
+        ["temp/03.british-american-variants.txt"],
+    ),
+    "04.irregular-nouns.py": (["temp/03.british-american-variants.txt"], ["temp/nouns-irregular.csv"]),
+    "05.filter-irregular-nouns.py": (["temp/03.british-american-variants.txt"], ["temp/05.filter-irregular-nouns.txt"]),
+    "06.regular-nouns.py": (
+        ["temp/05.filter-irregular-nouns.txt", "temp/nouns-irregular.csv"],
+        ["temp/nouns-regular.csv"],
+    ),
+    "07.adjectives.py": (["temp/05.filter-irregular-nouns.txt"], ["temp/adjectives.csv"]),
+    "08.filter-irregular-verbs.py": (["temp/05.filter-irregular-nouns.txt"], ["temp/08.filter-irregular-verbs.txt"]),
+    "09.irregular-verbs.py": (["temp/05.filter-irregular-nouns.txt"], ["temp/verbs-irregular.csv"]),
+    "10.regular-verbs.py": (
+        ["temp/05.filter-irregular-nouns.txt", "temp/verbs-irregular.csv"],
+        ["temp/verbs-regular.csv"],
+    ),
+    "11.all-inflections.py": (
+        [
+            "temp/08.filter-irregular-verbs.txt",
+            "temp/nouns-regular.csv",
+            "temp/adjectives.csv",
+            "temp/verbs-regular.csv",
+        ],
+        ["temp/all_inflections.csv", "temp/11.all-inflections.txt"],
+    ),
+    "12.clean-markup.py": (["temp/11.all-inflections.txt"], ["temp/12.clean-markup.txt"]),
+    "13.convert-to-xhtml.py": (["temp/12.clean-markup.txt"], []),
+    "14.convert-to-mobi.py": (["temp/12.clean-markup.txt"], []),
+    "15.convert-to-stardict.py": (["temp/12.clean-markup.txt"], []),
+}
+
+# Files written outside temp/ that are not passed to other stages, for the build report
+stage_side_outputs = {
+    "13.convert-to-xhtml.py": "output/dictionary[-.][0-9o]*",  # The XHTML shards and dictionary.opf
+    "14.convert-to-mobi.py": "output/dictionary.mobi",
+    "15.convert-to-stardict.py": "output/stardict/*",  # The .ifo, .idx, .syn and .dict.dz files
+}
+
 # Colorful ASCII header and footer
 HEADER = """\033[1;36mPreparing a dictionary...\033[0m"""
 FOOTER = """\033[1;32mFinished!\033[0m"""
 
 TEMP_DIR = "temp/"
+SCRIPTS_DIR = "scripts"
 
 def create_temp_directory():
     """Create the temp/ directory if it does not exist."""
@@ -51,14 +130,15 @@ def delete_temp_directory():
         print(f"\033[1;33mDeleted directory: {TEMP_DIR}\033[0m")
 
 
-def run_script(script_name):
-    """Run a Python script located in the scripts/ directory and capture the output."""
-    try:
-        script_path = os.path.join("scripts", script_name)
-        print(f"\033[1;34mRunning {script_path}...\033[0m")
-        subprocess.run(["python", script_path], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"\033[1;31mError while running {script_name}: {e}\033[0m")
+def run_script(script_name, metrics=None):
+    """Run a Python script located in the scripts/ directory, recording its resource usage into metrics."""
+    script_path = os.path.join("scripts", script_name)
+    print(f"\033[1;34mRunning {script_path}...\033[0m")
+    returncode, measured = report.run_measured(["python", script_path])
+    if metrics is not None:
+        metrics.update(measured)
+    if returncode != 0:
+        print(f"\033[1;31mError while running {script_name}: exit status {returncode}\033[0m")
         return False
     return True
 
@@ -74,48 +154,621 @@ def run_validation_script(output_file):
     return True
 
 
+def load_stage(script_name):
+    """Import a script from the scripts/ directory as a module."""
+    module_name = "stage_" + os.path.splitext(script_name)[0].replace(".", "_").replace("-", "_")
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPTS_DIR, script_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_artifact(path):
+    """Read a temp/ artifact into memory: entries for .txt files, rows for .csv files, a variant table for .bin files."""
+    if path.endswith(".bin"):
+        return load_table(path)
+    if path.endswith(".csv"):
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            return list(csv.reader(file))
+    return read_entries(path)
+
+
+def serialize_artifact(path, value):
+    """Serialize an in-memory artifact to the bytes of its temp/ snapshot."""
+    if path.endswith(".bin"):
+        return pack_table(value)
+    if path.endswith(".csv"):
+        buffer = io.StringIO(newline='')
+        csv.writer(buffer).writerows(value)
+        return buffer.getvalue().encode('utf-8')
+    return serialize_entries(value)
+
+
+def write_artifact(path, value):
+    """Write an in-memory artifact as a temp/ snapshot."""
+    with open(path, 'wb') as file:
+        file.write(serialize_artifact(path, value))
+
+
+def load_artifact(artifacts, path):
+    """Return an artifact from memory, falling back to a temp/ snapshot; source archives are passed by path."""
+    if path in artifacts:
+        return artifacts[path]
+    if path.startswith("src/"):
+        return path
+    return read_artifact(path)
+
+
+def stage_outputs(script_name, result):
+    """Split the result of a script's run() function into one value per output artifact."""
+    outputs = stage_artifacts[script_name][1]
+    if len(outputs) == 1:
+        return (result,)
+    return tuple(result) if outputs else ()
+
+
+def execute_stage_in_process(script_name, inputs):
+    """Call a script's run() function on in-memory inputs and return its outputs as a tuple."""
+    module = load_stage(script_name)
+    values = stage_outputs(script_name, module.run(*inputs))
+    return tuple(value if isinstance(value, (list, VariantTable)) else list(value) for value in values)  # Keep lazy outputs
+
+
+def stream_artifact(path):
+    """Return a stage input for streaming mode: dictionaries stream from temp/, CSVs and the variant table are small enough to load."""
+    if path.startswith("src/"):
+        return path
+    if path.endswith(".txt"):
+        return EntryFile(path)
+    return read_artifact(path)
+
+
+def execute_stage_streaming(script_name):
+    """Call a script's run() function on entries streamed from temp/, streaming its outputs back to temp/."""
+    module = load_stage(script_name)
+    inputs = [stream_artifact(path) for path in stage_artifacts[script_name][0]]
+    for path, value in zip(stage_artifacts[script_name][1], stage_outputs(script_name, module.run(*inputs))):
+        if path.endswith(".txt"):
+            write_entries(path, value)
+        else:
+            write_artifact(path, value)
+
+
+def store_stage_results(script_name, values, artifacts, snapshots=False):
+    """Keep the outputs of an in-process stage in memory and optionally write their snapshots."""
+    for path, value in zip(stage_artifacts[script_name][1], values):
+        artifacts[path] = value
+        if snapshots:
+            write_artifact(path, value)
+
+
+def run_stage_in_process(script_name, artifacts, snapshots=False, metrics=None):
+    """Run a script's run() function in this process, keeping its outputs in memory."""
+    start = report.start_measurement()
+    try:
+        print(f"\033[1;34mRunning {os.path.join(SCRIPTS_DIR, script_name)} in-process...\033[0m")
+        inputs = [load_artifact(artifacts, path) for path in stage_artifacts[script_name][0]]
+        store_stage_results(script_name, execute_stage_in_process(script_name, inputs), artifacts, snapshots)
+    except Exception as e:
+        print(f"\033[1;31mError while running {script_name}: {e}\033[0m")
+        return False
+    finally:
+        if metrics is not None:
+            metrics.update(report.finish_measurement(start))
+    return True
+
+
+def run_stage_streaming(script_name, metrics=None):
+    """Run a script's run() function in this process, streaming its inputs and outputs through temp/."""
+    start = report.start_measurement()
+    try:
+        print(f"\033[1;34mStreaming {os.path.join(SCRIPTS_DIR, script_name)}...\033[0m")
+        execute_stage_streaming(script_name)
+    except Exception as e:
+        print(f"\033[1;31mError while running {script_name}: {e}\033[0m")
+        return False
+    finally:
+        if metrics is not None:
+            metrics.update(report.finish_measurement(start))
+    return True
+
+
+def execute_stage(script_name, mode, inputs):
+    """
+    Process pool worker: run a stage's run() function on the given inputs or on streamed temp/ files,
+    or the script as a subprocess. Returns the stage outputs and the resource usage measured in the worker.
+    """
+    if mode == "in-process":
+        start = report.start_measurement()
+        values = execute_stage_in_process(script_name, inputs)
+        return values, report.finish_measurement(start)
+    if mode == "streaming":
+        start = report.start_measurement()
+        execute_stage_streaming(script_name)
+        return (), report.finish_measurement(start)
+
+    metrics = {}
+    if not run_script(script_name, metrics):
+        raise RuntimeError(f"{script_name} exited with an error")
+    return (), metrics
+
+
+def input_digests(script_name, artifacts=None):
+    """Return (path, digest) pairs for the inputs of a stage, hashing in-memory artifacts as their snapshots."""
+    digests = []
+    for path in stage_artifacts[script_name][0]:
+        if artifacts is not None and path in artifacts:
+            digests.append((path, cache.digest_bytes(serialize_artifact(path, artifacts[path]))))
+        else:
+            digests.append((path, cache.digest_file(path)))
+    return digests
+
+
+def restore_stage_outputs(entry, script_name, artifacts, args):
+    """Restore the outputs of a stage from a cache entry, into memory and/or temp/."""
+    for path in stage_artifacts[script_name][1]:
+        cached_path = cache.cached_file(entry, path)
+        if args.in_process:
+            artifacts[path] = read_artifact(cached_path)
+        if not args.in_process or args.snapshots:
+            shutil.copyfile(cached_path, path)
+
+
+def stage_cache_key(script_name, artifacts, args):
+    """Return the cache key of a stage, or None when caching does not apply to it."""
+    if args.no_cache or not stage_artifacts[script_name][1]:
+        return None
+    try:
+        digests = input_digests(script_name, artifacts if args.in_process else None)
+        return cache.stage_key(script_name, digests, {
+            "intermediate_format": args.intermediate_format,
+            "inflection_backend": args.inflection_backend,
+        })
+    except OSError:
+        return None  # Missing inputs: let the stage itself report the error
+
+
+def restore_cached_stage(script_name, key, artifacts, args):
+    """Restore a stage from the cache and print whether it was a hit. Returns the cache entry on a hit."""
+    if not key:
+        return None
+    entry = cache.lookup(script_name, key, args.cache_dir)
+    if entry:
+        print(f"\033[1;32mCache hit for {script_name} ({key[:12]})\033[0m")
+        restore_stage_outputs(entry, script_name, artifacts, args)
+        return entry
+    print(f"\033[1;33mCache miss for {script_name} ({key[:12]})\033[0m")
+    return None
+
+
+def cached_stage_metrics(script_name, entry, start):
+    """Return the build report measurements of a stage restored from the cache."""
+    return {
+        "status": "cached",
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "bytes_read": sum(
+            report.file_size(cache.cached_file(entry, path)) for path in stage_artifacts[script_name][1]
+        ),
+    }
+
+
+def store_cached_stage(script_name, key, artifacts, args):
+    """Store the outputs of a freshly built stage in the cache."""
+    if not key:
+        return
+    outputs = stage_artifacts[script_name][1]
+    if args.in_process and not args.snapshots:
+        for path in outputs:
+            write_artifact(path, artifacts[path])
+    cache.store(script_name, key, outputs, args.cache_dir)
+
+
+def run_stage(script_name, artifacts, args, metrics):
+    """Run a stage, reusing its cached outputs when the script, libraries and inputs are unchanged."""
+    start = time.perf_counter()
+    key = stage_cache_key(script_name, artifacts, args)
+    entry = restore_cached_stage(script_name, key, artifacts, args)
+    if entry:
+        metrics.update(cached_stage_metrics(script_name, entry, start))
+        return True
+
+    if args.in_process:
+        success = run_stage_in_process(script_name, artifacts, args.snapshots, metrics)
+    elif args.streaming:
+        success = run_stage_streaming(script_name, metrics)
+    else:
+        success = run_script(script_name, metrics)
+
+    metrics["status"] = "built" if success else "failed"
+    if success:
+        store_cached_stage(script_name, key, artifacts, args)
+    return success
+
+
+def stage_dependencies():
+    """Return the scripts each stage depends on, derived from the artifacts they consume and produce."""
+    producers = {path: script for script, (_, outputs) in stage_artifacts.items() for path in outputs}
+    return {
+        script: {producers[path] for path in inputs if path in producers}
+        for script, (inputs, _) in stage_artifacts.items()
+    }
+
+
+def run_stages_concurrently(artifacts, args, on_stage_done):
+    """
+    Run the stages as a dependency graph on a process pool, starting every stage as soon as
+    the stages producing its inputs have finished. Validation runs after each covered stage,
+    and on_stage_done(script_name, metrics) is called when a stage finishes or fails.
+    Returns True if every stage succeeded.
+    """
+    dependencies = stage_dependencies()
+    pending = list(scripts)
+    completed = set()
+    running = {}
+    failed = False
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        while (pending and not failed) or running:
+            ready = [] if failed else [script for script in pending if dependencies[script] <= completed]
+            restored = False
+            for script in ready:
+                pending.remove(script)
+                start = time.perf_counter()
+                key = stage_cache_key(script, artifacts, args)
+                entry = restore_cached_stage(script, key, artifacts, args)
+                if entry:
+                    on_stage_done(script, cached_stage_metrics(script, entry, start))
+                    completed.add(script)
+                    restored = True
+                    if not validate_stage(script, artifacts, args):
+                        failed = True
+                        break
+                    continue
+
+                inputs = None
+                if args.in_process:
+                    print(f"\033[1;34mRunning {os.path.join(SCRIPTS_DIR, script)} in-process...\033[0m")
+                    inputs = [load_artifact(artifacts, path) for path in stage_artifacts[script][0]]
+                elif args.streaming:
+                    print(f"\033[1;34mStreaming {os.path.join(SCRIPTS_DIR, script)}...\033[0m")
+                running[pool.submit(execute_stage, script, execution_mode(args), inputs)] = (script, key)
+
+            if restored:
+                continue  # Cache hits may have unblocked more stages
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                script, key = running.pop(future)
+                try:
+                    values, metrics = future.result()
+                except Exception as e:
+                    print(f"\033[1;31mError while running {script}: {e}\033[0m")
+                    on_stage_done(script, {"status": "failed"})
+                    failed = True
+                    continue
+
+                if args.in_process:
+                    store_stage_results(script, values, artifacts, args.snapshots)
+                store_cached_stage(script, key, artifacts, args)
+                on_stage_done(script, dict(metrics, status="built"))
+                completed.add(script)
+                if not validate_stage(script, artifacts, args):
+                    failed = True
+
+    return not failed and not pending
+
+
+def artifact_stats(path, artifacts, stats):
+    """Return the number of entries and the set of headwords (None for CSVs and tables) of an artifact, computed once."""
+    if path not in stats:
+        if not path.endswith(".txt"):
+            value = artifacts[path] if path in artifacts else read_artifact(path)
+            stats[path] = (len(value), None)
+        else:
+            entries = 0
+            headwords = set()
+            for entry in artifacts[path] if path in artifacts else EntryFile(path):
+                entries += 1
+                headwords.update(entry.headwords)
+            stats[path] = (entries, headwords)
+    return stats[path]
+
+
+def stage_report(script_name, metrics, artifacts, args, stats):
+    """Build the build report record of a stage from its measurements and its input and output artifacts."""
+    inputs, outputs = stage_artifacts[script_name]
+    record = {
+        "stage": script_name,
+        "status": metrics.get("status"),
+        "wall_seconds": metrics.get("wall_seconds"),
+        "cpu_seconds": metrics.get("cpu_seconds"),
+        "peak_rss_bytes": metrics.get("peak_rss_bytes"),
+        "peak_rss_scope": metrics.get("peak_rss_scope"),
+        "bytes_read": None,
+        "bytes_written": None,
+        "bytes_saved": None,
+        "entries_in": None,
+        "entries_out": None,
+        "headwords_added": None,
+        "headwords_removed": None,
+    }
+    if record["status"] == "failed":
+        return record
+
+    # Bytes that actually went through the file system; cache hits read the cache entry instead of the inputs
+    if record["status"] == "cached":
+        record["bytes_read"] = metrics["bytes_read"]
+    else:
+        read_paths = [path for path in inputs if path.startswith("src/")] if args.in_process else inputs
+        record["bytes_read"] = sum(report.file_size(path) for path in read_paths)
+    written_paths = list(outputs) if not args.in_process or args.snapshots else []
+    if script_name in stage_side_outputs and record["status"] == "built":
+        written_paths += glob.glob(stage_side_outputs[script_name])
+    record["bytes_written"] = sum(report.file_size(path) for path in written_paths)
+
+    # Source archives are streamed; extracting their members to temp/ would write and read them back
+    archives = [path for path in inputs if path.endswith(".zip")]
+    if archives and record["status"] == "built":
+        try:
+            record["bytes_saved"] = sum(2 * extracted_size(path) for path in archives)
+        except (OSError, zipfile.BadZipFile):
+            pass
+
+    try:
+        temp_inputs = [path for path in inputs if not path.startswith("src/")]
+        if temp_inputs:
+            record["entries_in"] = sum(artifact_stats(path, artifacts, stats)[0] for path in temp_inputs)
+        if outputs:
+            record["entries_out"] = sum(artifact_stats(path, artifacts, stats)[0] for path in outputs)
+
+        # Headword changes of stages that transform the dictionary itself
+        dictionary_inputs = [path for path in temp_inputs if path.endswith(".txt")]
+        dictionary_outputs = [path for path in outputs if path.endswith(".txt")]
+        if len(dictionary_inputs) == 1 and len(dictionary_outputs) == 1:
+            headwords_in = artifact_stats(dictionary_inputs[0], artifacts, stats)[1]
+            headwords_out = artifact_stats(dictionary_outputs[0], artifacts, stats)[1]
+            record["headwords_added"] = len(headwords_out - headwords_in)
+            record["headwords_removed"] = len(headwords_in - headwords_out)
+    except OSError:
+        pass  # An artifact is missing; leave the counts empty
+    return record
+
+
 def count_lines_and_words(filename):
     """Count the number of lines and words in the first column of a file."""
     try:
-        line_count = 0
-        word_count = 0
-
         with open(filename, 'r') as file:
-            for line in file:
-                line_count += 1
-                columns = line.strip().split('\t')
-                if columns and columns[0]:
-                    words = columns[0].split('|')
-                    word_count += len(words)
-
-        print(f"\033[1;32mLines in file: {line_count}\033[0m")
-        print(f"\033[1;32mWords in dictionary: {word_count}\033[0m")
+            print_lines_and_words(file)
     except FileNotFoundError:
         print(f"\033[1;31mError: File '{filename}' not found.\033[0m")
     except Exception as e:
         print(f"\033[1;31mAn error occurred: {e}\033[0m")
 
 
+def print_lines_and_words(lines):
+    """Print the number of lines and words in the first column of the given lines."""
+    line_count = 0
+    word_count = 0
+
+    for line in lines:
+        line_count += 1
+        columns = line.strip().split('\t')
+        if columns and columns[0]:
+            words = columns[0].split('|')
+            word_count += len(words)
+
+    print(f"\033[1;32mLines in file: {line_count}\033[0m")
+    print(f"\033[1;32mWords in dictionary: {word_count}\033[0m")
+
+
+def validate_in_memory(output_file, entries):
+    """Print counts and run validation over an in-memory artifact."""
+    print(f"\033[1;34mValidating {output_file} in memory...\033[0m")
+    lines = [entry.to_line() for entry in entries]
+    print_lines_and_words(lines)
+    validate.print_report(*validate.count_repeated_occurrences_in_lines(lines))
+
+
+def validate_stage(script_name, artifacts, args):
+    """Run validation if the script has a corresponding output file. Returns False if validation failed."""
+    if script_name not in validation_mapping:
+        return True
+
+    output_file = validation_mapping[script_name]
+    if args.in_process and not args.snapshots:
+        validate_in_memory(output_file, artifacts[output_file])
+        return True
+    if os.path.exists(output_file) and is_binary(output_file):
+        validate_in_memory(output_file, read_artifact(output_file))  # validate.py reads TSV only
+        return True
+    count_lines_and_words(output_file)  # Print lines and words count
+    return run_validation_script(output_file)
+
+
+def execution_mode(args):
+    """Return how stages are executed: "in-process", "streaming" or "subprocess"."""
+    if args.in_process:
+        return "in-process"
+    return "streaming" if args.streaming else "subprocess"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the English-Ukrainian Kindle dictionary.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--in-process",
+        action="store_true",
+        help="run all stages in a single process, passing entries between them in memory",
+    )
+    mode.add_argument(
+        "--streaming",
+        action="store_true",
+        help="run all stages in a single process, streaming entries through temp/ files with bounded memory",
+    )
+    parser.add_argument(
+        "--snapshots",
+        action="store_true",
+        help="with --in-process, still write temp/*.txt and temp/*.csv snapshots and keep temp/ for debugging",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="rebuild every stage instead of reusing cached outputs",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=cache.CACHE_DIR,
+        help=f"directory of the persistent stage cache (default: {cache.CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="run up to N independent stages concurrently on a process pool (default: 1, sequential)",
+    )
+    parser.add_argument(
+        "--noun-workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="pluralize nouns in 06.regular-nouns.py on N worker processes (default: 1, inline)",
+    )
+    parser.add_argument(
+        "--inflection-backend",
+        choices=INFLECTION_BACKENDS,
+        default=DEFAULT_INFLECTION_BACKEND,
+        help="how 07 and 10 inflect words: the spaCy model, pyinflect's lookup tables without spaCy, or both "
+             f"with their disagreements reported (default: {DEFAULT_INFLECTION_BACKEND})",
+    )
+    parser.add_argument(
+        "--spacy-batch-size",
+        type=int,
+        default=DEFAULT_SPACY_BATCH_SIZE,
+        metavar="N",
+        help=f"words per nlp.pipe batch of the spaCy inflection backend (default: {DEFAULT_SPACY_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--spacy-workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="run the spaCy inflection backend on N processes with nlp.pipe (default: 1)",
+    )
+    parser.add_argument(
+        "--markup-workers",
+        type=int,
+        metavar="N",
+        help="clean the markup in 12.clean-markup.py in chunks on N worker processes (default: the --jobs value)",
+    )
+    parser.add_argument(
+        "--profile-markup",
+        action="store_true",
+        help="time every markup rule of 12.clean-markup.py and print the times with the rewrite counts",
+    )
+    parser.add_argument(
+        "--shard-bytes",
+        type=int,
+        default=DEFAULT_SHARD_BYTES,
+        metavar="N",
+        help=f"target size in bytes of each output/dictionary-N.xhtml file (default: {DEFAULT_SHARD_BYTES})",
+    )
+    parser.add_argument(
+        "--xhtml-workers",
+        type=int,
+        metavar="N",
+        help="render the XHTML files of 13.convert-to-xhtml.py on N worker processes (default: the --jobs value)",
+    )
+    parser.add_argument(
+        "--mobi-workers",
+        type=int,
+        metavar="N",
+        help="compress the text of output/dictionary.mobi on N worker processes (default: the --jobs value)",
+    )
+    parser.add_argument(
+        "--intermediate-format",
+        choices=["tsv", "binary"],
+        default="tsv",
+        help="format of the temp/*.txt dictionary files: TSV lines, or binary with headwords stored apart "
+             "from definitions (convert with scripts/entries.py)",
+    )
+    parser.add_argument(
+        "--report",
+        default=report.REPORT_PATH,
+        metavar="PATH",
+        help=f"where to write the JSON build report (default: {report.REPORT_PATH})",
+    )
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
     print(HEADER)
 
+    # Scripts, including subprocesses, write their temp/*.txt files in the selected format
+    os.environ[FORMAT_ENV] = args.intermediate_format
+    # 06.regular-nouns.py pluralizes nouns on its own process pool
+    os.environ[NOUN_WORKERS_ENV] = str(args.noun_workers)
+    # 07.adjectives.py and 10.regular-verbs.py inflect with the selected backend
+    os.environ[INFLECTION_BACKEND_ENV] = args.inflection_backend
+    os.environ[SPACY_BATCH_SIZE_ENV] = str(args.spacy_batch_size)
+    os.environ[SPACY_WORKERS_ENV] = str(args.spacy_workers)
+    # 12.clean-markup.py cleans chunks of the dictionary on its own process pool
+    os.environ[MARKUP_WORKERS_ENV] = str(args.markup_workers or args.jobs)
+    # 12.clean-markup.py always counts the rewrites of each rule, and times them on request
+    os.environ[MARKUP_PROFILE_ENV] = "1" if args.profile_markup else ""
+    # 13.convert-to-xhtml.py starts a new XHTML file before one would outgrow this size,
+    # and renders the files on its own process pool
+    os.environ[SHARD_BYTES_ENV] = str(args.shard_bytes)
+    os.environ[XHTML_WORKERS_ENV] = str(args.xhtml_workers or args.jobs)
+    # 14.convert-to-mobi.py compresses the text records of the MOBI file on its own process pool
+    os.environ[MOBI_WORKERS_ENV] = str(args.mobi_workers or args.jobs)
+    # VarCon is compiled once per archive into the cache directory, unless caching is off
+    os.environ[VARCON_CACHE_ENV] = "" if args.no_cache else os.path.join(args.cache_dir, "varcon")
+    # Inflections answered by inflect, spaCy and pyinflect are kept across builds
+    os.environ[INFLECTION_CACHE_ENV] = "" if args.no_cache else os.path.join(args.cache_dir, "inflections.sqlite")
+
     # Create the temp/ directory at the beginning
     create_temp_directory()
 
+    artifacts = {}
+    stats = {}
+    stage_reports = {}
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+
+    def on_stage_done(script, metrics):
+        stage_reports[script] = stage_report(script, metrics, artifacts, args, stats)
+
     try:
-        for script in scripts:
-            if not run_script(script):
-                break  # Stop execution if a script fails
-
-            # Run validation if the script has a corresponding output file
-            if script in validation_mapping:
-                output_file = validation_mapping[script]
-                count_lines_and_words(output_file)  # Print lines and words count
-                if not run_validation_script(output_file):
+        if args.jobs > 1:
+            run_stages_concurrently(artifacts, args, on_stage_done)
+        else:
+            for script in scripts:
+                metrics = {}
+                success = run_stage(script, artifacts, args, metrics)
+                on_stage_done(script, metrics)
+                if not success:
+                    break  # Stop execution if a script fails
+                if not validate_stage(script, artifacts, args):
                     break
     finally:
-        # Delete the temp/ directory at the end
-        delete_temp_directory()
+        report.write_report(args.report, {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - start, 3),
+            "mode": execution_mode(args),
+            "jobs": args.jobs,
+            "cache": not args.no_cache,
+            "intermediate_format": args.intermediate_format,
+            "inflection_backend": args.inflection_backend,
+            "stages": [stage_reports[script] for script in scripts if script in stage_reports],
+        })
+
+        # Delete the temp/ directory at the end, unless snapshots were requested
+        if not (args.in_process and args.snapshots):
+            delete_temp_directory()
 
     print(FOOTER)
 
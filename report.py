@@ -0,0 +1,106 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_PATH = "build-report.json"
+
+
+def _maxrss_bytes(maxrss):
+    """Convert ru_maxrss to bytes: it is reported in bytes on macOS and in kilobytes elsewhere."""
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def reset_peak_rss():
+    """Reset the peak resident set size of this process, where the OS allows it. Returns True on success."""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """Return the peak resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    return _maxrss_bytes(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def start_measurement():
+    """Start measuring work done in this process. Returns a token for finish_measurement()."""
+    return {
+        "wall": time.perf_counter(),
+        "cpu": time.process_time(),
+        "peak_rss_scope": "stage" if reset_peak_rss() else "process",
+    }
+
+
+def finish_measurement(start):
+    """
+    Finish measuring work done in this process.
+    Args:
+        start (dict): Token returned by start_measurement().
+    Returns:
+        dict: Wall time, CPU time and peak resident memory of the measured work.
+    """
+    return {
+        "wall_seconds": round(time.perf_counter() - start["wall"], 3),
+        "cpu_seconds": round(time.process_time() - start["cpu"], 3),
+        "peak_rss_bytes": peak_rss(),
+        "peak_rss_scope": start["peak_rss_scope"],
+    }
+
+
+def run_measured(command):
+    """
+    Run a command as a child process and measure it.
+    Args:
+        command (list): Command line to run.
+    Returns:
+        tuple: The exit code and a dict with wall time, CPU time and peak resident memory of the child.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(command)
+    if not hasattr(os, "wait4"):
+        returncode = process.wait()
+        return returncode, {"wall_seconds": round(time.perf_counter() - start, 3)}
+
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, {
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+        "peak_rss_bytes": _maxrss_bytes(usage.ru_maxrss),
+        "peak_rss_scope": "stage",
+    }
+
+
+def file_size(path):
+    """Return the size of a file in bytes, or 0 if it does not exist."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def write_report(path, report):
+    """Write the build report as JSON."""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+        file.write("\n")
+    print(f"\033[1;33mBuild report written to {path}\033[0m")
@@ -1,71 +1,73 @@
 import re
-import zipfile
 import os
+from archives import iter_zip_lines
+from entries import Entry, write_entries
 
-def extract_file_from_zip(zip_path, extract_to):
+def sanitize_lines(lines):
     """
-    Extract a specific file from a zip archive.
+    Remove substrings enclosed in curly braces `{}` from the first column,
+    and delete lines with keys "_about" or those starting with "##".
     Args:
-        zip_path (str): Path to the zip file.
-        extract_to (str): Path to extract the file.
+        lines (iterable): Tab-separated lines of the source dictionary.
+    Yields:
+        Entry: The cleaned entries, one line at a time.
     """
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        # Extract eng-ukr_Balla_v1.3.txt
-        zip_ref.extract("eng-ukr_Balla_v1.3.txt", path=os.path.dirname(extract_to))
-        extracted_file = os.path.join(os.path.dirname(extract_to), "eng-ukr_Balla_v1.3.txt")
-        os.rename(extracted_file, extract_to)
-    print(f"Extracted to {extract_to}")
+    curly_braces_pattern = re.compile(r"\{.*?\}")
+
+    for line in lines:
+        if not line.strip():
+            continue
+        columns = line.strip().split('\t')
+
+        # Skip lines with "_about" or starting with "##" in the first column
+        first_column = columns[0].strip()
+        if first_column == "_about" or first_column.startswith("##"):
+            continue
+
+        # Remove curly braces and their content from the first column
+        columns[0] = re.sub(curly_braces_pattern, '', first_column).strip()
+
+        # Emit the cleaned line
+        yield Entry.from_line('\t'.join(columns))
 
 def remove_curly_braces_and_unwanted_lines(file_path, output_path):
     """
     Reads a tab-separated file, removes substrings enclosed in curly braces `{}` from the first column,
     and deletes lines with keys "_about" or those starting with "##". Writes the updated content to a new file.
     Args:
-        file_path (str): Path to the input file.
+        file_path (str): Path to the input file, or to a zip archive streamed without extracting it.
         output_path (str): Path to the output file.
     """
-    updated_lines = []
-    curly_braces_pattern = re.compile(r"\{.*?\}")
-
-    with open(file_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            columns = line.strip().split('\t')
-            if not columns:
-                continue
-
-            # Skip lines with "_about" or starting with "##" in the first column
-            first_column = columns[0].strip()
-            if first_column == "_about" or first_column.startswith("##"):
-                continue
-
-            # Remove curly braces and their content from the first column
-            columns[0] = re.sub(curly_braces_pattern, '', first_column).strip()
+    # Stream the updated content to the output file
+    if file_path.endswith('.zip'):
+        write_entries(output_path, sanitize_lines(iter_zip_lines(file_path)))
+    else:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            write_entries(output_path, sanitize_lines(file))
 
-            # Add the cleaned line to the updated lines list
-            updated_lines.append('\t'.join(columns))
+    print("\033[1;35mStage 1: Remove redundant metadata\033[0m")
+    print(f"File processed and saved to {output_path}")
 
-    # Write the updated content to the output file
-    with open(output_path, 'w', encoding='utf-8') as file:
-        file.write('\n'.join(updated_lines) + '\n')
+def run(zip_path):
+    """
+    In-process entry point used by main.py: stream the source dictionary out of its zip archive
+    and sanitize it lazily, without extracting it to temp/.
+    Args:
+        zip_path (str): Path to the zip file; every .txt member is read, in archive order.
+    Yields:
+        Entry: Sanitized dictionary entries.
+    """
+    yield from sanitize_lines(iter_zip_lines(zip_path))
 
     print("\033[1;35mStage 1: Remove redundant metadata\033[0m")
-    print(f"File processed and saved to {output_path}")
 
 
 if __name__ == "__main__":
     zip_path = "src/eng-ukr_Balla_v1.3.zip"  # Path to the zip file
-    temp_file = "temp/eng-ukr_Balla_v1.3.txt"  # Path to extract and use the file
     output_file = "temp/00.sanitize.txt"  # Output file path
 
     # Ensure the temp/ directory exists
-    os.makedirs(os.path.dirname(temp_file), exist_ok=True)
-
-    # Extract the file from the zip archive
-    extract_file_from_zip(zip_path, temp_file)
-
-    # Process the extracted file
-    remove_curly_braces_and_unwanted_lines(temp_file, output_file)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
-    # Cleanup: Optionally remove the extracted file
-    os.remove(temp_file)
-    print(f"Temporary file {temp_file} removed.")
\ No newline at end of file
+    # Stream the dictionary out of the zip archive and process it
+    remove_curly_braces_and_unwanted_lines(zip_path, output_file)
@@ -1,58 +1,132 @@
-import re
+import sys
+from collections import defaultdict
+from entries import EntryFile, write_entries
+from links import CROSSLINK
+
+def resolve_links(links, find_entry):
+    """
+    Build a resolver that follows chains of cross-links to the entry they end at.
+    Args:
+        links (dict): Key and headwords of each cross-link entry -> the word it links to.
+        find_entry (callable): Returns the position of the entry holding a word, or None.
+    Returns:
+        callable: Maps a linked word to (position, None), or to (None, reason) when the chain
+        ends at a missing word ("missing") or loops back on itself ("cycle").
+    """
+    resolved = {}  # Memoized results, shared by every chain passing through a word
+
+    def resolve(word):
+        path = []
+        on_path = set()
+        while True:
+            if word in resolved:
+                result = resolved[word]
+                break
+            position = find_entry(word)
+            if position is not None:
+                result = (position, None)
+                break
+            if word in on_path:
+                result = (None, "cycle")
+                break
+            if word not in links:
+                result = (None, "missing")
+                break
+            path.append(word)
+            on_path.add(word)
+            word = links[word]
+
+        for word in path:
+            resolved[word] = result
+        return result
+
+    return resolve
+
+
+def run(entries):
+    """
+    Resolve cross-links. For each entry with <font color="green">див.</font>:
+    - Follow the link, and any cross-links it leads to, to the final entry.
+    - Add the cross-linked headwords to that entry's headwords.
+    - Remove the original entry with the cross-link.
+    - Report cross-links whose chain ends at a missing word or loops.
+    The first pass indexes every headword and cross-link, the second streams the updated entries.
+
+    Args:
+        entries (iterable): Entries of the sanitized dictionary, iterated twice (a list or an EntryFile).
+    Yields:
+        Entry: The updated entries.
+    """
+    cross_links = []  # (key, linked word) of every cross-link entry
+    links = {}  # Key and headwords of a cross-link entry -> linked word, to follow chains
+    link_positions = set()  # Positions of the cross-link entries
+    exact_keys = {}  # Whole first column -> position of the first entry with it
+    headword_positions = {}  # Headword -> position of the first entry holding it
+
+    # Index the cross-links and the headwords of the other entries
+    for idx, entry in enumerate(entries):
+        # Check if the definition is a cross-link line
+        if entry.tag == CROSSLINK:
+            key = entry.key
+            linked_word = entry.link_target()
+            cross_links.append((key, linked_word))
+            links.setdefault(key, linked_word)
+            for headword in entry.headwords:
+                links.setdefault(headword, linked_word)  # Chains may link to any headword of the entry
+            link_positions.add(idx)
+        elif entry.definition:
+            exact_keys.setdefault(entry.key, idx)
+            for headword in entry.headwords:
+                headword_positions.setdefault(headword, idx)
+
+    def find_entry(word):
+        position = exact_keys.get(word)
+        return position if position is not None else headword_positions.get(word)
+
+    # Resolve every cross-link to the entry at the end of its chain
+    resolve = resolve_links(links, find_entry)
+    variations = defaultdict(set)  # Entry position -> cross-linked keys to add
+    unresolved = []
+    for key, linked_word in cross_links:
+        position, reason = resolve(linked_word)
+        if position is None:
+            unresolved.append((key, linked_word, reason))
+        else:
+            variations[position].add(key)
+
+    if unresolved:
+        print(f"\033[1;33mUnresolved cross-links: {len(unresolved)}\033[0m")
+        for key, linked_word, reason in unresolved:
+            print(f"{key} -> {linked_word} ({reason})")
+
+    # Update the remaining entries with new variations
+    for idx, entry in enumerate(entries):
+        if idx in link_positions:
+            continue  # Drop cross-link entries
+        if idx in variations:
+            # Append the missing headwords of the sorted variations
+            headwords = list(entry.headwords)
+            existing = set(headwords)
+            for key in sorted(variations[idx]):
+                for word in key.split("|"):
+                    if word not in existing:
+                        headwords.append(sys.intern(word))
+                        existing.add(word)
+            if len(headwords) != len(entry.headwords):
+                entry = entry.with_headwords(headwords)
+        yield entry
+
 
 def process_cross_links(input_path, output_path):
     """
-    Process cross-links in the input file. For each line with <font color="green">див.</font>:
-    - Add the variation to the linked word's key.
-    - Remove the original line with the cross-link.
-    - Ensure the output lines are stable and sorted.
-    
+    Process cross-links in the input file and write the consolidated entries.
+
     Args:
         input_path (str): Path to the input TXT file.
         output_path (str): Path to the output TXT file.
     """
-    # Dictionary to hold variations to add
-    variations = {}
-
-    # Regular expression to match specific cross-link lines
-    cross_link_pattern = re.compile(r"^(.*?)\s+<div .*?><i class=\"p\"><font color=\"green\">див\.</font></i> &lt;&lt;(.*?)&gt;&gt;</div>$")
-
-    # Read and process the file
-    updated_lines = []
-    with open(input_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            # Check if the line matches the specific cross-link pattern
-            match = cross_link_pattern.match(line.strip())
-            if match:
-                key = match.group(1).strip()
-                linked_word = match.group(2).strip()
-
-                # Add the variation to the dictionary
-                if linked_word in variations:
-                    variations[linked_word].add(key)
-                else:
-                    variations[linked_word] = {key}
-            else:
-                # Keep non-cross-link lines
-                updated_lines.append(line.strip())
-
-    # Update lines with new variations
-    final_lines = []
-    for line in updated_lines:
-        parts = line.split("\t")
-        if len(parts) > 1:
-            key = parts[0]
-            if key in variations:
-                # Sort variations alphabetically and append to the key
-                extra_variations = "|".join(sorted(variations[key]))
-                if extra_variations not in key:
-                    key = f"{key}|{extra_variations}"
-                parts[0] = key
-        final_lines.append("\t".join(parts))
-
-    # Write the updated file
-    with open(output_path, 'w', encoding='utf-8') as file:
-        file.write("\n".join(final_lines) + "\n")
+    # Stream the updated entries to the output file
+    write_entries(output_path, run(EntryFile(input_path)))
 
     print(f"Processed file saved as: {output_path}")
 
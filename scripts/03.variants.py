@@ -1,84 +1,84 @@
-import csv
+import sys
+from entries import EntryFile, write_entries
+from varcon import load_table
 
-def load_variants(csv_path):
+def load_variants(table_path):
     """
-    Load British-American spelling variants from the CSV file into a dictionary.
+    Load the compiled VarCon variant table written by 02.varcon-csv.py.
     Args:
-        csv_path (str): Path to the CSV file containing spelling variants.
+        table_path (str): Path to the variant table file.
     Returns:
-        dict: A dictionary where keys are British spellings and values are American spellings.
+        VariantTable: Every spelling variant cluster.
     """
-    variants = {}
-    with open(csv_path, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        for british, american in reader:
-            variants[british] = american
-            variants[american] = british
-    return variants
+    return load_table(table_path)
 
-def process_txt_file(txt_path, variants, output_path):
+def add_variants(entries, variants):
     """
-    Process the TXT file to add vertical-tabbed spelling variants from the CSV.
+    Add vertical-tabbed spelling variants to the dictionary entries.
     Skip adding variants if both already exist as separate items in the file.
     Args:
-        txt_path (str): Path to the input TXT file.
-        variants (dict): Dictionary of spelling variants.
-        output_path (str): Path to the output TXT file.
+        entries (iterable): Dictionary entries, iterated twice (a list or an EntryFile).
+        variants (VariantTable): Spelling variant clusters.
+    Yields:
+        Entry: The updated entries.
     """
-    # Load existing entries into a set for fast lookup
+    # Load existing headwords into a set for fast lookup
     all_existing_synonyms = set()
 
-    with open(txt_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            if not line.strip():
-                continue
-            synonyms = line.split("\t")[0].split("|")
-            all_existing_synonyms.update(synonyms)
-
-    # Process the file line by line
-    processed_lines = []
+    for entry in entries:
+        all_existing_synonyms.update(entry.headwords)
 
-    with open(txt_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            if not line.strip():
-                processed_lines.append(line)
-                continue
+    # Process the entries one by one
+    for entry in entries:
+        synonyms = list(entry.headwords)
+        existing_synonyms = set(synonyms)
 
-            # Split the line into the synonym list and the rest of the line
-            parts = line.strip().split("\t")
-            synonyms = parts[0].split("|")
-            existing_synonyms = set(synonyms)
+        # Check and add missing spelling variants
+        for synonym in entry.headwords:
+            for variant in variants.variants(synonym):
+                # Only add the variant if it doesn't already exist and is not a separate item in the file
+                if variant not in existing_synonyms and not ({synonym, variant} <= all_existing_synonyms):
+                    synonyms.append(sys.intern(variant))
+                    existing_synonyms.add(variant)
 
-            # Check and add missing spelling variants
-            for synonym in synonyms:
-                if synonym in variants:
-                    variant = variants[synonym]
-                    # Only add the variant if it doesn't already exist and is not a separate item in the file
-                    if variant not in existing_synonyms and not ({synonym, variant} <= all_existing_synonyms):
-                        synonyms.append(variant)
-                        existing_synonyms.add(variant)
+        # Keep the entry as is unless variants were added
+        if len(synonyms) != len(entry.headwords):
+            entry = entry.with_headwords(synonyms)
+        yield entry
 
-            # Rebuild the line with updated synonyms
-            updated_line = f"{'|'.join(synonyms)}"
-            if len(parts) > 1:
-                updated_line += "\t" + "\t".join(parts[1:])
-            processed_lines.append(updated_line)
-
-    # Write the updated file
-    with open(output_path, 'w', encoding='utf-8') as file:
-        file.write("\n".join(processed_lines))
+def process_txt_file(txt_path, variants, output_path):
+    """
+    Process the TXT file to add vertical-tabbed spelling variants from the variant table.
+    Args:
+        txt_path (str): Path to the input TXT file.
+        variants (VariantTable): Spelling variant clusters.
+        output_path (str): Path to the output TXT file.
+    """
+    # Stream the updated entries to the output file
+    write_entries(output_path, add_variants(EntryFile(txt_path), variants))
 
     print(f"Updated file saved as: {output_path}")
 
+def run(variants, entries):
+    """
+    In-process entry point used by main.py.
+    Args:
+        variants (VariantTable): Spelling variant clusters produced by 02.varcon-csv.py.
+        entries (iterable): Entries of the cross-linked dictionary, iterated twice.
+    Returns:
+        iterator: The dictionary entries with spelling variants added.
+    """
+    return add_variants(entries, variants)
+
 
 # Usage
 if __name__ == "__main__":
-    csv_path = "temp/british_american_variants.csv"  # Path to the CSV file
+    table_path = "temp/varcon-clusters.bin"  # Path to the variant table
     txt_path = "temp/01.crosslinks.txt"  # Path to the input TXT file
     output_path = "temp/03.british-american-variants.txt"  # Path to the output TXT file
 
     # Load spelling variants
-    variants = load_variants(csv_path)
+    variants = load_variants(table_path)
 
     # Process the TXT file and save the output
-    process_txt_file(txt_path, variants, output_path)
\ No newline at end of file
+    process_txt_file(txt_path, variants, output_path)
@@ -1,8 +1,13 @@
-import inflect
 import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from entries import EntryFile
+from inflection import NOUN_WORKERS_ENV, generate_plural, inflect_engine, is_plural, pluralize_nouns
+from inflection_cache import InflectionCache, library_version
 
-# Initialize the inflect engine
-p = inflect.engine()
+# Nouns are pluralized inline when fewer than this many are missing from the inflection cache
+POOL_MIN_NOUNS = 1000
+SHARDS_PER_WORKER = 4
 
 def load_irregular_nouns(irregular_csv_path):
     """
@@ -12,32 +17,114 @@ def load_irregular_nouns(irregular_csv_path):
     Returns:
         set: A set of all singular and plural forms of irregular nouns.
     """
-    irregular_nouns = set()
     with open(irregular_csv_path, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        for row in reader:
-            irregular_nouns.update(row)  # Add all singular and plural forms
-    return irregular_nouns
+        return irregular_nouns_from_rows(csv.reader(file))
 
-def generate_plural(singular):
+def irregular_nouns_from_rows(rows):
     """
-    Generate the plural form of an English noun using the inflect library.
+    Collect irregular nouns from (singular, plurals) rows into a set.
     Args:
-        singular (str): The singular noun.
+        rows (iterable): Rows produced by 04.irregular-nouns.py.
     Returns:
-        str: The plural form.
+        set: A set of all singular and plural forms of irregular nouns.
     """
-    return p.plural(singular)
+    irregular_nouns = set()
+    for row in rows:
+        irregular_nouns.update(row)  # Add all singular and plural forms
+    return irregular_nouns
 
-def is_plural(word):
+def noun_workers():
+    """Return the number of worker processes to pluralize nouns on, from NOUN_WORKERS_ENV (default: 1, inline)."""
+    return max(1, int(os.environ.get(NOUN_WORKERS_ENV) or 1))
+
+def pluralize_on_pool(nouns, irregular_nouns, cache, workers):
     """
-    Check if a word is plural using the inflect library.
+    Answer the inflect questions about nouns missing from the cache on a process pool.
+    Nouns are sharded in input order and every answer depends on its noun only, so the
+    answers stored in the cache, and the rows built from them, do not depend on the workers.
     Args:
-        word (str): The word to check.
+        nouns (list): Noun headwords in input order.
+        irregular_nouns (set): Irregular nouns, which do not need a plural.
+        cache (InflectionCache): Cache receiving the answers.
+        workers (int): Number of worker processes.
+    """
+    missing = [
+        (noun, noun not in irregular_nouns)
+        for noun in dict.fromkeys(nouns)
+        if not cache.has(noun, "singular_noun") or (noun not in irregular_nouns and not cache.has(noun, "plural"))
+    ]
+    if len(missing) < POOL_MIN_NOUNS:
+        return  # Not worth starting workers; get() answers them inline
+
+    inflect_engine()  # Import inflect once here, so forked workers inherit it
+    size = -(-len(missing) // (workers * SHARDS_PER_WORKER))
+    shards = [missing[start:start + size] for start in range(0, len(missing), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for answers in pool.map(pluralize_nouns, shards):
+            for noun, plural_noun, plural in answers:
+                if not cache.has(noun, "singular_noun"):
+                    cache.put(noun, "singular_noun", plural_noun)
+                if plural is not None and not cache.has(noun, "plural"):
+                    cache.put(noun, "plural", plural)
+
+def run(entries, irregular_rows, workers=None):
+    """
+    Generate regular plural forms for nouns in memory, excluding those found in the irregular nouns list.
+    Args:
+        entries (iterable): Dictionary entries, iterated twice (a list or an EntryFile).
+        irregular_rows (list): Rows produced by 04.irregular-nouns.py.
+        workers (int): Number of worker processes to pluralize nouns on; defaults to noun_workers().
     Returns:
-        bool: True if the word is plural, False otherwise.
+        list: [singular, plural] rows.
     """
-    return p.singular_noun(word) is not False
+    # Load irregular nouns
+    irregular_nouns = irregular_nouns_from_rows(irregular_rows)
+    regular_nouns = []
+
+    # Answers of the inflect engine from previous builds
+    cache = InflectionCache(library_version("inflect"))
+
+    # Parse existing entries to detect duplicates globally
+    existing_entries = set()
+    global_plural_forms = set()  # Track plural forms added globally
+    for entry in entries:
+        existing_entries.update(entry.headwords)
+
+    # Collect the headwords of nouns in input order
+    nouns = [
+        singular
+        for entry in entries
+        if '<i class="p"><font color="green">n</font></i>' in entry.definition
+        for singular in entry.headwords
+    ]
+
+    # Pluralize nouns missing from the cache on worker processes; the loop below then only reads answers
+    workers = noun_workers() if workers is None else workers
+    if workers > 1:
+        pluralize_on_pool(nouns, irregular_nouns, cache, workers)
+
+    for singular in nouns:
+        # Skip if the input word is already plural
+        if cache.get(singular, "singular_noun", is_plural):
+            continue
+
+        if singular in irregular_nouns:
+            continue  # Skip irregular nouns
+
+        plural = cache.get(singular, "plural", generate_plural)
+
+        # Skip if plural or singular forms are in the irregular nouns list
+        if plural in irregular_nouns:
+            continue
+
+        # Add the plural if it's not already in the key array, the document, or globally
+        if plural not in existing_entries and plural not in global_plural_forms:
+            regular_nouns.append([singular, plural])
+            global_plural_forms.add(plural)  # Mark plural as used globally
+
+    cache.close()
+    return regular_nouns
+
 
 def process_file(input_path, irregular_csv_path, csv_output_path):
     """
@@ -50,47 +137,11 @@ def process_file(input_path, irregular_csv_path, csv_output_path):
         csv_output_path (str): Path to the output CSV file (temp/nouns-regular.csv).
     """
     # Load irregular nouns
-    irregular_nouns = load_irregular_nouns(irregular_csv_path)
-    regular_nouns = []
+    with open(irregular_csv_path, "r", encoding="utf-8") as file:
+        irregular_rows = list(csv.reader(file))
 
     # Read the input file
-    with open(input_path, "r", encoding="utf-8") as file:
-        lines = file.readlines()
-
-    # Parse existing entries to detect duplicates globally
-    existing_entries = set()
-    global_plural_forms = set()  # Track plural forms added globally
-    for line in lines:
-        key = line.split("\t", 1)[0].strip()  # Extract the key
-        for part in key.split("|"):
-            existing_entries.add(part)
-
-    for line in lines:
-        original_line = line.strip()
-        parts = original_line.split("\t", 1)
-        keys = parts[0].strip().split("|")
-        second_column = parts[1] if len(parts) > 1 else ""
-
-        # Check if the entry is a noun
-        if '<i class="p"><font color="green">n</font></i>' in second_column:
-            for singular in keys:
-                # Skip if the input word is already plural
-                if is_plural(singular):
-                    continue
-                
-                if singular in irregular_nouns:
-                    continue  # Skip irregular nouns
-                
-                plural = generate_plural(singular)
-                
-                # Skip if plural or singular forms are in the irregular nouns list
-                if plural in irregular_nouns:
-                    continue
-                
-                # Add the plural if it's not already in the key array, the document, or globally
-                if plural not in existing_entries and plural not in global_plural_forms:
-                    regular_nouns.append([singular, plural])
-                    global_plural_forms.add(plural)  # Mark plural as used globally
+    regular_nouns = run(EntryFile(input_path), irregular_rows)
 
     # Write the regular nouns to the CSV file
     with open(csv_output_path, "w", encoding="utf-8", newline="") as csvfile:
@@ -105,4 +156,4 @@ if __name__ == "__main__":
     irregular_csv_path = "temp/nouns-irregular.csv"  # Irregular nouns CSV file path
     csv_output_file = "temp/nouns-regular.csv"  # CSV output file path
 
-    process_file(input_file, irregular_csv_path, csv_output_file)
\ No newline at end of file
+    process_file(input_file, irregular_csv_path, csv_output_file)
@@ -1,58 +1,101 @@
 import csv
-import spacy
-import pyinflect  # Ensure pyinflect is installed: pip install pyinflect
+import re
+from entries import iter_entries
+from inflection import Inflector, table_inflections
 
-def generate_comparative_and_superlative_spacy(adjective, nlp):
+TAGS = ("JJR", "JJS")
+
+
+def takes_suffix_comparison(adjective):
     """
-    Generate the comparative and superlative forms of an adjective using spaCy and pyinflect.
+    Check if an adjective regularly compares with -er/-est: one syllable, or two ending in -y.
+    Longer adjectives compare with "more" and "most", and multi-word headwords do not inflect.
+    Args:
+        adjective (str): The base (positive) form of the adjective.
+    Returns:
+        bool: True if the regular rules apply.
+    """
+    word = adjective.lower()
+    if not word.isalpha():
+        return False
+    syllables = len(re.findall(r"[aeiouy]+", word))
+    if syllables > 1 and word.endswith("e") and not word.endswith(("le", "ee")):
+        syllables -= 1  # Silent final e, as in "large"
+    return syllables == 1 or (syllables == 2 and word.endswith("y"))
+
+
+def generate_comparative_and_superlative(adjective):
+    """
+    Generate the comparative and superlative forms of an adjective from pyinflect's lookup tables,
+    falling back to the regular rules for adjectives missing from the tables that compare with -er/-est.
     Args:
         adjective (str): The base (positive) form of the adjective.
-        nlp: A spaCy language model instance.
     Returns:
         tuple: (comparative, superlative) forms, or (None, None) if not applicable.
     """
-    doc = nlp(adjective)
+    return table_inflections(adjective, "A", TAGS, rules=takes_suffix_comparison(adjective))
+
 
+def generate_comparative_and_superlative_spacy(doc):
+    """
+    Generate the comparative and superlative forms of an adjective using spaCy and pyinflect.
+    Args:
+        doc: The adjective processed by a spaCy language model.
+    Returns:
+        tuple: (comparative, superlative) forms, or (None, None) if not applicable.
+    """
     token = doc[0]
-    comparative = token._.inflect("JJR")  # Generate comparative form
-    superlative = token._.inflect("JJS")  # Generate superlative form
+    comparative = token._.inflect(TAGS[0])  # Generate comparative form
+    superlative = token._.inflect(TAGS[1])  # Generate superlative form
 
     return comparative, superlative
 
-def process_file(input_path, csv_output_path):
+def run(entries):
     """
-    Process the input file to generate a CSV of adjectives with their comparative and superlative forms
-    using spaCy and pyinflect.
+    Generate adjectives with their comparative and superlative forms in memory
+    with the selected inflection backend, see inflection.Inflector.
     Args:
-        input_path (str): Path to the input file.
-        csv_output_path (str): Path to the output CSV file.
+        entries (iterable): Dictionary entries.
+    Returns:
+        list: [adjective, comparative, superlative] rows.
     """
-    # Load spaCy model
-    nlp = spacy.load("en_core_web_sm")
+    # Answers from previous builds are reused; the spaCy model is only loaded by its backend, on a miss
+    inflect = Inflector(TAGS, generate_comparative_and_superlative, generate_comparative_and_superlative_spacy)
+
+    # Collect the adjective headwords first, so the spaCy backend can process them in batches
+    adjectives = []
+    for entry in entries:
+        # Check if the entry is an adjective
+        if '<i class="p"><font color="green">adj</font></i>' in entry.definition:
+            adjectives.extend(entry.headwords)
+    inflect.prefetch(adjectives)
 
     adjective_forms = []
     seen_forms = set()  # Track seen (comparative, superlative) pairs
 
-    # Read the input file
-    with open(input_path, "r", encoding="utf-8") as file:
-        lines = file.readlines()
+    for adjective in adjectives:
+        comparative, superlative = inflect(adjective)
+        if comparative and superlative:
+            # Skip if the (comparative, superlative) pair has been seen before
+            if (comparative, superlative) in seen_forms:
+                continue
+            seen_forms.add((comparative, superlative))  # Mark the pair as seen
+            adjective_forms.append([adjective, comparative, superlative])
 
-    for line in lines:
-        original_line = line.strip()
-        parts = original_line.split("\t", 1)
-        keys = parts[0].strip().split("|")
-        second_column = parts[1] if len(parts) > 1 else ""
+    inflect.close()
+    return adjective_forms
 
-        # Check if the entry is an adjective
-        if '<i class="p"><font color="green">adj</font></i>' in second_column:
-            for adjective in keys:
-                comparative, superlative = generate_comparative_and_superlative_spacy(adjective, nlp)
-                if comparative and superlative:
-                    # Skip if the (comparative, superlative) pair has been seen before
-                    if (comparative, superlative) in seen_forms:
-                        continue
-                    seen_forms.add((comparative, superlative))  # Mark the pair as seen
-                    adjective_forms.append([adjective, comparative, superlative])
+
+def process_file(input_path, csv_output_path):
+    """
+    Process the input file to generate a CSV of adjectives with their comparative and superlative forms
+    using pyinflect, with or without spaCy.
+    Args:
+        input_path (str): Path to the input file.
+        csv_output_path (str): Path to the output CSV file.
+    """
+    # Read the input file
+    adjective_forms = run(iter_entries(input_path))
 
     # Write the adjectives to the CSV file
     with open(csv_output_path, "w", encoding="utf-8", newline="") as csvfile:
@@ -66,4 +109,4 @@ if __name__ == "__main__":
     input_file = "temp/05.filter-irregular-nouns.txt"  # Input file path
     csv_output_file = "temp/adjectives.csv"  # CSV output file path
 
-    process_file(input_file, csv_output_file)
\ No newline at end of file
+    process_file(input_file, csv_output_file)
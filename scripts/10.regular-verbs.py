@@ -1,19 +1,30 @@
 import csv
-import spacy
-import pyinflect  # Ensure pyinflect is installed: pip install pyinflect
+from entries import EntryFile
+from inflection import Inflector, table_inflections
 
+TAGS = ("VBD", "VBN", "VBG", "VBZ")
 
-def generate_verb_forms_spacy(base, nlp):
+
+def generate_verb_forms(base):
     """
-    Generate verb forms (past tense, past participle, -ing form, third-person singular) using spaCy and pyinflect.
+    Generate verb forms (past tense, past participle, -ing form, third-person singular) from pyinflect's
+    lookup tables, falling back to the regular rules for verbs missing from the tables.
     Args:
         base (str): The base form of the verb.
-        nlp: A spaCy language model instance.
     Returns:
         tuple: (past, past_participle, ing_form, third_person), or (None, None, None, None) if not applicable.
     """
-    doc = nlp(base)
+    return table_inflections(base, "V", TAGS, rules=base.isalpha())
+
 
+def generate_verb_forms_spacy(doc):
+    """
+    Generate verb forms (past tense, past participle, -ing form, third-person singular) using spaCy and pyinflect.
+    Args:
+        doc: The base form of the verb processed by a spaCy language model.
+    Returns:
+        tuple: (past, past_participle, ing_form, third_person), or (None, None, None, None) if not applicable.
+    """
     token = doc[0]
     past = token._.inflect("VBD")  # Past tense
     past_participle = token._.inflect("VBN")  # Past participle
@@ -23,77 +34,84 @@ def generate_verb_forms_spacy(base, nlp):
     return past, past_participle, ing_form, third_person
 
 
-def process_file(input_path, irregular_csv_path, csv_output_path):
+def run(entries, irregular_rows):
     """
-    Process the input file to generate verb forms using spaCy and pyinflect,
-    excluding irregular verbs, and write the base form along with derivatives to a CSV file.
+    Generate verb forms in memory with the selected inflection backend (see inflection.Inflector),
+    excluding irregular verbs.
     Args:
-        input_path (str): Path to the input file.
-        irregular_csv_path (str): Path to the irregular verbs CSV file.
-        csv_output_path (str): Path to the output CSV file.
+        entries (iterable): Dictionary entries.
+        irregular_rows (list): Rows produced by 09.irregular-verbs.py.
+    Returns:
+        list: Rows of a base form followed by its missing derivatives.
     """
-    # Load spaCy model
-    nlp = spacy.load("en_core_web_sm")
+    # Answers from previous builds are reused; the spaCy model is only loaded by its backend, on a miss
+    inflect = Inflector(TAGS, generate_verb_forms, generate_verb_forms_spacy)
 
     # Load irregular verbs
     irregular_verbs = set()
-    with open(irregular_csv_path, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        for row in reader:
-            irregular_verbs.update(row)
+    for row in irregular_rows:
+        irregular_verbs.update(row)
+
+    # Collect all existing entries, and the regular verb headwords so the spaCy backend can process them in batches
+    existing_entries = set()
+    bases = []
+    for entry in entries:
+        existing_entries.update(entry.headwords)
+        # Check if the entry is a verb
+        if '<i class="p"><font color="green">v</font></i>' in entry.definition:
+            bases.extend(base for base in entry.headwords if base not in irregular_verbs)
+    inflect.prefetch(bases)
 
     regular_verbs = []
     all_generated_forms = set()  # Track all generated forms to avoid duplicates
 
-    # Read the input file
-    with open(input_path, "r", encoding="utf-8") as file:
-        lines = file.readlines()
+    for base in bases:
+        # Generate all forms
+        past, past_participle, ing_form, third_person = inflect(base)
 
-    # Collect all existing entries
-    existing_entries = set()
-    for line in lines:
-        key = line.split("\t", 1)[0].strip()
-        for part in key.split("|"):
-            existing_entries.add(part)
+        # Skip if forms are not generated
+        if not all([past, past_participle, ing_form, third_person]):
+            continue
 
-    for line in lines:
-        original_line = line.strip()
-        parts = original_line.split("\t", 1)
-        keys = parts[0].strip().split("|")
-        second_column = parts[1] if len(parts) > 1 else ""
+        # Use a set to collect unique missing forms
+        unique_forms = {
+            past if past not in existing_entries else None,
+            past_participle if past_participle not in existing_entries else None,
+            ing_form if ing_form not in existing_entries else None,
+            third_person if third_person not in existing_entries else None,
+        }
 
-        # Check if the entry is a verb
-        if '<i class="p"><font color="green">v</font></i>' in second_column:
-            for base in keys:
-                if base in irregular_verbs:
-                    continue
-
-                # Generate all forms using spaCy and pyinflect
-                past, past_participle, ing_form, third_person = generate_verb_forms_spacy(base, nlp)
-
-                # Skip if forms are not generated
-                if not all([past, past_participle, ing_form, third_person]):
-                    continue
-
-                # Use a set to collect unique missing forms
-                unique_forms = {
-                    past if past not in existing_entries else None,
-                    past_participle if past_participle not in existing_entries else None,
-                    ing_form if ing_form not in existing_entries else None,
-                    third_person if third_person not in existing_entries else None,
-                }
-
-                # Remove None values and filter out globally generated forms
-                unique_forms = sorted(
-                    form for form in unique_forms if form and form not in all_generated_forms
-                )
-
-                # Add new forms to the global set
-                all_generated_forms.update(unique_forms)
-
-                # If any forms are missing, add the base and its unique missing forms to the CSV
-                if unique_forms:
-                    regular_verbs.append([base] + unique_forms)
+        # Remove None values and filter out globally generated forms
+        unique_forms = sorted(
+            form for form in unique_forms if form and form not in all_generated_forms
+        )
+
+        # Add new forms to the global set
+        all_generated_forms.update(unique_forms)
+
+        # If any forms are missing, add the base and its unique missing forms to the CSV
+        if unique_forms:
+            regular_verbs.append([base] + unique_forms)
+
+    inflect.close()
+    return regular_verbs
+
+
+def process_file(input_path, irregular_csv_path, csv_output_path):
+    """
+    Process the input file to generate verb forms using pyinflect, with or without spaCy,
+    excluding irregular verbs, and write the base form along with derivatives to a CSV file.
+    Args:
+        input_path (str): Path to the input file.
+        irregular_csv_path (str): Path to the irregular verbs CSV file.
+        csv_output_path (str): Path to the output CSV file.
+    """
+    # Load irregular verbs
+    with open(irregular_csv_path, "r", encoding="utf-8") as file:
+        irregular_rows = list(csv.reader(file))
+
+    # Read the input file
+    regular_verbs = run(EntryFile(input_path), irregular_rows)
 
     # Write the regular verbs to the CSV file
     with open(csv_output_path, "w", encoding="utf-8", newline="") as csvfile:
@@ -108,4 +126,4 @@ if __name__ == "__main__":
     irregular_csv_path = "temp/verbs-irregular.csv"  # Irregular verbs CSV file path
     csv_output_file = "temp/verbs-regular.csv"  # CSV output file path
 
-    process_file(input_file, irregular_csv_path, csv_output_file)
\ No newline at end of file
+    process_file(input_file, irregular_csv_path, csv_output_file)
@@ -1,122 +1,152 @@
 import csv
-import os
+import sys
+from entries import EntryFile, write_entries
 
-def merge_csvs(csv_paths, merged_csv_path):
+class InflectionTable:
     """
-    Merge multiple CSV files into a single CSV file, ensuring no duplicate variants exist across files.
+    The regular noun, adjective and verb forms of every base word, merged once in memory.
+    The forms of each base are gathered in ordered sets, then every form is owned by the
+    first base (in row order) that lists it. Later bases listing an owned form do not get
+    it; they are kept as conflicts.
+    """
+    __slots__ = ("forms", "owners", "conflicts")
+
+    def __init__(self):
+        self.forms = {}  # Sorted forms owned by each base, in row order of the bases
+        self.owners = {}  # Base owning each form
+        self.conflicts = {}  # Other bases listing each form claimed by several bases
+
+    @classmethod
+    def from_rows(cls, row_lists):
+        """
+        Merge rows of base words followed by their forms.
+        Args:
+            row_lists (list): Row lists, one per CSV source: nouns, adjectives and verbs.
+        Returns:
+            InflectionTable: The table.
+        """
+        claimed = {}  # Forms listed by each base, as ordered sets
+        for rows in row_lists:
+            for row in rows:
+                if row:
+                    claimed.setdefault(row[0], {}).update(dict.fromkeys(row[1:]))
+
+        table = cls()
+        for base, forms in claimed.items():
+            owned = []
+            for form in forms:
+                owner = table.owners.setdefault(form, base)
+                if owner == base:
+                    owned.append(form)
+                else:
+                    table.conflicts.setdefault(form, []).append(base)
+            table.forms[base] = sorted(owned)
+        return table
+
+    def __contains__(self, base):
+        return base in self.forms
+
+    def rows(self):
+        """Return rows of each base word followed by its sorted forms, as written to all_inflections.csv."""
+        return [[base] + forms for base, forms in self.forms.items()]
+
+    def report_conflicts(self):
+        """Print the forms listed by several bases, and which base got them."""
+        for form, bases in self.conflicts.items():
+            print(f"\033[1;33m{form}: kept for {self.owners[form]}, also listed by {', '.join(bases)}\033[0m")
+        if self.conflicts:
+            print(f"\033[1;33mInflection conflicts: {len(self.conflicts)} forms listed by several bases\033[0m")
+
+def read_rows(csv_paths):
+    """
+    Read the inflection CSV files.
     Args:
         csv_paths (list): List of paths to CSV files.
-        merged_csv_path (str): Path to save the merged CSV file.
+    Returns:
+        list: Row lists, one per file.
     """
-    all_variants = {}
-    
+    row_lists = []
     for csv_path in csv_paths:
         with open(csv_path, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader, None)  # Skip header if exists
-            for row in reader:
-                key = row[0]
-                values = set(row[1:])
-                if key not in all_variants:
-                    all_variants[key] = values
-                else:
-                    all_variants[key].update(values)
-
-    # Eliminate duplicates across the entire dataset
-    all_used_variants = set()
-    for key in all_variants:
-        filtered_values = set()
-        for value in all_variants[key]:
-            if value not in all_used_variants:
-                filtered_values.add(value)
-                all_used_variants.add(value)
-        all_variants[key] = filtered_values
-
-    # Write the merged data to the new CSV file
-    with open(merged_csv_path, 'w', encoding='utf-8', newline='') as file:
-        writer = csv.writer(file)
-        for key, values in all_variants.items():
-            writer.writerow([key] + sorted(values))
-    
-    print(f"Merged CSV saved as: {merged_csv_path}")
-
-def load_variants_from_csv(csv_path):
+            row_lists.append(list(csv.reader(file)))
+    return row_lists
+
+def write_rows(csv_path, rows):
+    """Write the merged inflection rows to a CSV file."""
+    with open(csv_path, 'w', encoding='utf-8', newline='') as file:
+        csv.writer(file).writerows(rows)
+
+    print(f"Merged CSV saved as: {csv_path}")
+
+def add_inflections(entries, table):
     """
-    Load variants from a single CSV file into a dictionary.
+    Add the forms of the inflection table to the dictionary entries.
+    Skip adding forms if they already exist in the array or as separate items in the file.
+    The first pass only collects the headwords that are also forms in the table; the
+    second pass updates every entry, listing its base words before the other headwords.
     Args:
-        csv_path (str): Path to the CSV file.
-    Returns:
-        dict: A dictionary where keys are the base words and values are lists of their variants.
+        entries (iterable): Dictionary entries, iterated twice (a list or an EntryFile).
+        table (InflectionTable): Forms of each base word.
+    Yields:
+        Entry: The updated entries.
     """
-    variants = {}
-    with open(csv_path, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        next(reader, None)  # Skip header
-        for row in reader:
-            key = row[0]
-            values = row[1:]
-            if key not in variants:
-                variants[key] = values
-            else:
-                for value in values:
-                    if value not in variants[key]:
-                        variants[key].append(value)
-    return variants
-
-def process_txt_file(txt_path, variants, output_path):
+    existing_forms = set()  # Forms of the table that are headwords somewhere in the dictionary
+    owners = table.owners
+    for entry in entries:
+        existing_forms.update(headword for headword in entry.headwords if headword in owners)
+
+    forms = table.forms
+    for entry in entries:
+        synonyms = list(entry.headwords)
+        existing_synonyms = set(synonyms)
+
+        for synonym in entry.headwords:
+            for form in forms.get(synonym, ()):
+                if form not in existing_synonyms and form not in existing_forms:
+                    synonyms.append(sys.intern(form))
+                    existing_synonyms.add(form)
+
+        # Base words first, each group in its original order; duplicates stay at their first position
+        first_positions = {}
+        for position, synonym in enumerate(synonyms):
+            first_positions.setdefault(synonym, position)
+        updated_synonyms = sorted(synonyms, key=lambda x: (x not in forms, first_positions[x]))
+        yield entry.with_headwords(updated_synonyms)
+
+def process_txt_file(txt_path, table, output_path):
     """
-    Process the TXT file to add variants from the CSVs.
-    Skip adding variants if they already exist in the array or as separate items in the file.
+    Process the TXT file to add the forms of the inflection table.
     Args:
         txt_path (str): Path to the input TXT file.
-        variants (dict): Dictionary of base words and their variants.
+        table (InflectionTable): Forms of each base word.
         output_path (str): Path to the output TXT file.
     """
-    all_existing_synonyms = set()
-
-    with open(txt_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            if not line.strip():
-                continue
-            synonyms = line.split("\t")[0].split("|")
-            all_existing_synonyms.update(synonyms)
-
-    processed_lines = []
-
-    with open(txt_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            if not line.strip():
-                processed_lines.append(line)
-                continue
-
-            parts = line.strip().split("\t")
-            synonyms = parts[0].split("|")
-            existing_synonyms = set(synonyms)
-
-            for synonym in synonyms:
-                if synonym in variants:
-                    for variant in variants[synonym]:
-                        if variant not in existing_synonyms and variant not in all_existing_synonyms:
-                            synonyms.append(variant)
-                            existing_synonyms.add(variant)
-
-            updated_synonyms = sorted(synonyms, key=lambda x: (x not in variants, synonyms.index(x)))
-            updated_line = f"{'|'.join(updated_synonyms)}"
-            if len(parts) > 1:
-                updated_line += "\t" + "\t".join(parts[1:])
-            processed_lines.append(updated_line)
-
-    with open(output_path, 'w', encoding='utf-8') as file:
-        file.write("\n".join(processed_lines))
+    write_entries(output_path, add_inflections(EntryFile(txt_path), table))
 
     print(f"Updated file saved as: {output_path}")
 
+def run(entries, nouns_rows, adjectives_rows, verbs_rows):
+    """
+    In-process entry point used by main.py.
+    Args:
+        entries (iterable): Entries of the dictionary with irregular verbs merged, iterated twice.
+        nouns_rows (list): Rows produced by 06.regular-nouns.py.
+        adjectives_rows (list): Rows produced by 07.adjectives.py.
+        verbs_rows (list): Rows produced by 10.regular-verbs.py.
+    Returns:
+        tuple: Merged inflection rows and an iterator over the updated dictionary entries.
+    """
+    table = InflectionTable.from_rows([nouns_rows, adjectives_rows, verbs_rows])
+    table.report_conflicts()
+    return table.rows(), add_inflections(entries, table)
+
 if __name__ == "__main__":
     csv_paths = ["temp/nouns-regular.csv", "temp/adjectives.csv", "temp/verbs-regular.csv"]
     merged_csv_path = "temp/all_inflections.csv"
     txt_path = "temp/08.filter-irregular-verbs.txt"
     output_path = "temp/11.all-inflections.txt"
 
-    merge_csvs(csv_paths, merged_csv_path)
-    variants = load_variants_from_csv(merged_csv_path)
-    process_txt_file(txt_path, variants, output_path)
\ No newline at end of file
+    table = InflectionTable.from_rows(read_rows(csv_paths))
+    table.report_conflicts()
+    write_rows(merged_csv_path, table.rows())
+    process_txt_file(txt_path, table, output_path)
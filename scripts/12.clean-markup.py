@@ -1,82 +1,109 @@
-from pathlib import Path
-import re
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from entries import EntryFile, binary_format, is_binary, line_ranges, parse_entries, write_entries
+from markup import MarkupCleaner, clean_chunk, markup_workers
+
+# Chunks per worker process, so that a slow chunk does not leave the other workers idle
+CHUNKS_PER_WORKER = 4
+# Upper bound on the size of a chunk, which bounds the memory of the chunks in flight
+CHUNK_BYTES = 8 << 20
+# Entries per chunk of dictionaries that are not read from a TSV file
+CHUNK_ENTRIES = 5000
+
+def chunks(entries, workers):
+    """
+    Split the dictionary into chunks for the worker processes, in dictionary order.
+    A TSV file is split into line-aligned byte ranges that the workers read themselves;
+    other dictionaries are batched into lists of lines as they are iterated.
+    Args:
+        entries (iterable): Dictionary entries (a list or an EntryFile).
+        workers (int): Number of worker processes.
+    Yields:
+        A (path, start, end) byte range or a list of lines, see markup.clean_chunk().
+    """
+    if isinstance(entries, EntryFile) and not is_binary(entries.path):
+        size = os.path.getsize(entries.path)
+        chunk_size = min(CHUNK_BYTES, -(-size // (workers * CHUNKS_PER_WORKER)))
+        for start, end in line_ranges(entries.path, chunk_size):
+            yield entries.path, start, end
+        return
+
+    batch = []
+    for entry in entries:
+        batch.append(entry.to_line())
+        if len(batch) == CHUNK_ENTRIES:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def clean_on_pool(entries, cleaner, workers):
+    """
+    Clean the markup of the dictionary chunk by chunk on a process pool. Every line is cleaned
+    on its own, so the output is the same as cleaning the lines one after another.
+    Args:
+        entries (iterable): Dictionary entries (a list or an EntryFile).
+        cleaner (MarkupCleaner): Cleaner receiving the counts of the workers.
+        workers (int): Number of worker processes.
+    Yields:
+        str: The cleaned entries of each chunk as TSV text, in dictionary order.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks(entries, workers):
+            pending.append(pool.submit(clean_chunk, chunk))
+            if len(pending) < 2 * workers:
+                continue
+            text, counts = pending.popleft().result()
+            cleaner.add_counts(counts)
+            yield text
+        while pending:
+            text, counts = pending.popleft().result()
+            cleaner.add_counts(counts)
+            yield text
 
 def process_dictionary_file(input_file, output_file):
-    # Read the input file
-    with open(input_file, 'r', encoding='utf-8') as file:
-        content = file.read()
-
-    # Replace \n with <br>
-    content = content.replace('\\n', '<br>')
-
-    # Delete all occurrences of [m1]
-    content = content.replace('[m1]', '')
-
-    content = content.replace('<font color="brown">□</font>', '•')
-
-    # Remove <font color="green"> and <font color="steelblue"> with closing tags
-    content = re.sub(r'<font color="green">(.*?)</font>', r'\1', content)  # Green
-    content = re.sub(r'<font color="steelblue">(.*?)</font>', r'\1', content)  # Steelblue
-    content = re.sub(r'<font color="darkred">(.*?)</font>', r'\1', content)  # Darkred
-    content = re.sub(r'<font color="darkslateblue">(.*?)</font>', r'\1', content)  # Darkred
-
-    # Replace <<word>> with <a href="#word">word</a>
-    content = re.sub(r"&lt;&lt;(.*?)&gt;&gt;", r'<a href="#\1">\1</a>', content)
-
-    # Replace <div style="margin-left:1em">
-    content = re.sub(
-        r'<div style="margin-left:1em">(.*?)</div>',
-        r'&ensp;\1',
-        content,
-        flags=re.DOTALL
-    )
-
-    # Replace <div style="margin-left:2em">
-    content = re.sub(
-        r'<div style="margin-left:2em">(.*?)</div>',
-        r'&ensp;&ensp;\1',
-        content,
-        flags=re.DOTALL
-    )
-
-    # Replace <div style="margin-left:3em">
-    content = re.sub(
-        r'<div style="margin-left:3em"><span class="sec">(.*?)</span></div>',
-        r'&ensp;&ensp;&ensp;\1',
-        content,
-        flags=re.DOTALL
-    )
-
-    content = re.sub(
-      r'<span class="ex">(.*?)</span>',
-      r'<span>\1</span>',
-      content,
-      flags=re.DOTALL
-    )
-
-    content = re.sub(
-      r'<i class="p">(.*?)</i>',
-      r'<em>\1</em>',
-      content,
-      flags=re.DOTALL
-    )
-
-    content = re.sub(
-      r'<font color="(royalblue|red|dodgerblue|saddlebrown)">(.*?)</font>',
-      r'<span>\2</span>',
-      content,
-      flags=re.DOTALL
-    )
-
-    # Write the processed content to the output file
-    with open(output_file, 'w', encoding='utf-8') as file:
-        file.write(content)
-
-# File paths
-input_file = "temp/11.all-inflections.txt"
-output_file = "temp/12.clean-markup.txt"
-
-# Process the file
-process_dictionary_file(input_file, output_file)
-
-print(f"File processing complete. Output written to {output_file}")
+    # Stream the input file, in either intermediate format, to the output file
+    workers = markup_workers()
+    if workers == 1 or binary_format():
+        write_entries(output_file, run(EntryFile(input_file), workers))
+        return
+
+    # The workers already format TSV text, which is written as it is
+    cleaner = MarkupCleaner()
+    with open(output_file, "w", encoding="utf-8") as file:
+        for text in clean_on_pool(EntryFile(input_file), cleaner, workers):
+            file.write(text)
+    cleaner.report()
+
+def run(entries, workers=None):
+    """
+    In-process entry point used by main.py. Each entry is cleaned on its own by the
+    rule table of markup.py, so memory stays bounded however large the dictionary is,
+    and chunks of the dictionary can be cleaned on several processes.
+    The rewrites of every rule are printed at the end.
+    Args:
+        entries (iterable): Dictionary entries.
+        workers (int): Number of processes to clean markup on; defaults to markup_workers().
+    Yields:
+        Entry: The dictionary entries with markup cleaned.
+    """
+    workers = markup_workers() if workers is None else workers
+    cleaner = MarkupCleaner()
+    if workers > 1:
+        for text in clean_on_pool(entries, cleaner, workers):
+            yield from parse_entries(text.split("\n"))
+    else:
+        yield from cleaner.clean_lines(entry.to_line() for entry in entries)
+    cleaner.report()
+
+if __name__ == "__main__":
+    # File paths
+    input_file = "temp/11.all-inflections.txt"
+    output_file = "temp/12.clean-markup.txt"
+
+    # Process the file
+    process_dictionary_file(input_file, output_file)
+
+    print(f"File processing complete. Output written to {output_file}")
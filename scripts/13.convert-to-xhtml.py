@@ -1,80 +1,83 @@
-import os
-
-txt_file = "temp/12.clean-markup.txt"
-
-xhtml_header = (
-    '<?xml version="1.0" encoding="UTF-8"?>\n'
-    '<html xmlns:math="http://exslt.org/math" xmlns:svg="http://www.w3.org/2000/svg"\n'
-    '  xmlns:tl="https://kindlegen.s3.amazonaws.com/AmazonKindlePublishingGuidelines.pdf"\n'
-    '  xmlns:saxon="http://saxon.sf.net/" xmlns:xs="http://www.w3.org/2001/XMLSchema"\n'
-    '  xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"\n'
-    '  xmlns:cx="https://kindlegen.s3.amazonaws.com/AmazonKindlePublishingGuidelines.pdf"\n'
-    '  xmlns:dc="http://purl.org/dc/elements/1.1/"\n'
-    '  xmlns:mbp="https://kindlegen.s3.amazonaws.com/AmazonKindlePublishingGuidelines.pdf"\n'
-    '  xmlns:mmc="https://kindlegen.s3.amazonaws.com/AmazonKindlePublishingGuidelines.pdf"\n'
-    '  xmlns:idx="https://kindlegen.s3.amazonaws.com/AmazonKindlePublishingGuidelines.pdf">\n'
-    '<head><link rel="stylesheet" href="style.css" /></head>\n'
-    '<body>\n'
-    '<mbp:frameset>\n'
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from entries import iter_entries
+from xhtml import (
+    ShardWriter, plan_shards, remove_stale_shards, render_entry, render_shard, report_shards, shard_bytes,
+    write_opf, xhtml_workers,
 )
-xhtml_footer = (
-    '</mbp:frameset>\n'
-    '</body>\n'
-    '</html>\n'
-)
-
-# Process the generated file and write to XHTML formats
-batch_size = 15000
-entry_count = 0
-file_count = 1
-output_file = f"output/dictionary-{file_count}.xhtml"
-outfile = open(output_file, "w", encoding="utf-8")
-outfile.write(xhtml_header)
 
-with open(txt_file, "r", encoding="utf-8") as infile:
-    for line in infile:
-        if line.strip():
-            parts = line.split('\t', 1)  # Adjust delimiter as needed
-            if len(parts) == 2:
-                headword, definition = parts
+def render_on_pool(entries, output_dir, target_bytes, workers):
+    """
+    Assign entries to shards as they are read, and render and write the shards on a process pool.
+    Shard boundaries are decided from the exact size of every rendered entry, so the files are
+    byte-identical to those ShardWriter writes one entry at a time.
+    Args:
+        entries (iterable): Entries of the cleaned dictionary.
+        output_dir (str): Directory to write dictionary-N.xhtml files to.
+        target_bytes (int): Target size of an XHTML file.
+        workers (int): Number of worker processes.
+    Returns:
+        list: (path, entries, bytes) of every shard, in order.
+    """
+    shards = []
 
-                # Handle synonyms in headword (split by "|")
-                synonyms = headword.split('|')
-                main_headword = synonyms[0].strip()
-                inflections = synonyms[1:]  # Treat additional synonyms as inflections
+    def finish(future, planned_size):
+        path, count, size = future.result()
+        if size != planned_size:
+            raise RuntimeError(f"{path} has {size} bytes, {planned_size} were planned")
+        shards.append((path, count, size))
 
-                # Build dictionary entry
-                entry = f'<idx:entry name="default" scriptable="yes" spell="yes">'
-                entry += f'<h5><dt><idx:orth value="{main_headword}">{main_headword}'
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()  # At most one shard per worker waits in memory
+        for path, fields, size in plan_shards(entries, output_dir, target_bytes):
+            pending.append((pool.submit(render_shard, path, fields), size))
+            if len(pending) > workers:
+                finish(*pending.popleft())
+        while pending:
+            finish(*pending.popleft())
+    return shards
 
-                # Add inflections (if any)
-                if inflections:
-                    entry += '<idx:infl>'
-                    for inflection in inflections:
-                        entry += f'<idx:iform value="{inflection.strip()}" />'
-                    entry += '</idx:infl>'
+def convert_to_xhtml(entries, output_dir="output", target_bytes=None, workers=None):
+    """
+    Write dictionary entries as Kindle XHTML files of about a target size each, and
+    the package file listing them. Entries without a definition are left out.
+    Args:
+        entries (iterable): Entries of the cleaned dictionary.
+        output_dir (str): Directory to write dictionary-N.xhtml files and dictionary.opf to.
+        target_bytes (int): Target size of an XHTML file; defaults to shard_bytes().
+        workers (int): Number of processes to render the files on; defaults to xhtml_workers().
+    Returns:
+        list: Paths of the written XHTML files.
+    """
+    target_bytes = target_bytes or shard_bytes()
+    workers = xhtml_workers() if workers is None else workers
+    if workers > 1:
+        shards = render_on_pool(entries, output_dir, target_bytes, workers)
+    else:
+        writer = ShardWriter(output_dir, target_bytes)
+        for entry in entries:
+            if entry.definition:
+                writer.write(render_entry(entry))
+        shards = writer.close()
 
-                entry += f'</idx:orth></dt></h5>'
-                entry += f'<dd>{definition.strip()}</dd><mbp:pagebreak /></idx:entry>\n'
+    remove_stale_shards(output_dir, len(shards))
+    report_shards(shards)
+    print(f"Package file written to {write_opf(output_dir, len(shards))}")
+    return [path for path, _, _ in shards]
 
-                # Write to the current output file
-                outfile.write(entry)
-                entry_count += 1
+def run(entries):
+    """
+    In-process entry point used by main.py.
+    Args:
+        entries (iterable): Entries of the cleaned dictionary.
+    Returns:
+        list: Paths of the written XHTML files.
+    """
+    return convert_to_xhtml(entries)
 
-                # Check if batch size limit is reached
-                if entry_count >= batch_size:
-                    outfile.write(xhtml_footer)
-                    outfile.close()
-                    print(f"Written {entry_count} entries to {output_file}")
 
-                    # Start a new file
-                    file_count += 1
-                    output_file = f"output/dictionary-{file_count}.xhtml"
-                    outfile = open(output_file, "w", encoding="utf-8")
-                    outfile.write(xhtml_header)
-                    entry_count = 0
+if __name__ == "__main__":
+    txt_file = "temp/12.clean-markup.txt"
 
-# Close the final file
-outfile.write(xhtml_footer)
-outfile.close()
-print(f"Final entries written to {output_file}")
+    # Process the generated file and write to XHTML formats
+    convert_to_xhtml(iter_entries(txt_file))
@@ -0,0 +1,38 @@
+import os
+from entries import iter_entries
+from mobi import check_mobi, mobi_workers, report_mobi, write_mobi
+
+def convert_to_mobi(entries, output_file="output/dictionary.mobi", workers=None):
+    """
+    Write the dictionary as a Kindle MOBI file without kindlegen, then check its structure.
+    Args:
+        entries (iterable): Entries of the cleaned dictionary.
+        output_file (str): Path of the .mobi file.
+        workers (int): Number of processes to compress text records on; defaults to mobi_workers().
+    Returns:
+        str: Path of the written file.
+    """
+    workers = mobi_workers() if workers is None else workers
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    counts = write_mobi(output_file, entries, workers)
+    report_mobi(output_file, counts)
+    check_mobi(output_file)
+    print(f"Structure of {output_file} checked")
+    return output_file
+
+def run(entries):
+    """
+    In-process entry point used by main.py.
+    Args:
+        entries (iterable): Entries of the cleaned dictionary.
+    Returns:
+        str: Path of the written file.
+    """
+    return convert_to_mobi(entries)
+
+
+if __name__ == "__main__":
+    txt_file = "temp/12.clean-markup.txt"
+
+    # Write the cleaned dictionary as a MOBI file
+    convert_to_mobi(iter_entries(txt_file))
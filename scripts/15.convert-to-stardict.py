@@ -0,0 +1,34 @@
+from entries import iter_entries
+from stardict import check_stardict, report_stardict, write_stardict
+
+def convert_to_stardict(entries, output_dir="output/stardict"):
+    """
+    Write the dictionary in the StarDict format, then check the files.
+    Args:
+        entries (iterable): Entries of the cleaned dictionary.
+        output_dir (str): Directory to write the .ifo, .idx, .syn and .dict.dz files to.
+    Returns:
+        str: The directory of the written files.
+    """
+    counts = write_stardict(output_dir, entries)
+    report_stardict(output_dir, counts)
+    check_stardict(output_dir)
+    print(f"Files in {output_dir} checked")
+    return output_dir
+
+def run(entries):
+    """
+    In-process entry point used by main.py.
+    Args:
+        entries (iterable): Entries of the cleaned dictionary.
+    Returns:
+        str: The directory of the written files.
+    """
+    return convert_to_stardict(entries)
+
+
+if __name__ == "__main__":
+    txt_file = "temp/12.clean-markup.txt"
+
+    # Write the cleaned dictionary as StarDict files
+    convert_to_stardict(iter_entries(txt_file))
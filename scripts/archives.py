@@ -0,0 +1,59 @@
+import io
+import os
+import zipfile
+
+
+def text_members(zip_ref, names=None):
+    """
+    Select the members of a zip archive to read, in archive order.
+    Args:
+        zip_ref (zipfile.ZipFile): The open archive.
+        names (list): Base names of the members to read; by default every .txt member,
+            skipping directories and macOS resource forks in __MACOSX/.
+    Returns:
+        list: ZipInfo objects of the selected members.
+    """
+    members = [
+        info for info in zip_ref.infolist()
+        if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+    ]
+    if names is None:
+        return [info for info in members if info.filename.lower().endswith(".txt")]
+
+    by_name = {os.path.basename(info.filename): info for info in members}
+    for name in names:
+        if name not in by_name:
+            raise KeyError(f"There is no item named {name!r} in the archive")
+    return [by_name[name] for name in names]
+
+
+def iter_zip_lines(zip_path, encoding="utf-8", names=None):
+    """
+    Stream the lines of text members of a zip archive without extracting them to disk.
+    Each member is decompressed and decoded incrementally, one buffer at a time;
+    the lines of several members follow each other in archive order.
+    Args:
+        zip_path (str): Path to the zip file.
+        encoding (str): Text encoding of the members.
+        names (list): Base names of the members to read; see text_members().
+    Yields:
+        str: Lines of the members, with their line endings.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for info in text_members(zip_ref, names):
+            with zip_ref.open(info) as member, io.TextIOWrapper(member, encoding=encoding) as text:
+                yield from text
+
+
+def extracted_size(zip_path, names=None):
+    """
+    Return the uncompressed size of text members of a zip archive, which extracting
+    them to disk would have written and then read back.
+    Args:
+        zip_path (str): Path to the zip file.
+        names (list): Base names of the members; see text_members().
+    Returns:
+        int: The total uncompressed size in bytes.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        return sum(info.file_size for info in text_members(zip_ref, names))
@@ -0,0 +1,371 @@
+import argparse
+import io
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from itertools import islice
+from links import classify, link_target
+
+# Environment variable selecting the format write_entries() uses: "tsv" (default) or "binary"
+FORMAT_ENV = "INTERMEDIATE_FORMAT"
+
+# Binary format: header, definition offset table, headwords section, definitions section
+BINARY_MAGIC = b"ENTR"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sHHIQ")  # magic, version, flags, entry count, headwords section size
+FLAG_TAGS = 1  # The offset table is followed by one link tag byte per entry
+
+
+class Entry:
+    """
+    A dictionary entry in the intermediate `headwords<TAB>definition` format.
+    Headwords are the "|"-separated keys of the first column, interned so that equal
+    headwords share one string across stages. The definition is everything after the
+    first tab; it is only sliced out of the source line (or decoded from the UTF-8
+    bytes of a binary file) when it is first accessed, so stages that only look at
+    headwords never copy it. The link tag of the definition (see links.py) is computed
+    once, when first needed, or restored from a binary file that stored it.
+    """
+    __slots__ = ("headwords", "_line", "_definition", "_tag")
+
+    def __init__(self, headwords, definition=""):
+        self.headwords = headwords
+        self._line = None
+        self._definition = definition
+        self._tag = None
+
+    @classmethod
+    def from_line(cls, line):
+        """
+        Parse a line of the intermediate format.
+        Args:
+            line (str): A `headwords<TAB>definition` line, with or without a trailing newline.
+        Returns:
+            Entry: The parsed entry.
+        """
+        line = line.strip()
+        tab = line.find("\t")
+        key = line if tab < 0 else line[:tab]
+
+        entry = cls.__new__(cls)
+        entry.headwords = [sys.intern(headword) for headword in key.strip().split("|")]
+        if tab < 0:
+            entry._line = None
+            entry._definition = ""
+        else:
+            entry._line = line
+            entry._definition = None
+        entry._tag = None
+        return entry
+
+    @classmethod
+    def from_record(cls, key, payload, tag=None):
+        """
+        Build an entry from a record of the binary format, leaving the definition undecoded.
+        Args:
+            key (str): Headwords joined with "|".
+            payload (bytes): The UTF-8 encoded definition.
+            tag (int): The stored link tag of the definition, if any.
+        Returns:
+            Entry: The entry.
+        """
+        entry = cls.__new__(cls)
+        entry.headwords = [sys.intern(headword) for headword in key.split("|")]
+        if payload:
+            entry._line = payload
+            entry._definition = None
+        else:
+            entry._line = None
+            entry._definition = ""
+        entry._tag = tag
+        return entry
+
+    @property
+    def definition(self):
+        """The definition column, an empty string if the line had none."""
+        if self._definition is None:
+            if isinstance(self._line, bytes):
+                self._definition = self._line.decode("utf-8")
+            else:
+                self._definition = self._line[self._line.find("\t") + 1:]
+            self._line = None
+        return self._definition
+
+    def encoded_definition(self):
+        """The definition as UTF-8 bytes, without decoding it if it came from a binary file."""
+        if isinstance(self._line, bytes):
+            return self._line
+        return self.definition.encode("utf-8")
+
+    @property
+    def tag(self):
+        """The link tag of the definition: links.REGULAR or the kind of link line."""
+        if self._tag is None:
+            self._tag = classify(self.definition)
+        return self._tag
+
+    def link_target(self):
+        """The "|"-joined words a link line points at, or None for a regular article."""
+        return link_target(self.tag, self.definition)
+
+    @property
+    def key(self):
+        """The first column: headwords joined with "|"."""
+        return "|".join(self.headwords)
+
+    def with_headwords(self, headwords):
+        """Return a copy of the entry with other headwords, sharing the definition."""
+        entry = Entry.__new__(Entry)
+        entry.headwords = headwords
+        entry._line = self._line
+        entry._definition = self._definition
+        entry._tag = self._tag
+        return entry
+
+    def to_line(self):
+        """Format the entry as a line without a trailing newline; entries without a definition have no tab."""
+        definition = self.definition
+        return f"{self.key}\t{definition}" if definition else self.key
+
+    def __repr__(self):
+        return f"Entry({self.headwords!r}, {self.definition[:40]!r})"
+
+
+def parse_entries(lines):
+    """
+    Parse lines of the intermediate format, skipping blank lines.
+    Args:
+        lines (iterable): Lines with or without trailing newlines.
+    Yields:
+        Entry: The parsed entries.
+    """
+    for line in lines:
+        if line.strip():
+            yield Entry.from_line(line)
+
+
+def dump_binary(file, entries, spool):
+    """
+    Write entries in the binary intermediate format.
+    The file starts with BINARY_HEADER, followed by entry count + 1 little-endian 64-bit offsets
+    into the definitions section, one link tag byte per entry (with FLAG_TAGS), the headwords section (the "|"-joined headwords of each entry,
+    UTF-8 encoded and separated by newlines) and the definitions section (UTF-8 definitions
+    back to back, stored as opaque byte ranges). The definitions go through the spool first,
+    so only the headwords and offsets are kept in memory.
+    Args:
+        file (file): Binary file to write to.
+        entries (iterable): Entries to write.
+        spool (file): Binary scratch file holding the definitions until the headwords are written.
+    """
+    keys = []
+    offsets = array("Q", [0])
+    tags = array("B")
+    size = 0
+    for entry in entries:
+        keys.append(entry.key)
+        tags.append(entry.tag)
+        payload = entry.encoded_definition()
+        spool.write(payload)
+        size += len(payload)
+        offsets.append(size)
+    if sys.byteorder == "big":
+        offsets.byteswap()
+
+    headwords = "\n".join(keys).encode("utf-8")
+    file.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, FLAG_TAGS, len(keys), len(headwords)))
+    file.write(offsets.tobytes())
+    file.write(tags.tobytes())
+    file.write(headwords)
+    spool.seek(0)
+    shutil.copyfileobj(spool, file)
+
+
+def pack_entries(entries):
+    """
+    Encode entries in the binary intermediate format.
+    Args:
+        entries (iterable): Entries to encode.
+    Returns:
+        bytes: The encoded file.
+    """
+    buffer = io.BytesIO()
+    dump_binary(buffer, entries, io.BytesIO())
+    return buffer.getvalue()
+
+
+def iter_binary(file):
+    """
+    Stream the entries of a binary intermediate file. Only the headwords are decoded;
+    each definition stays a byte range until an entry's definition is accessed, and
+    stored link tags spare stages from matching it again.
+    Args:
+        file (file): Binary file positioned at its start.
+    Yields:
+        Entry: The entries of the file.
+    """
+    magic, version, flags, count, headwords_size = BINARY_HEADER.unpack(file.read(BINARY_HEADER.size))
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"Unsupported intermediate file (magic {magic!r}, version {version})")
+
+    offsets = array("Q")
+    offsets.fromfile(file, count + 1)
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    tags = file.read(count) if flags & FLAG_TAGS else [None] * count
+
+    keys = file.read(headwords_size).decode("utf-8").split("\n") if count else []
+    for key, start, end, tag in zip(keys, offsets, islice(offsets, 1, None), tags):
+        yield Entry.from_record(key, file.read(end - start), tag)
+
+
+def is_binary(path):
+    """Return True if the file at path is in the binary intermediate format."""
+    with open(path, "rb") as file:
+        return file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def binary_format():
+    """Return True if write_entries() should write the binary format, as selected by FORMAT_ENV."""
+    return os.environ.get(FORMAT_ENV, "tsv") == "binary"
+
+
+def iter_entries(path):
+    """
+    Stream the entries of a file in the intermediate format, either TSV or binary.
+    Args:
+        path (str): Path to the TXT file.
+    Yields:
+        Entry: The entries of the file, one at a time.
+    """
+    with open(path, "rb") as file:
+        if file.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+            file.seek(0)
+            yield from iter_binary(file)
+            return
+    with open(path, "r", encoding="utf-8") as file:
+        yield from parse_entries(file)
+
+
+def line_ranges(path, chunk_size):
+    """
+    Split a TSV intermediate file into byte ranges that each end at the end of a line.
+    Args:
+        path (str): Path to the TXT file.
+        chunk_size (int): Bytes per range; a range extends to the end of the line it stops in.
+    Returns:
+        list: (start, end) byte offsets covering the whole file in order.
+    """
+    ranges = []
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        start = 0
+        while start < size:
+            file.seek(min(start + max(chunk_size, 1), size) - 1)
+            file.readline()  # Up to and including the newline at or after the seek position
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def read_lines(path, start, end):
+    """
+    Read the lines of a byte range of a TSV intermediate file, with newlines translated as in text mode.
+    Args:
+        path (str): Path to the TXT file.
+        start (int): Offset of the first line, see line_ranges().
+        end (int): Offset after the last line.
+    Returns:
+        io.StringIO: The lines of the range.
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return io.StringIO(data.decode("utf-8"), newline=None)
+
+
+def read_entries(path):
+    """
+    Read a file in the intermediate format, either TSV or binary.
+    Args:
+        path (str): Path to the TXT file.
+    Returns:
+        list: The entries of the file.
+    """
+    return list(iter_entries(path))
+
+
+class EntryFile:
+    """
+    A file in the intermediate format that streams its entries from disk each time it is iterated.
+    Stages that need several passes over the dictionary accept it in place of a list of entries,
+    so streaming mode never holds the whole dictionary in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        return iter_entries(self.path)
+
+    def __repr__(self):
+        return f"EntryFile({self.path!r})"
+
+
+def format_entries(entries):
+    """
+    Format entries as the text of an intermediate file.
+    Args:
+        entries (iterable): Entries to format.
+    Returns:
+        str: One line per entry, each terminated by a newline.
+    """
+    return "".join(f"{entry.to_line()}\n" for entry in entries)
+
+
+def serialize_entries(entries, binary=None):
+    """
+    Encode entries as the bytes of an intermediate file.
+    Args:
+        entries (iterable): Entries to encode.
+        binary (bool): Use the binary format; defaults to the format selected by FORMAT_ENV.
+    Returns:
+        bytes: The encoded file.
+    """
+    if binary is None:
+        binary = binary_format()
+    return pack_entries(entries) if binary else format_entries(entries).encode("utf-8")
+
+
+def write_entries(path, entries, binary=None):
+    """
+    Write entries as a file in the intermediate format.
+    Args:
+        path (str): Path to the TXT file.
+        entries (iterable): Entries to write.
+        binary (bool): Write the binary format; defaults to the format selected by FORMAT_ENV.
+    """
+    if binary is None:
+        binary = binary_format()
+    if binary:
+        with open(path, "wb") as file, tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path))) as spool:
+            dump_binary(file, entries, spool)
+        return
+    with open(path, "w", encoding="utf-8") as file:
+        for entry in entries:
+            file.write(f"{entry.to_line()}\n")
+
+
+# Convert intermediate files between TSV and the binary format, e.g. to inspect or validate them
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert intermediate dictionary files between TSV and binary.")
+    parser.add_argument("direction", choices=["to-tsv", "to-binary"], help="format to convert to")
+    parser.add_argument("input_path", help="intermediate file in either format")
+    parser.add_argument("output_path", help="path of the converted file")
+    args = parser.parse_args()
+
+    write_entries(args.output_path, read_entries(args.input_path), binary=args.direction == "to-binary")
+    print(f"Converted {args.input_path} to {args.output_path}")
@@ -0,0 +1,213 @@
+import os
+from functools import lru_cache
+from inflection_cache import InflectionCache, library_version, source_digest
+
+SPACY_MODEL = "en_core_web_sm"
+
+# Environment variable with the number of worker processes 06.regular-nouns.py pluralizes nouns on
+NOUN_WORKERS_ENV = "NOUN_WORKERS"
+
+# Environment variable selecting how 07.adjectives.py and 10.regular-verbs.py inflect words:
+# the spaCy model, pyinflect's lookup tables, or both with their disagreements reported.
+# The tables also give rule-made forms to words token._.inflect leaves without any, so spaCy
+# stays the default until compare mode shows the tables agree with it on the real dictionary.
+BACKEND_ENV = "INFLECTION_BACKEND"
+BACKENDS = ("spacy", "pyinflect", "compare")
+DEFAULT_BACKEND = "spacy"
+
+# Environment variables with the nlp.pipe batch size and worker processes of the spaCy backend
+SPACY_BATCH_SIZE_ENV = "SPACY_BATCH_SIZE"
+SPACY_WORKERS_ENV = "SPACY_WORKERS"
+DEFAULT_SPACY_BATCH_SIZE = 1000
+
+# Components of SPACY_MODEL that token._.inflect does not need: it only reads tags and lemmas
+SPACY_UNUSED_COMPONENTS = ("parser", "ner")
+
+@lru_cache(maxsize=None)
+def load_spacy_model(name=SPACY_MODEL):
+    """
+    Load a spaCy model once per process, so stages that run in-process share it.
+    spaCy and pyinflect are only imported here, so stages whose inflections are all
+    in the inflection cache never pay for importing them.
+    Args:
+        name (str): Name of the installed spaCy model.
+    Returns:
+        A spaCy language model instance.
+    """
+    import spacy
+    import pyinflect  # noqa: F401  Registers token._.inflect; ensure pyinflect is installed: pip install pyinflect
+    return spacy.load(name)
+
+def table_inflections(lemma, pos_type, tags, rules=True):
+    """
+    Inflect a base form with pyinflect's lookup tables, without spaCy. The word is taken
+    as its own lemma, which holds for dictionary headwords; the capitalization of the word
+    is kept, as token._.inflect does.
+    Args:
+        lemma (str): The base form.
+        pos_type (str): "A" for adjectives or "V" for verbs.
+        tags (tuple): Penn Treebank tags to inflect for, e.g. ("JJR", "JJS").
+        rules (bool): Fall back to pyinflect's regular inflection rules for words missing from its tables.
+    Returns:
+        tuple: The first form for each tag, or None where the word has none.
+    """
+    import pyinflect
+    forms = pyinflect.getAllInflections(lemma, pos_type)
+    if not forms and rules:
+        forms = pyinflect.getAllInflectionsOOV(lemma, pos_type)
+    return tuple(forms[tag][0] if forms.get(tag) else None for tag in tags)
+
+def inflection_backend():
+    """Return the inflection backend selected by the BACKEND_ENV environment variable."""
+    backend = os.environ.get(BACKEND_ENV) or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inflection backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    return backend
+
+def spacy_batch_size():
+    """Return the number of words per nlp.pipe batch, from SPACY_BATCH_SIZE_ENV (default: DEFAULT_SPACY_BATCH_SIZE)."""
+    return max(1, int(os.environ.get(SPACY_BATCH_SIZE_ENV) or DEFAULT_SPACY_BATCH_SIZE))
+
+def spacy_workers():
+    """Return the number of processes nlp.pipe runs the spaCy model on, from SPACY_WORKERS_ENV (default: 1)."""
+    return max(1, int(os.environ.get(SPACY_WORKERS_ENV) or 1))
+
+class Inflector:
+    """
+    Inflects words for a fixed set of tags with the selected backend, remembering answers
+    in the inflection cache. Each backend keeps its own answers. In "compare" mode both
+    backends answer every word; the spaCy answers are used and every word on which
+    the pyinflect tables disagree is reported when the inflector is closed.
+    Stages hand all their words to prefetch() first, so the spaCy model processes the
+    words missing from the cache in batches rather than one call per word.
+    """
+
+    def __init__(self, tags, table_inflect, spacy_inflect, backend=None, batch_size=None, workers=None):
+        """
+        Args:
+            tags (tuple): Penn Treebank tags asked for, e.g. ("JJR", "JJS").
+            table_inflect (callable): Inflects a word with pyinflect's tables, see table_inflections().
+            spacy_inflect (callable): Inflects a word from its spaCy Doc.
+            backend (str): One of BACKENDS; by default taken from the BACKEND_ENV environment variable.
+            batch_size (int): Words per nlp.pipe batch; by default see spacy_batch_size().
+            workers (int): Processes nlp.pipe runs on; by default see spacy_workers().
+        """
+        self.backend = backend or inflection_backend()
+        self.batch_size = batch_size or spacy_batch_size()
+        self.workers = workers or spacy_workers()
+        self.tag = " ".join(tags)
+        self.table_inflect = table_inflect
+        self.spacy_inflect = spacy_inflect
+        self.table_cache = self.spacy_cache = None
+        if self.backend in ("pyinflect", "compare"):
+            self.table_cache = InflectionCache(f"tables {library_version('pyinflect')} {self.rules_digest()[:16]}")
+        if self.backend in ("spacy", "compare"):
+            self.spacy_cache = InflectionCache(library_version("spacy", "pyinflect", SPACY_MODEL))
+        self.disagreements = []  # (word, spaCy forms, table forms)
+
+    def rules_digest(self):
+        """
+        Return the digest of the sources deciding which words the pyinflect tables may give rule-made
+        forms: this module, with table_inflections(), and the stage defining table_inflect.
+        """
+        return source_digest([os.path.abspath(__file__), os.path.abspath(self.table_inflect.__code__.co_filename)])
+
+    def parse(self, words):
+        """
+        Run words through the spaCy model in batches, without SPACY_UNUSED_COMPONENTS.
+        Args:
+            words (list): Words to process.
+        Returns:
+            iterator: A Doc for each word, in order.
+        """
+        # Starting worker processes only pays off for more than one batch
+        workers = self.workers if len(words) > self.batch_size else 1
+        return load_spacy_model().pipe(
+            words, batch_size=self.batch_size, n_process=workers, disable=SPACY_UNUSED_COMPONENTS
+        )
+
+    def prefetch(self, words):
+        """
+        Answer the words missing from the spaCy backend's cache in batches. Does nothing
+        for the pyinflect backend, whose lookups are cheap one at a time.
+        Args:
+            words (iterable): Words the stage is about to inflect, in any order.
+        """
+        if self.spacy_cache is None:
+            return
+        missing = [word for word in dict.fromkeys(words) if not self.spacy_cache.has(word, self.tag)]
+        if not missing:
+            return  # The model is only loaded on a miss
+        for word, doc in zip(missing, self.parse(missing)):
+            self.spacy_cache.put(word, self.tag, self.spacy_inflect(doc))
+
+    def __call__(self, word):
+        """
+        Inflect a word.
+        Args:
+            word (str): The base form.
+        Returns:
+            list: The form for each tag, or None where the backend has none.
+        """
+        if self.spacy_cache is None:
+            return self.table_cache.get(word, self.tag, self.table_inflect)
+
+        # Words that were not prefetched are processed on their own
+        forms = self.spacy_cache.get(word, self.tag, lambda word: self.spacy_inflect(next(self.parse([word]))))
+        if self.table_cache is not None:
+            table_forms = self.table_cache.get(word, self.tag, self.table_inflect)
+            if table_forms != forms:
+                self.disagreements.append((word, forms, table_forms))
+        return forms
+
+    def close(self):
+        """Write new answers to the inflection cache and, in "compare" mode, report the disagreements."""
+        for cache in (self.table_cache, self.spacy_cache):
+            if cache is not None:
+                cache.close()
+        if self.backend != "compare":
+            return
+        for word, forms, table_forms in self.disagreements:
+            print(f"\033[1;33m{word}: spaCy {forms}, pyinflect tables {table_forms}\033[0m")
+        print(f"\033[1;33mBackends disagree on {len(self.disagreements)} words ({self.tag})\033[0m")
+
+@lru_cache(maxsize=None)
+def inflect_engine():
+    """Initialize the inflect engine once per process; importing inflect takes seconds and a warm cache never needs it."""
+    import inflect
+    return inflect.engine()
+
+def is_plural(word):
+    """
+    Check if a word is plural using the inflect library.
+    Args:
+        word (str): The word to check.
+    Returns:
+        bool: True if the word is plural, False otherwise.
+    """
+    return inflect_engine().singular_noun(word) is not False
+
+def generate_plural(singular):
+    """
+    Generate the plural form of an English noun using the inflect library.
+    Args:
+        singular (str): The singular noun.
+    Returns:
+        str: The plural form.
+    """
+    return inflect_engine().plural(singular)
+
+def pluralize_nouns(shard):
+    """
+    Process pool worker: answer the questions 06.regular-nouns.py asks about a shard of nouns,
+    with one inflect engine per worker process.
+    Args:
+        shard (list): (noun, needs_plural) pairs; the plural is only generated for singular nouns that need it.
+    Returns:
+        list: (noun, is_plural, plural) triples, where plural is None when it was not generated.
+    """
+    answers = []
+    for noun, needs_plural in shard:
+        plural_noun = is_plural(noun)
+        answers.append((noun, plural_noun, generate_plural(noun) if needs_plural and not plural_noun else None))
+    return answers
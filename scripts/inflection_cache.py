@@ -0,0 +1,155 @@
+import hashlib
+import importlib.metadata
+import json
+import os
+import sqlite3
+
+# Environment variable naming the SQLite cache file; empty to disable the cache
+CACHE_ENV = "INFLECTION_CACHE"
+DEFAULT_CACHE_PATH = os.path.join(".cache", "inflections.sqlite")
+
+
+def library_version(*names):
+    """
+    Describe the installed versions of the libraries (or spaCy models) producing inflections.
+    Args:
+        names (str): Distribution names, e.g. "spacy", "en_core_web_sm".
+    Returns:
+        str: Space-separated name=version pairs; a missing library has the version "none".
+    """
+    versions = []
+    for name in names:
+        try:
+            versions.append(f"{name}={importlib.metadata.version(name)}")
+        except importlib.metadata.PackageNotFoundError:
+            versions.append(f"{name}=none")
+    return " ".join(versions)
+
+
+def source_digest(paths):
+    """
+    Return the SHA-256 hex digest of source files whose code decides the answers of a library,
+    so that editing them drops the answers cached before the edit.
+    Args:
+        paths (iterable): Paths of the source files.
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def connect(path):
+    """Open the SQLite cache file, creating its table if needed. Concurrent stages wait for each other's writes."""
+    connection = sqlite3.connect(path, timeout=60)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS inflections ("
+        "library TEXT NOT NULL, word TEXT NOT NULL, tag TEXT NOT NULL, answer TEXT NOT NULL, "
+        "PRIMARY KEY (library, word, tag)) WITHOUT ROWID"
+    )
+    return connection
+
+
+class InflectionCache:
+    """
+    Answers of an inflection library, persisted across builds in a SQLite table keyed by
+    (word, tag, library version). All answers for the library version are loaded when the
+    cache is opened; answers computed during the run are written back when it is closed,
+    so the library only sees words it has never answered before.
+    """
+
+    def __init__(self, library, path=None):
+        """
+        Args:
+            library (str): Library and model versions, see library_version().
+            path (str): Path to the SQLite file; by default taken from the CACHE_ENV environment
+                variable, falling back to DEFAULT_CACHE_PATH. Empty to keep answers for this run only.
+        """
+        if path is None:
+            path = os.environ.get(CACHE_ENV, DEFAULT_CACHE_PATH)
+        self.library = library
+        self.path = path
+        self.answers = {}
+        self.new_answers = {}
+        self.hits = 0
+        self.misses = 0
+        self.unread = set()  # Keys stored by put() and not looked up yet
+        if path and os.path.exists(path):
+            connection = connect(path)
+            try:
+                rows = connection.execute(
+                    "SELECT word, tag, answer FROM inflections WHERE library = ?", (library,)
+                )
+                self.answers = {(word, tag): answer for word, tag, answer in rows}
+            finally:
+                connection.close()
+
+    def get(self, word, tag, compute):
+        """
+        Return the cached answer for a word, computing and remembering it on a miss.
+        Args:
+            word (str): The word to inflect.
+            tag (str): What is asked about the word, e.g. "plural" or "JJR JJS".
+            compute (callable): Called with the word on a miss; returns a JSON-serializable answer.
+        Returns:
+            The answer, with tuples returned as lists.
+        """
+        key = (word, tag)
+        answer = self.answers.get(key)
+        if answer is not None:
+            if key in self.unread:
+                self.unread.discard(key)  # Already counted as a miss by put()
+            else:
+                self.hits += 1
+            return json.loads(answer)
+
+        self.misses += 1
+        value = compute(word)
+        answer = self.answers[key] = self.new_answers[key] = json.dumps(value)
+        return json.loads(answer)
+
+    def has(self, word, tag):
+        """Return True if the answer for a word is cached."""
+        return (word, tag) in self.answers
+
+    def put(self, word, tag, value):
+        """
+        Remember an answer computed outside get(), e.g. on a process pool. It counts as a miss.
+        Args:
+            word (str): The inflected word.
+            tag (str): What was asked about the word.
+            value: The JSON-serializable answer.
+        """
+        key = (word, tag)
+        self.misses += 1
+        self.answers[key] = self.new_answers[key] = json.dumps(value)
+        self.unread.add(key)
+
+    def hit_rate(self):
+        """Return the share of lookups answered from the cache, or None before the first lookup."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def close(self):
+        """Write the answers computed during this run to the cache file and print the hit rate."""
+        if self.path and self.new_answers:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = connect(self.path)
+            try:
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO inflections VALUES (?, ?, ?, ?)",
+                        ((self.library, word, tag, answer) for (word, tag), answer in self.new_answers.items()),
+                    )
+            finally:
+                connection.close()
+            self.new_answers = {}
+
+        rate = self.hit_rate()
+        if rate is not None:
+            print(f"\033[1;32mInflection cache: {self.hits} hits, {self.misses} misses ({rate:.1%} hit rate)\033[0m")
@@ -0,0 +1,62 @@
+import re
+
+# Tags of dictionary lines: regular articles, and the link lines pointing at another article
+REGULAR = 0
+CROSSLINK = 1  # див. <<word>>
+PLURAL = 2  # pl <<singular>>
+PAST = 3  # past від <<verb>>
+PAST_PARTICIPLE = 4  # p.p. від <<verb>>
+
+TAG_NAMES = ["regular", "crosslink", "plural", "past", "pp"]
+
+# Every link line ends with the linked words, so other lines are rejected by their last characters
+LINK_SUFFIX = "&gt;&gt;</div>"
+
+# Literal each kind of link line contains, checked before its regular expression; the group holds the linked words
+LINK_PATTERNS = [
+    (CROSSLINK, "див.", re.compile(
+        r"^\s*<div .*?><i class=\"p\"><font color=\"green\">див\.</font></i> &lt;&lt;(.*?)&gt;&gt;</div>$"
+    )),
+    (PLURAL, "<font color=\"green\">pl</font>", re.compile(
+        r"^\s*<div style=\"margin-left:1em\"><i class=\"p\"><font color=\"green\">pl</font></i>.*?&lt;&lt;([^<>&]*?)&gt;&gt;</div>$"
+    )),
+    (PAST, "past</font>", re.compile(
+        r"^\s*<div style=\"margin-left:1em\"><i class=\"p\"><font color=\"green\">past</font></i> <i class=\"p\"><font color=\"green\">від</font></i> &lt;&lt;([^<>&]*?)&gt;&gt;</div>$"
+    )),
+    (PAST_PARTICIPLE, "p.p.</font>", re.compile(
+        r"^\s*<div style=\"margin-left:1em\"><i class=\"p\"><font color=\"green\">p\.p\.</font></i> <i class=\"p\"><font color=\"green\">від</font></i> &lt;&lt;([^<>&]*?)&gt;&gt;</div>$"
+    )),
+]
+
+PATTERNS = {tag: pattern for tag, _, pattern in LINK_PATTERNS}
+
+
+def classify(definition):
+    """
+    Tag a definition as a regular article or as one of the link lines. Each pattern only
+    runs on definitions ending like a link line and containing the literal of its kind.
+    Args:
+        definition (str): The definition of an entry.
+    Returns:
+        int: REGULAR, CROSSLINK, PLURAL, PAST or PAST_PARTICIPLE.
+    """
+    if not definition.endswith((LINK_SUFFIX, LINK_SUFFIX + "\n")):
+        return REGULAR
+    for tag, literal, pattern in LINK_PATTERNS:
+        if literal in definition and pattern.match(definition):
+            return tag
+    return REGULAR
+
+
+def link_target(tag, definition):
+    """
+    Extract the linked words of a link line.
+    Args:
+        tag (int): The tag of the definition, from classify().
+        definition (str): The definition of an entry.
+    Returns:
+        str: The linked words, stripped and still joined with "|", or None for a regular article.
+    """
+    if tag == REGULAR:
+        return None
+    return PATTERNS[tag].match(definition).group(1).strip()
@@ -0,0 +1,312 @@
+import argparse
+import bisect
+import functools
+import html
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from entries import BINARY_HEADER, BINARY_MAGIC, FLAG_TAGS
+from xhtml import render_fields
+
+# The final intermediate file, and the index built next to it on first use
+SOURCE_PATH = "temp/12.clean-markup.txt"
+INDEX_SUFFIX = ".index"
+DEFAULT_CACHE_SIZE = 4096  # Rendered entries kept by the LRU cache
+DEFAULT_PORT = 8000
+
+# Index file: header, key offset table, entry table, keys section
+INDEX_MAGIC = b"LKIX"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sHHIQQQ")  # magic, version, flags, key count, source size, source mtime, keys section size
+KEY_OFFSET = struct.Struct("<Q")
+ENTRY_RANGES = struct.Struct("<QQII")  # Offsets in the source file of the entry's headwords and definition, then their sizes
+
+
+def index_path_for(source_path):
+    """Return the path of the index built for an intermediate file."""
+    return source_path + INDEX_SUFFIX
+
+
+def source_stamp(source_path):
+    """Return the size and modification time an index records of its source file, to detect a stale index."""
+    status = os.stat(source_path)
+    return status.st_size, status.st_mtime_ns
+
+
+def tsv_ranges(path):
+    """
+    Find the headwords and definition of every entry of a TSV intermediate file, without
+    decoding definitions. Lines are stripped the way entries.Entry.from_line() strips them.
+    Args:
+        path (str): Path to the TXT file.
+    Yields:
+        tuple: The "|"-joined headwords, then the (start, size) byte ranges of the headwords and the definition.
+    """
+    position = 0
+    with open(path, "rb") as file:
+        for raw in file:
+            line_start = position
+            position += len(raw)
+            tab = raw.find(b"\t")
+            if tab < 0:
+                continue  # No definition, so nothing to look up
+            head = raw[:tab].decode("utf-8")
+            key = head.strip()
+            if not key:
+                continue
+            key_start = line_start + len(head[:len(head) - len(head.lstrip())].encode("utf-8"))
+            definition_end = len(raw.rstrip(b"\r\n"))
+            if not raw[tab + 1:definition_end].strip():
+                continue
+            yield key, (key_start, len(key.encode("utf-8"))), (line_start + tab + 1, definition_end - tab - 1)
+
+
+def binary_ranges(path):
+    """
+    Find the headwords and definition of every entry of a binary intermediate file, reading
+    only its offset table and headwords section.
+    Args:
+        path (str): Path to the TXT file.
+    Yields:
+        tuple: The "|"-joined headwords, then the (start, size) byte ranges of the headwords and the definition.
+    """
+    with open(path, "rb") as file:
+        magic, version, flags, count, headwords_size = BINARY_HEADER.unpack(file.read(BINARY_HEADER.size))
+        offsets = array("Q")
+        offsets.fromfile(file, count + 1)
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        if flags & FLAG_TAGS:
+            file.seek(count, os.SEEK_CUR)
+        headwords_start = file.tell()
+        headwords = file.read(headwords_size)
+    definitions_start = headwords_start + headwords_size
+    key_start = 0
+    for number in range(count):
+        key_end = headwords.find(b"\n", key_start)
+        key_end = len(headwords) if key_end < 0 else key_end
+        size = offsets[number + 1] - offsets[number]
+        if size:
+            key = headwords[key_start:key_end].decode("utf-8")
+            yield key, (headwords_start + key_start, key_end - key_start), (definitions_start + offsets[number], size)
+        key_start = key_end + 1
+
+
+def build_index(source_path, index_path):
+    """
+    Build the lookup index of an intermediate file: every main headword and inflection of an
+    entry with a definition, sorted by UTF-8 bytes, with the byte ranges of the entry's
+    headwords and definition in the source file. The source file itself stays the
+    definitions file; the index holds no definitions.
+    Args:
+        source_path (str): Intermediate file in either format.
+        index_path (str): Path of the index file.
+    Returns:
+        int: Number of keys.
+    """
+    size, mtime = source_stamp(source_path)
+    with open(source_path, "rb") as file:
+        binary = file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+    records = []
+    for number, (key, headwords, definition) in enumerate((binary_ranges if binary else tsv_ranges)(source_path)):
+        ranges = ENTRY_RANGES.pack(headwords[0], definition[0], headwords[1], definition[1])
+        for headword in dict.fromkeys(headword.strip() for headword in key.split("|")):
+            if headword:
+                records.append((headword.encode("utf-8"), number, ranges))
+    records.sort()
+
+    key_offsets = array("Q", [0])
+    for key, _, _ in records:
+        key_offsets.append(key_offsets[-1] + len(key))
+    if sys.byteorder == "big":
+        key_offsets.byteswap()
+    keys = b"".join(key for key, _, _ in records)
+    partial = f"{index_path}.partial"
+    with open(partial, "wb") as file:
+        file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, len(records), size, mtime, len(keys)))
+        file.write(key_offsets.tobytes())
+        file.write(b"".join(ranges for _, _, ranges in records))
+        file.write(keys)
+    os.replace(partial, index_path)  # Readers never see a half-written index
+    return len(records)
+
+
+class Keys:
+    """The sorted keys of a memory-mapped index as a sequence, so that bisect searches them in place."""
+
+    def __init__(self, data, table, keys, count):
+        self.data = data
+        self.keys = keys
+        self.count = count
+        self.offsets = memoryview(data)[table:table + KEY_OFFSET.size * (count + 1)].cast("Q")  # No copy
+        if sys.byteorder == "big":
+            self.offsets = array("Q", self.offsets)
+            self.offsets.byteswap()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, number):
+        offsets = self.offsets
+        return self.data[self.keys + offsets[number]:self.keys + offsets[number + 1]]
+
+    def release(self):
+        """Release the view of the offset table, so that the index can be unmapped."""
+        if isinstance(self.offsets, memoryview):
+            self.offsets.release()
+
+
+class Dictionary:
+    """
+    Look up words in an intermediate file through its memory-mapped index. Opening maps both
+    files and reads the index header only; a lookup binary-searches the keys in place and
+    renders the entries it finds as Kindle <idx:entry> elements. LRU caches keep the most
+    recent rendered entries, shared by all the keys of an entry, and the most recent words.
+    """
+
+    def __init__(self, source_path=SOURCE_PATH, index_path=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.source_path = source_path
+        self.index_path = index_path or index_path_for(source_path)
+        self.built = False
+        if not self.index_is_current():
+            build_index(source_path, self.index_path)
+            self.built = True
+
+        with open(source_path, "rb") as file:
+            self.source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(self.index_path, "rb") as file:
+            self.index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, _, self.count, _, _, _ = INDEX_HEADER.unpack_from(self.index, 0)
+        table = INDEX_HEADER.size
+        self.entries = table + KEY_OFFSET.size * (self.count + 1)
+        self.keys = Keys(self.index, table, self.entries + ENTRY_RANGES.size * self.count, self.count)
+        self.render = functools.lru_cache(maxsize=cache_size)(self.render_entry)
+        self.lookup = functools.lru_cache(maxsize=cache_size)(self.lookup_word)
+
+    def index_is_current(self):
+        """Return True if the index exists and was built from the current source file."""
+        try:
+            with open(self.index_path, "rb") as file:
+                magic, version, _, _, size, mtime, _ = INDEX_HEADER.unpack(file.read(INDEX_HEADER.size))
+        except (OSError, struct.error):
+            return False
+        return magic == INDEX_MAGIC and version == INDEX_VERSION and (size, mtime) == source_stamp(self.source_path)
+
+    def ranges(self, number):
+        """Return the byte ranges of the headwords and definition of the entry of the key at a position of the index."""
+        return ENTRY_RANGES.unpack_from(self.index, self.entries + ENTRY_RANGES.size * number)
+
+    def render_entry(self, key_start, definition_start, key_size, definition_size):
+        """Render an entry from the byte ranges of its headwords and definition, see ranges()."""
+        headwords = self.source[key_start:key_start + key_size].decode("utf-8").split("|")
+        definition = self.source[definition_start:definition_start + definition_size].decode("utf-8")
+        return render_fields(headwords, definition)
+
+    def find(self, word):
+        """Return the index positions of the keys equal to a word; a word not found is retried in lower case."""
+        for candidate in dict.fromkeys((word.strip(), word.strip().lower())):
+            key = candidate.encode("utf-8")
+            start = bisect.bisect_left(self.keys, key)
+            end = start
+            while end < self.count and self.keys[end] == key:
+                end += 1
+            if end > start:
+                return range(start, end)
+        return range(0)
+
+    def lookup_word(self, word):
+        """
+        Look up a word among the main headwords and inflections; cached as lookup().
+        Args:
+            word (str): The word.
+        Returns:
+            tuple: The rendered entries of the word, in dictionary order.
+        """
+        return tuple(self.render(*self.ranges(number)) for number in self.find(word))
+
+    def close(self):
+        self.keys.release()
+        self.source.close()
+        self.index.close()
+
+
+def lookup_handler(dictionary):
+    """Return an HTTP request handler class answering lookups from a Dictionary."""
+
+    class LookupHandler(BaseHTTPRequestHandler):
+        # GET /lookup?word=went answers JSON; GET /?word=went answers an HTML page with a search form
+        def do_GET(self):
+            url = urlsplit(self.path)
+            word = parse_qs(url.query).get("word", [""])[0]
+            if url.path == "/lookup":
+                entries = dictionary.lookup(word) if word else []
+                body = json.dumps({"word": word, "entries": entries}, ensure_ascii=False)
+                self.respond(200 if entries else 404, "application/json", body)
+            elif url.path == "/":
+                entries = dictionary.lookup(word) if word else []
+                results = "".join(entries) if entries else (f"<p>{html.escape(word)}: not found</p>" if word else "")
+                body = (
+                    '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Lookup</title></head><body>'
+                    f'<form><input name="word" value="{html.escape(word, quote=True)}" autofocus> '
+                    f'<button>Look up</button></form>{results}</body></html>'
+                )
+                self.respond(200, "text/html", body)
+            else:
+                self.respond(404, "text/plain", "Not found")
+
+        def respond(self, status, content_type, body):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # Lookups are answered too often to log each one
+
+    return LookupHandler
+
+
+def serve(dictionary, host="127.0.0.1", port=DEFAULT_PORT):
+    """Answer lookups over HTTP until interrupted."""
+    server = ThreadingHTTPServer((host, port), lookup_handler(dictionary))
+    print(f"\033[1;32mServing {dictionary.count} keys of {dictionary.source_path} on http://{host}:{port}/\033[0m")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# Look up words in the final intermediate file, or serve lookups over HTTP
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up words in an intermediate dictionary file.")
+    parser.add_argument("--source", default=SOURCE_PATH, help=f"intermediate file in either format (default: {SOURCE_PATH})")
+    parser.add_argument("--index", help=f"index file, built on first use (default: the source path + {INDEX_SUFFIX})")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, metavar="N", help="rendered entries and words to cache")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="rebuild the index")
+    lookup = commands.add_parser("lookup", help="print the rendered entries of words")
+    lookup.add_argument("words", nargs="+")
+    server = commands.add_parser("serve", help="answer lookups over HTTP")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_index(args.source, args.index or index_path_for(args.source))
+        print(f"Indexed {count} keys of {args.source}")
+    elif args.command == "lookup":
+        dictionary = Dictionary(args.source, args.index, args.cache_size)
+        for word in args.words:
+            entries = dictionary.lookup(word)
+            print(f"{word}: " + ("".join(entries) if entries else "not found\n"), end="")
+    else:
+        serve(Dictionary(args.source, args.index, args.cache_size), args.host, args.port)
@@ -0,0 +1,324 @@
+import os
+import re
+from collections import Counter
+from time import perf_counter
+from entries import Entry, format_entries, parse_entries, read_lines
+
+# Environment variable enabling per-rule timing in MarkupCleaner; hit counts are always kept
+PROFILE_ENV = "MARKUP_PROFILE"
+# Environment variable with the number of processes 12.clean-markup.py cleans chunks of the dictionary on
+WORKERS_ENV = "MARKUP_WORKERS"
+
+# Sentinel rank of tags no rule rewrites, such as <div> or <span class="sec"> on their own
+PASSIVE = float("inf")
+
+
+class Rule:
+    """
+    A markup rewrite rule. A literal rule replaces a fixed string. A pair rule rewrites an
+    opening tag, the first closing tag after it and the content between them, with a
+    template where \\1 stands for the content. Tags of a pair rule belong to the group
+    named after the last tag of its closer, such as "font" for </font>.
+    """
+    __slots__ = ("name", "openers", "closer", "replacement", "flags", "pattern", "parts", "group")
+
+    def __init__(self, name, openers, closer=None, replacement="", flags=0):
+        """
+        Args:
+            name (str): Name of the rule in the statistics.
+            openers (str or tuple): The literal, or the opening tags of a pair rule.
+            closer (str): The closing tag of a pair rule; None for a literal rule.
+            replacement (str): The replacement of a literal, or the template of a pair.
+            flags (int): Regular expression flags of the pair pattern, e.g. re.DOTALL.
+        """
+        self.name = name
+        self.openers = (openers,) if isinstance(openers, str) else openers
+        self.closer = closer
+        self.replacement = replacement
+        self.flags = flags
+        self.pattern = None
+        self.parts = None
+        self.group = None
+        if closer is not None:
+            opener = "|".join(re.escape(opener) for opener in self.openers)
+            self.pattern = re.compile(f"(?:{opener})(.*?){re.escape(closer)}", flags)
+            self.parts = replacement.split("\\1")
+            last_tag = re.search(r"</(\w+)>$", closer)
+            self.group = last_tag.group(1) if last_tag else closer
+
+    def apply(self, text):
+        """Apply the rule on its own to a whole text, returning the new text and the number of rewrites."""
+        if self.closer is None:
+            return text.replace(self.openers[0], self.replacement), text.count(self.openers[0])
+        return self.pattern.subn(self.replacement, text)
+
+
+# The rules of 12.clean-markup.py, in the order the original chain of replacements applied them
+RULES = [
+    Rule("newline", "\\n", replacement="<br>"),
+    Rule("m1", "[m1]"),
+    Rule("brown-square", '<font color="brown">□</font>', replacement="•"),
+    Rule("green", '<font color="green">', "</font>", r"\1"),
+    Rule("steelblue", '<font color="steelblue">', "</font>", r"\1"),
+    Rule("darkred", '<font color="darkred">', "</font>", r"\1"),
+    Rule("darkslateblue", '<font color="darkslateblue">', "</font>", r"\1"),
+    Rule("link", "&lt;&lt;", "&gt;&gt;", r'<a href="#\1">\1</a>'),
+    Rule("margin-1em", '<div style="margin-left:1em">', "</div>", r"&ensp;\1", re.DOTALL),
+    Rule("margin-2em", '<div style="margin-left:2em">', "</div>", r"&ensp;&ensp;\1", re.DOTALL),
+    Rule(
+        "margin-3em", '<div style="margin-left:3em"><span class="sec">', "</span></div>",
+        r"&ensp;&ensp;&ensp;\1", re.DOTALL,
+    ),
+    Rule("example", '<span class="ex">', "</span>", r"<span>\1</span>", re.DOTALL),
+    Rule("part-of-speech", '<i class="p">', "</i>", r"<em>\1</em>", re.DOTALL),
+    Rule(
+        "font", tuple(f'<font color="{color}">' for color in ("royalblue", "red", "dodgerblue", "saddlebrown")),
+        "</font>", r"<span>\1</span>", re.DOTALL,
+    ),
+]
+
+# Token kinds of the single pass
+LITERAL, OPEN, PASSIVE_OPEN, CLOSE, SPLIT, INERT, FALLBACK = range(7)
+
+
+class MarkupCleaner:
+    """
+    Applies a rule table to dictionary lines in a single regular expression pass.
+    Every opening and closing tag the rules know is found by one alternation and
+    dispatched through a stack of open tags, writing each rewrite in place.
+
+    The rules used to run one after another, each pairing an opening tag with the
+    first matching closer left by the rules before it. The single pass gives the same
+    result whenever tags are nested and a tag only holds tags of its group that an
+    earlier rule rewrites, e.g. a green <font> inside a royalblue one. Lines breaking
+    that, or with stray "<", ">", "&lt;" or "&gt;" text that a rewrite could join into
+    a new tag, are cleaned by applying the rules one after another instead.
+    """
+
+    def __init__(self, rules=RULES, profile=None):
+        """
+        Args:
+            rules (list): The rule table, in order of application.
+            profile (bool): Also time each rule; by default enabled by the PROFILE_ENV environment variable.
+        """
+        if profile is None:
+            profile = bool(os.environ.get(PROFILE_ENV))
+        self.rules = rules
+        self.profile = profile
+        self.hits = Counter()  # Rewrites per rule name
+        self.seconds = Counter()  # Time per rule name, with profile enabled
+        self.lines = 0
+        self.fallbacks = 0  # Lines cleaned by applying the rules one after another
+
+        # Action of every token the rules look for: its kind, then what the single pass needs
+        self.actions = {}
+        groups = set()
+        for rank, rule in enumerate(rules):
+            if rule.closer is None:
+                self.actions[rule.openers[0]] = (LITERAL, rule.replacement, rule.name)
+                continue
+            groups.add(rule.group)
+            for opener in rule.openers:
+                self.actions[opener] = (OPEN, rule.parts, rule.closer, rule.name, rule.group, rank)
+        for rule in rules:
+            if rule.closer is not None:
+                closers = re.findall(r"</\w+>", rule.closer)
+                self.actions.setdefault(rule.closer, (SPLIT, closers) if len(closers) > 1 else (CLOSE,))
+                for closer in closers:
+                    self.actions.setdefault(closer, (CLOSE,))
+        # The first tag of a longer token can become that token once a rule removes what follows it
+        for token in list(self.actions):
+            first_tag = re.match(r"<[^<>]*>", token)
+            if first_tag and first_tag.group() != token:
+                self.actions.setdefault(first_tag.group(), (FALLBACK,))
+
+        tag_groups = "|".join(sorted(group for group in groups if group.isalnum()))
+        self.passive = re.compile(rf"<({tag_groups})\b[^<>\[\\&]*>")  # Opening tags of a group no rule rewrites
+        self.inert = re.compile(r"</?[^<>\[\\&]*>")  # Tags of other elements
+        self.tokenizer = re.compile(
+            "(" + "|".join(re.escape(token) for token in sorted(self.actions, key=len, reverse=True))
+            + rf"|<(?:{tag_groups})\b[^<>\[\\&]*>|{self.inert.pattern}|&lt;|&gt;|&(?![#\w]+;)|<|>)"
+        )
+
+    def action(self, token):
+        """Return the action of a token found by the tokenizer, classifying and remembering tags no rule names."""
+        action = self.actions.get(token)
+        if action is None:
+            passive = self.passive.fullmatch(token)
+            if passive:
+                group = passive.group(1)
+                action = (PASSIVE_OPEN, group, f"</{group}>")
+            elif self.inert.fullmatch(token):
+                action = (INERT,)
+            else:
+                action = (FALLBACK,)  # Stray "<", ">", "&lt;", "&gt;" or "&"
+            self.actions[token] = action
+        return action
+
+    def clean(self, line):
+        """
+        Clean the markup of a dictionary line.
+        Args:
+            line (str): A line of the intermediate format, without its newline.
+        Returns:
+            str: The cleaned line.
+        """
+        self.lines += 1
+        cleaned = self.single_pass(line)
+        if cleaned is None:
+            self.fallbacks += 1
+            cleaned = self.rule_by_rule(line)
+        return cleaned
+
+    def clean_lines(self, lines):
+        """
+        Clean the markup of dictionary lines, dropping lines left blank.
+        Args:
+            lines (iterable): Lines of the intermediate format, as formatted by Entry.to_line().
+        Yields:
+            Entry: The cleaned entries.
+        """
+        for line in lines:
+            line = self.clean(line)
+            if line.strip():
+                yield Entry.from_line(line)
+
+    def single_pass(self, line):
+        """Rewrite a line in one pass, or return None if the result could differ from rule_by_rule()."""
+        profile = self.profile
+        if profile:
+            seconds = Counter()
+            started = perf_counter()
+        pieces = self.tokenizer.split(line)  # Text and tokens, alternating; tokens are replaced in place
+        if profile:
+            now = perf_counter()
+            seconds["tokenizer"] += now - started
+            started = now
+        if len(pieces) == 1:
+            return line
+        actions = self.actions
+        hits = []  # Names of the rules rewriting the line, counted once the pass succeeds
+        stack = []  # Open tags: (closer, template parts, rule name, group, rank of the enclosing tag, index)
+        ranks = {}  # Rank of the innermost open tag of each group
+
+        for index in range(1, len(pieces), 2):
+            token = pieces[index]
+            action = actions.get(token) or self.action(token)
+            kind = action[0]
+            name = None
+            if kind == CLOSE or kind == SPLIT:
+                if not stack:
+                    return None
+                if stack[-1][0] == token:
+                    closers = (token,)
+                elif kind == SPLIT:
+                    closers = action[1]  # e.g. </span></div> closing a <span class="ex"> and then a <div>
+                else:
+                    return None
+                pieces[index] = ""
+                for closer in closers:
+                    if not stack:
+                        return None
+                    frame_closer, parts, name, group, outer_rank, opened = stack.pop()
+                    if frame_closer != closer:
+                        return None
+                    ranks[group] = outer_rank
+                    if parts is None:
+                        pieces[index] += closer  # A tag no rule rewrites
+                    elif len(parts) == 2:
+                        pieces[index] += parts[1]
+                        hits.append(name)
+                    else:
+                        content = "".join(pieces[opened + 1:index])
+                        pieces[index] += content.join(parts[1:])  # The content again after each later part
+                        hits.append(name)
+            elif kind == OPEN:
+                _, parts, closer, name, group, rank = action
+                outer_rank = ranks.get(group)
+                if outer_rank is not None and outer_rank <= rank:
+                    return None  # The outer tag would close at this tag's closer
+                ranks[group] = rank
+                stack.append((closer, parts, name, group, outer_rank, index))
+                pieces[index] = parts[0]
+            elif kind == LITERAL:
+                pieces[index] = action[1]
+                name = action[2]
+                hits.append(name)
+            elif kind == PASSIVE_OPEN:
+                group = action[1]
+                if group in ranks and ranks[group] is not None:
+                    return None  # A rule would pair its opening tag with this tag's closer
+                ranks[group] = PASSIVE
+                stack.append((action[2], None, None, group, None, index))
+            elif kind == FALLBACK:
+                return None
+
+            if profile:
+                now = perf_counter()
+                seconds[name or "other tags"] += now - started
+                started = now
+
+        if stack:
+            return None
+        self.hits.update(hits)
+        if profile:
+            self.seconds.update(seconds)
+        return "".join(pieces)
+
+    def rule_by_rule(self, line):
+        """Apply the rules to a line one after another, each to the whole line."""
+        for rule in self.rules:
+            if self.profile:
+                started = perf_counter()
+                line, count = rule.apply(line)
+                self.seconds[rule.name] += perf_counter() - started
+            else:
+                line, count = rule.apply(line)
+            self.hits[rule.name] += count
+        return line
+
+    def counts(self):
+        """Return the statistics of the cleaner, to be merged into another one with add_counts()."""
+        return self.hits, self.seconds, self.lines, self.fallbacks
+
+    def add_counts(self, counts):
+        """Add the statistics of another cleaner, e.g. one on a worker process, to this one."""
+        hits, seconds, lines, fallbacks = counts
+        self.hits.update(hits)
+        self.seconds.update(seconds)
+        self.lines += lines
+        self.fallbacks += fallbacks
+
+    def report(self):
+        """Print the rewrites, and with profiling the time, of every rule."""
+        print(
+            f"\033[1;32mCleaned markup of {self.lines} lines, {self.fallbacks} of them rule by rule\033[0m"
+        )
+        rule_names = [rule.name for rule in self.rules]
+        names = rule_names + [name for name in ("tokenizer", "other tags") if name in self.seconds]
+        if self.profile:
+            names.sort(key=lambda name: self.seconds[name], reverse=True)
+        for name in names:
+            rewrites = f"{self.hits[name]:>10} rewrites" if name in rule_names else " " * 19  # Time only
+            timing = f" {self.seconds[name] * 1000:10.1f} ms" if self.profile else ""
+            print(f"  {name:<16} {rewrites}{timing}")
+
+
+def markup_workers():
+    """Return the number of processes to clean markup on, from WORKERS_ENV (default: 1, inline)."""
+    return max(1, int(os.environ.get(WORKERS_ENV) or 1))
+
+
+def clean_chunk(chunk):
+    """
+    Process pool worker: clean the markup of a chunk of the dictionary with a cleaner of its own.
+    Args:
+        chunk: A (path, start, end) byte range of a TSV intermediate file, see entries.line_ranges(),
+            or a list of lines as formatted by Entry.to_line().
+    Returns:
+        tuple: The cleaned entries as TSV text, each followed by a newline, and the counts() of the cleaner.
+    """
+    if isinstance(chunk, tuple):
+        chunk = (entry.to_line() for entry in parse_entries(read_lines(*chunk)))
+    cleaner = MarkupCleaner()
+    return format_entries(cleaner.clean_lines(chunk)), cleaner.counts()
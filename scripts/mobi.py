@@ -0,0 +1,859 @@
+import argparse
+import bisect
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from entries import iter_entries
+from xhtml import CREATOR, IN_LANGUAGE, OUT_LANGUAGE, PUBLISHER, TITLE
+
+# Environment variable with the number of processes 14.convert-to-mobi.py compresses text records on
+WORKERS_ENV = "MOBI_WORKERS"
+
+# PalmDOC text records and their LZ77 compression
+RECORD_SIZE = 4096  # Bytes of text per record, before compression
+MAX_DISTANCE = 2047
+MAX_MATCH = 10
+RECORDS_PER_TASK = 64  # Text records compressed per process pool task
+
+# Headers
+PDB_HEADER = struct.Struct(">32sHHIIIIII4s4sIIH")
+PDB_NAME = b"eng-ukr-dictionary"
+PALMDOC_HEADER = struct.Struct(">HHIHHHH")
+PALMDOC_COMPRESSION = 2
+MOBI_HEADER_LENGTH = 0xE8
+MOBI_BOOK = 2
+UTF8 = 65001
+NULL_INDEX = 0xFFFFFFFF
+EXTRA_MULTIBYTE = 1  # Text records end with the bytes completing their last character
+LOCALES = {"en": 0x09, "uk": 0x22}  # Windows language identifiers
+
+# EXTH records with the metadata of dictionary.opf
+EXTH_CREATOR = 100
+EXTH_PUBLISHER = 101
+EXTH_TITLE = 503
+EXTH_LANGUAGE = 524
+EXTH_DICTIONARY_IN = 531
+EXTH_DICTIONARY_OUT = 532
+
+# The orth index: one entry per main headword, with the position and length of its article and
+# the inflection group of its inflections
+INDEX_HEADER_LENGTH = 192
+INDEX_RECORD_BYTES = 0xF000  # IDXT offsets are 16-bit, so index records stay below 64 KiB
+TAG_START = 1
+TAG_LENGTH = 2
+TAG_GROUP = 0x2A
+BOTH_TAGS = 0x03  # Control byte of an entry with one start and one length
+GROUP_FLAG = 0x04  # Control byte flag of an entry with an inflection group
+ORTH_TAGX = (
+    b"TAGX" + struct.pack(">II", 12 + 4 * 4, 1)
+    + bytes((TAG_START, 1, 0x01, 0, TAG_LENGTH, 1, 0x02, 0, TAG_GROUP, 1, GROUP_FLAG, 0, 0, 0, 0, 1))
+)
+
+# The inflection index: groups of rules, each turning a main headword into one of its inflections,
+# then the rules, sorted. Group entries have an empty key and list the name and the entry of each
+# of their rules; rule entries have the rule as their key. A record with the rule names follows.
+TAG_NAMES = 0x05
+TAG_RULES = 0x1A
+MAX_COUNTED_RULES = 0x0E  # Control byte of a group: the number of its rules in each half, or 0xFF and their byte sizes
+INFLECTION_TAGX = (
+    b"TAGX" + struct.pack(">II", 12 + 3 * 4, 1)
+    + bytes((TAG_NAMES, 1, 0x0F, 0, TAG_RULES, 1, 0xF0, 0, 0, 0, 0, 1))
+)
+INFLECTION_NAMES = b"\x80\0\0\0"  # A single unnamed inflection at offset 0, as idx:iform has no name
+RULE_INSERT_END = 0x02  # Insert the following bytes at the cursor, at the end of the word
+RULE_DELETE_END = 0x03  # Delete the following bytes before the cursor, from the end of the word
+RULE_LITERAL = 0x14  # Lower bytes are rule operations, not characters
+
+FLIS = b"FLIS\0\0\0\x08\0\x41\0\0\0\0\0\0\xff\xff\xff\xff\0\x01\0\x03\0\0\0\x03\0\0\0\x01" + b"\xff" * 4
+EOF_RECORD = b"\xe9\x8e\r\n"
+
+BOOK_START = b"<html><head><guide></guide></head><body>"
+BOOK_END = b"</body></html>"
+ARTICLE_START = b"<idx:entry"
+ARTICLE_END = b"</idx:entry>"
+
+
+def mobi_workers():
+    """Return the number of processes to compress text records on, from WORKERS_ENV (default: 1, inline)."""
+    return max(1, int(os.environ.get(WORKERS_ENV) or 1))
+
+
+def palmdoc_compress(data):
+    """
+    Compress a text record with the LZ77 variant of PalmDOC: literal bytes, runs of up to 8
+    escaped bytes, a space merged into the next ASCII letter, and back references of 3 to 10
+    bytes up to 2047 bytes back.
+    Args:
+        data (bytes): At most RECORD_SIZE bytes of text.
+    Returns:
+        bytes: The compressed record.
+    """
+    out = bytearray()
+    rfind = data.rfind
+    size = len(data)
+    i = 0
+    while i < size:
+        if i >= 3 and size - i >= 3:
+            window = i - MAX_DISTANCE if i > MAX_DISTANCE else 0
+            match = rfind(data[i:i + 3], window, i)
+            if match >= 0:
+                length = 3
+                limit = min(MAX_MATCH, size - i)
+                while True:
+                    while length < limit and data[match + length] == data[i + length]:
+                        length += 1
+                    if length == limit:
+                        break
+                    longer = rfind(data[i:i + length + 1], window, i)
+                    if longer < 0:
+                        break
+                    match = longer
+                    length += 1
+                out += (0x8000 | ((i - match) << 3) | (length - 3)).to_bytes(2, "big")
+                i += length
+                continue
+
+        byte = data[i]
+        if byte == 0x20 and i + 1 < size and 0x40 <= data[i + 1] < 0x80:
+            out.append(data[i + 1] ^ 0x80)
+            i += 2
+        elif byte == 0 or 0x09 <= byte < 0x80:
+            out.append(byte)
+            i += 1
+        else:
+            end = i + 1
+            while end < size and end - i < 8 and not (data[end] == 0 or 0x09 <= data[end] < 0x80):
+                end += 1
+            out.append(end - i)
+            out += data[i:end]
+            i = end
+    return bytes(out)
+
+
+def palmdoc_decompress(data):
+    """Decompress a PalmDOC text record, see palmdoc_compress()."""
+    out = bytearray()
+    size = len(data)
+    i = 0
+    while i < size:
+        byte = data[i]
+        i += 1
+        if 1 <= byte <= 8:
+            out += data[i:i + byte]
+            i += byte
+        elif byte < 0x80:
+            out.append(byte)
+        elif byte >= 0xC0:
+            out.append(0x20)
+            out.append(byte ^ 0x80)
+        else:
+            pair = (byte << 8) | data[i]
+            i += 1
+            distance = (pair >> 3) & 0x7FF
+            length = (pair & 7) + 3
+            start = len(out) - distance
+            if distance >= length:
+                out += out[start:start + length]
+            else:
+                for offset in range(length):
+                    out.append(out[start + offset])
+    return bytes(out)
+
+
+def compress_records(chunks):
+    """Process pool worker: compress text records, see palmdoc_compress()."""
+    return [palmdoc_compress(chunk) for chunk in chunks]
+
+
+def encode_number(value):
+    """Encode a number in the forward variable-width format of index entries: 7 bits per byte, the last byte flagged."""
+    groups = bytearray()
+    while True:
+        groups.append(value & 0x7F)
+        value >>= 7
+        if not value:
+            break
+    groups[0] |= 0x80
+    groups.reverse()
+    return bytes(groups)
+
+
+def decode_number(data, offset):
+    """Decode a number written by encode_number(). Returns the number and the offset after it."""
+    value = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value = (value << 7) | (byte & 0x7F)
+        if byte & 0x80:
+            return value, offset
+
+
+def inflection_rule(headword, inflection):
+    """
+    Encode the rule that turns the UTF-8 bytes of a headword into an inflection: delete the end of the
+    headword after their common prefix, then insert the end of the inflection. The cursor stays at the
+    end of the word, so both are written last byte first.
+    Args:
+        headword (str): Main headword.
+        inflection (str): One of its inflections, other than the headword itself.
+    Returns:
+        bytes: The rule, or None if it cannot be encoded: it would be longer than 255 bytes,
+        or a word has a byte that is also a rule operation.
+    """
+    common = 0
+    while common < min(len(headword), len(inflection)) and headword[common] == inflection[common]:
+        common += 1
+    deleted = headword[common:].encode("utf-8")[::-1]
+    inserted = inflection[common:].encode("utf-8")[::-1]
+    rule = (bytes((RULE_DELETE_END,)) + deleted if deleted else b"") + (bytes((RULE_INSERT_END,)) + inserted if inserted else b"")
+    if not rule or len(rule) > 255 or min(deleted + inserted) < RULE_LITERAL:
+        return None
+    return rule
+
+
+def apply_rule(headword, rule):
+    """
+    Apply an inflection rule written by inflection_rule() to the UTF-8 bytes of a headword.
+    Raises:
+        ValueError: The rule has other operations or deletes bytes the headword does not end with.
+    """
+    word = bytearray(headword)
+    mode = None
+    for byte in rule:
+        if byte in (RULE_INSERT_END, RULE_DELETE_END):
+            mode = byte
+            cursor = len(word)
+        elif byte >= RULE_LITERAL and mode == RULE_INSERT_END:
+            word.insert(cursor, byte)  # The cursor does not move, so each byte goes before the previous one
+        elif byte >= RULE_LITERAL and mode == RULE_DELETE_END:
+            if not word or word.pop() != byte:
+                raise ValueError(f"Inflection rule {rule!r} does not apply to {headword!r}")
+        else:
+            raise ValueError(f"Unsupported inflection rule {rule!r}")
+    return bytes(word)
+
+
+def render_article(headwords, definition):
+    """Render a dictionary entry as the HTML of a MOBI article; the headwords are looked up through the orth index."""
+    return f'<idx:entry scriptable="yes"><h5><dt>{headwords[0].strip()}</dt></h5><dd>{definition.strip()}</dd></idx:entry>'
+
+
+def build_book(entries):
+    """
+    Lay out the text of the book and the orth index of its articles.
+    The main headword of an entry is an orth key, with the rules of its inflections; an inflection
+    without a rule, or of a headword too long for the index, is an orth key of its own.
+    Args:
+        entries (iterable): Entries of the cleaned dictionary; entries without a definition are skipped.
+    Returns:
+        tuple: The UTF-8 text, the orth index as sorted (key, start, length, rules) tuples,
+        the number of articles and the number of keys too long for the index.
+    """
+    parts = [BOOK_START]
+    position = len(BOOK_START)
+    orth = []
+    articles = 0
+    skipped = 0
+    for entry in entries:
+        definition = entry.definition
+        if not definition:
+            continue
+        article = render_article(entry.headwords, definition).encode("utf-8")
+        headword, *inflections = dict.fromkeys(headword.strip() for headword in entry.headwords)
+        keys = {}  # Orth keys of the article, with the rules of their inflections
+        if headword and len(headword.encode("utf-8")) <= 255:
+            keys[headword] = []
+        elif headword:
+            skipped += 1  # The length of a key is stored in one byte
+        for inflection in inflections:
+            rule = inflection_rule(headword, inflection) if headword in keys and inflection else None
+            if rule is not None:
+                keys[headword].append(rule)
+            elif len(inflection.encode("utf-8")) > 255:
+                skipped += 1
+            elif inflection:
+                keys[inflection] = []
+        for key, rules in keys.items():
+            orth.append((key.encode("utf-8"), position, len(article), tuple(rules)))
+        parts.append(article)
+        parts.append(b"<mbp:pagebreak />")
+        position += len(article) + len(parts[-1])
+        articles += 1
+    parts.append(BOOK_END)
+    orth.sort()
+    return b"".join(parts), orth, articles, skipped
+
+
+def text_records(text, workers=1):
+    """
+    Split the text into PalmDOC records of RECORD_SIZE bytes and compress them.
+    A record whose last character continues in the next record is followed by the bytes
+    completing it and their count, as flagged by EXTRA_MULTIBYTE.
+    Args:
+        text (bytes): The UTF-8 text of the book.
+        workers (int): Number of processes to compress on.
+    Returns:
+        list: The text records.
+    """
+    chunks = [text[start:start + RECORD_SIZE] for start in range(0, len(text), RECORD_SIZE)]
+    if workers > 1 and len(chunks) > RECORDS_PER_TASK:
+        tasks = [chunks[start:start + RECORDS_PER_TASK] for start in range(0, len(chunks), RECORDS_PER_TASK)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            compressed = [record for records in pool.map(compress_records, tasks) for record in records]
+    else:
+        compressed = compress_records(chunks)
+
+    records = []
+    for number, (chunk, record) in enumerate(zip(chunks, compressed)):
+        lead = len(chunk) - 1
+        while lead > 0 and chunk[lead] & 0xC0 == 0x80:
+            lead -= 1
+        width = 1 if chunk[lead] < 0x80 else 2 if chunk[lead] < 0xE0 else 3 if chunk[lead] < 0xF0 else 4
+        end = (number + 1) * RECORD_SIZE
+        overlap = text[end:end + max(0, width - (len(chunk) - lead))]
+        records.append(record + overlap + bytes((len(overlap),)))
+    return records
+
+
+def orth_entry(key, start, length, group):
+    """Encode an orth index entry: the key, then the control byte and values of its start, length and inflection group."""
+    if group is None:
+        return bytes((len(key),)) + key + bytes((BOTH_TAGS,)) + encode_number(start) + encode_number(length)
+    return (
+        bytes((len(key),)) + key + bytes((BOTH_TAGS | GROUP_FLAG,))
+        + encode_number(start) + encode_number(length) + encode_number(group)
+    )
+
+
+def group_entry(rules):
+    """
+    Encode an inflection group: an empty key, then the control byte, the name offset of each rule
+    and the inflection index entry of each rule. A group of more than MAX_COUNTED_RULES rules gives
+    the byte sizes of both lists instead of their lengths.
+    """
+    names = encode_number(0) * len(rules)
+    numbers = b"".join(encode_number(rule) for rule in rules)
+    if len(rules) <= MAX_COUNTED_RULES:
+        return b"\0" + bytes((len(rules) | len(rules) << 4,)) + names + numbers
+    return b"\0\xff" + encode_number(len(names)) + encode_number(len(numbers)) + names + numbers
+
+
+def rule_entry(rule):
+    """Encode an inflection rule entry: the rule as the key, and a control byte without tags."""
+    return bytes((len(rule),)) + rule + b"\0"
+
+
+def index_entries(orth):
+    """
+    Number the inflection groups and rules of the orth index and encode the entries of both indexes.
+    Identical groups, such as those of regular verbs with the same endings, are written once.
+    Args:
+        orth (list): Sorted (key, start, length, rules) tuples, see build_book().
+    Returns:
+        tuple: The (key, entry) pairs of the orth index and of the inflection index, in index order.
+    """
+    groups = {rules: number for number, rules in enumerate(dict.fromkeys(rules for *_, rules in orth if rules))}
+    rules = {rule: len(groups) + number for number, rule in enumerate(sorted({rule for group in groups for rule in group}))}
+    orth_entries = [(key, orth_entry(key, start, length, groups.get(group))) for key, start, length, group in orth]
+    inflection_entries = [(b"", group_entry([rules[rule] for rule in group])) for group in groups]
+    inflection_entries += [(rule, rule_entry(rule)) for rule in rules]
+    return orth_entries, inflection_entries
+
+
+def index_header(length, record_type, idxt, count, encoding, language, total):
+    """Pack the INDX header shared by the header record and the entry records of an index."""
+    header = bytearray(length)
+    struct.pack_into(
+        ">4sIIIIIIIII", header, 0,
+        b"INDX", length, 0, record_type, 0, idxt, count, encoding, language, total,
+    )
+    return header
+
+
+def pad(data):
+    """Pad a block with zero bytes to a multiple of four bytes."""
+    return data + b"\0" * (-len(data) % 4)
+
+
+def idxt_block(offsets):
+    """Encode the IDXT table of the offsets of the entries of an index record."""
+    return pad(b"IDXT" + b"".join(struct.pack(">H", offset) for offset in offsets))
+
+
+def index_records(entries, tagx, language):
+    """
+    Encode an index: a header record describing the entry records, then the entry records.
+    Args:
+        entries (list): (key, entry) pairs in index order, see index_entries().
+        tagx (bytes): TAGX section of the tags of the entries.
+        language (int): Locale of the keys.
+    Returns:
+        list: The index records.
+    """
+    groups = []  # Encoded entries of each entry record
+    group = []
+    size = INDEX_HEADER_LENGTH + 8
+    for key, encoded in entries:
+        if group and size + len(encoded) + 2 > INDEX_RECORD_BYTES:
+            groups.append(group)
+            group = []
+            size = INDEX_HEADER_LENGTH + 8
+        group.append((key, encoded))
+        size += len(encoded) + 2
+    if group:
+        groups.append(group)
+
+    records = []
+    for group in groups:
+        body = bytearray()
+        offsets = []
+        for _, encoded in group:
+            offsets.append(INDEX_HEADER_LENGTH + len(body))
+            body += encoded
+        body = pad(bytes(body))
+        header = index_header(
+            INDEX_HEADER_LENGTH, 1, INDEX_HEADER_LENGTH + len(body), len(group), NULL_INDEX, NULL_INDEX, 0,
+        )
+        records.append(bytes(header) + body + idxt_block(offsets))
+
+    # The header record names the last key and the entry count of each entry record
+    geometry = bytearray()
+    offsets = []
+    start = INDEX_HEADER_LENGTH + len(tagx)
+    for group in groups:
+        last_key = group[-1][0]
+        offsets.append(start + len(geometry))
+        geometry += bytes((len(last_key),)) + last_key + struct.pack(">H", len(group))
+    geometry = pad(bytes(geometry))
+    header = index_header(
+        INDEX_HEADER_LENGTH, 0, start + len(geometry), len(groups), UTF8, language, len(entries),
+    )
+    struct.pack_into(">I", header, 180, INDEX_HEADER_LENGTH)  # Offset of the TAGX section
+    return [bytes(header) + tagx + geometry + idxt_block(offsets)] + records
+
+
+def exth_block(metadata):
+    """Encode (type, text) metadata as an EXTH block."""
+    records = b"".join(
+        struct.pack(">II", kind, 8 + len(value.encode("utf-8"))) + value.encode("utf-8") for kind, value in metadata
+    )
+    return pad(b"EXTH" + struct.pack(">II", 12 + len(records), len(metadata)) + records)
+
+
+def first_record(text_length, text_count, orth_index, inflection_index, flis, fcis):
+    """
+    Build record 0: the PalmDOC header, the MOBI header, the EXTH metadata and the full title.
+    Args:
+        text_length (int): Uncompressed length of the text.
+        text_count (int): Number of text records, which follow record 0.
+        orth_index (int): Record number of the orth index header.
+        inflection_index (int): Record number of the inflection index header, or NULL_INDEX.
+        flis (int): Record number of the FLIS record.
+        fcis (int): Record number of the FCIS record.
+    Returns:
+        bytes: The record.
+    """
+    exth = exth_block([
+        (EXTH_CREATOR, CREATOR),
+        (EXTH_PUBLISHER, PUBLISHER),
+        (EXTH_TITLE, TITLE),
+        (EXTH_LANGUAGE, IN_LANGUAGE),
+        (EXTH_DICTIONARY_IN, IN_LANGUAGE),
+        (EXTH_DICTIONARY_OUT, OUT_LANGUAGE),
+    ])
+    title = TITLE.encode("utf-8")
+    header = bytearray(PALMDOC_HEADER.size + MOBI_HEADER_LENGTH)
+    PALMDOC_HEADER.pack_into(header, 0, PALMDOC_COMPRESSION, 0, text_length, text_count, RECORD_SIZE, 0, 0)
+    struct.pack_into(
+        ">4sIIIII", header, 0x10,
+        b"MOBI", MOBI_HEADER_LENGTH, MOBI_BOOK, UTF8, zlib.crc32(title), 6,
+    )
+    struct.pack_into(">10I", header, 0x28, orth_index, inflection_index, *[NULL_INDEX] * 8)  # Names, keys, extra indexes
+    struct.pack_into(
+        ">IIIIIIII", header, 0x50,
+        orth_index,  # First record that is not text
+        len(header) + len(exth),  # Offset of the full title
+        len(title),
+        LOCALES[IN_LANGUAGE],
+        LOCALES[IN_LANGUAGE],  # Dictionary input language
+        LOCALES[OUT_LANGUAGE],  # Dictionary output language
+        6,  # Minimum reader version
+        flis,  # First resource record: there are no images, so the first record after the indexes
+    )
+    struct.pack_into(">I", header, 0x80, 0x40)  # EXTH present
+    struct.pack_into(">II", header, 0xA4, NULL_INDEX, NULL_INDEX)  # No DRM
+    struct.pack_into(">HHIIIII", header, 0xC0, 1, text_count, 1, fcis, 1, flis, 1)
+    struct.pack_into(">IIII", header, 0xE0, NULL_INDEX, 0, NULL_INDEX, NULL_INDEX)
+    struct.pack_into(">II", header, 0xF0, EXTRA_MULTIBYTE, NULL_INDEX)
+    return pad(bytes(header) + exth + title + b"\0\0")
+
+
+def fcis_record(text_length):
+    """Encode the FCIS record, which repeats the length of the text."""
+    return (
+        b"FCIS\0\0\0\x14\0\0\0\x10\0\0\0\x01\0\0\0\0" + struct.pack(">I", text_length)
+        + b"\0\0\0\0\0\0\0\x20\0\0\0\x08\0\x01\0\x01\0\0\0\0"
+    )
+
+
+def write_database(path, records, created):
+    """Write records as a Palm database of type BOOK, creator MOBI."""
+    offset = PDB_HEADER.size + 8 * len(records) + 2
+    with open(path, "wb") as file:
+        file.write(PDB_HEADER.pack(
+            PDB_NAME, 0, 0, created, created, 0, 0, 0, 0, b"BOOK", b"MOBI", 2 * len(records) - 1, 0, len(records),
+        ))
+        for number, record in enumerate(records):
+            file.write(struct.pack(">II", offset, 2 * number))  # Attributes byte 0, then the unique id
+            offset += len(record)
+        file.write(b"\0\0")
+        for record in records:
+            file.write(record)
+
+
+def write_mobi(path, entries, workers=1):
+    """
+    Write a MOBI dictionary: PalmDOC-compressed articles, an orth index of the headwords pointing at
+    their articles, an inflection index with the rules of their inflections, and the metadata of
+    dictionary.opf as EXTH records.
+    Args:
+        path (str): Path of the .mobi file.
+        entries (iterable): Entries of the cleaned dictionary.
+        workers (int): Number of processes to compress text records on.
+    Returns:
+        dict: Counts of the written file.
+    """
+    text, orth, articles, skipped = build_book(entries)
+    texts = text_records(text, workers)
+    orth_entries, inflection_entries = index_entries(orth)
+    index = index_records(orth_entries, ORTH_TAGX, LOCALES[IN_LANGUAGE])
+    inflections = []
+    if inflection_entries:
+        inflections = [*index_records(inflection_entries, INFLECTION_TAGX, LOCALES[IN_LANGUAGE]), INFLECTION_NAMES]
+    orth_index = 1 + len(texts)
+    inflection_index = orth_index + len(index) if inflections else NULL_INDEX
+    flis = orth_index + len(index) + len(inflections)
+    fcis = flis + 1
+    records = [
+        first_record(len(text), len(texts), orth_index, inflection_index, flis, fcis),
+        *texts, *index, *inflections, FLIS, fcis_record(len(text)), EOF_RECORD,
+    ]
+
+    created = int(os.environ.get("SOURCE_DATE_EPOCH") or time.time())  # Reproducible builds set SOURCE_DATE_EPOCH
+    write_database(path, records, created)
+    return {
+        "articles": articles,
+        "keys": len(orth),
+        "inflections": sum(len(rules) for *_, rules in orth),
+        "rules": sum(1 for key, _ in inflection_entries if key),
+        "skipped_keys": skipped,
+        "text_bytes": len(text),
+        "text_records": len(texts),
+        "index_records": len(index) + len(inflections),
+        "file_bytes": os.path.getsize(path),
+    }
+
+
+def report_mobi(path, counts):
+    """Print the counts of a MOBI file written by write_mobi()."""
+    if counts["skipped_keys"]:
+        print(f"\033[1;33m{counts['skipped_keys']} headwords longer than 255 bytes left out of the index\033[0m")
+    print(
+        f"\033[1;32m{counts['articles']} articles, {counts['keys']} index keys and {counts['inflections']} inflections "
+        f"({counts['rules']} rules) written to {path} "
+        f"({counts['text_records']} text records, {counts['index_records']} index records, "
+        f"{counts['file_bytes']} bytes)\033[0m"
+    )
+
+
+class MobiFile:
+    """A MOBI file read back into its records, to check its structure and look up words offline."""
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            data = file.read()
+        header = PDB_HEADER.unpack_from(data, 0)
+        if header[9:11] != (b"BOOK", b"MOBI"):
+            raise ValueError(f"{path} is not a MOBI file")
+        count = header[-1]
+        offsets = [struct.unpack_from(">I", data, PDB_HEADER.size + 8 * number)[0] for number in range(count)]
+        offsets.append(len(data))
+        if any(start > end for start, end in zip(offsets, offsets[1:])):
+            raise ValueError("Record offsets are not increasing")
+        self.records = [data[start:end] for start, end in zip(offsets, offsets[1:])]
+
+        first = self.records[0]
+        (self.compression, _, self.text_length, self.text_count, self.record_size, _, _) = PALMDOC_HEADER.unpack_from(first, 0)
+        magic, self.header_length, _, self.encoding = struct.unpack_from(">4sIII", first, 0x10)
+        if magic != b"MOBI":
+            raise ValueError("Record 0 has no MOBI header")
+        self.orth_index, self.inflection_index = struct.unpack_from(">II", first, 0x28)
+        self.first_other, title_offset, title_length = struct.unpack_from(">III", first, 0x50)
+        self.title = first[title_offset:title_offset + title_length].decode("utf-8")
+        self.fcis, = struct.unpack_from(">I", first, 0xC8)
+        self.flis, = struct.unpack_from(">I", first, 0xD0)
+        self.extra_flags, = struct.unpack_from(">I", first, 0xF0)
+        self.metadata = {}
+        exth = PALMDOC_HEADER.size + self.header_length
+        if first[exth:exth + 4] == b"EXTH":
+            _, exth_count = struct.unpack_from(">II", first, exth + 4)
+            offset = exth + 12
+            for _ in range(exth_count):
+                kind, length = struct.unpack_from(">II", first, offset)
+                self.metadata[kind] = first[offset + 8:offset + length].decode("utf-8")
+                offset += length
+
+    def text_record(self, number):
+        """Return the decompressed text of a text record (counted from 1) and the bytes completing its last character."""
+        record = self.records[number]
+        overlap = 0
+        if self.extra_flags & EXTRA_MULTIBYTE:
+            overlap = record[-1] & 0x3
+            record, tail = record[:-1 - overlap], record[len(record) - 1 - overlap:-1]
+        else:
+            tail = b""
+        return palmdoc_decompress(record), tail
+
+    def text(self):
+        """Return the whole decompressed text."""
+        return b"".join(self.text_record(number)[0] for number in range(1, self.text_count + 1))
+
+    def read_index(self, number, tagx, name):
+        """
+        Read the records of an index.
+        Args:
+            number (int): Record number of the index header.
+            tagx (bytes): The TAGX section the index must have.
+            name (str): Name of the index, for error messages.
+        Returns:
+            tuple: The (key, record, offset of the control byte) of each entry in index order, and the
+            (last key, entry count) pairs the header record gives for the entry records.
+        """
+        header = self.records[number]
+        if header[:4] != b"INDX":
+            raise ValueError(f"The {name} index has no INDX header")
+        idxt, groups = struct.unpack_from(">II", header, 20)
+        tagx_offset, = struct.unpack_from(">I", header, 180)
+        if header[tagx_offset:tagx_offset + len(tagx)] != tagx:
+            raise ValueError(f"The {name} index has an unexpected TAGX section")
+        if header[idxt:idxt + 4] != b"IDXT":
+            raise ValueError(f"The {name} index header has no IDXT table")
+        geometry = []
+        for group in range(groups):
+            offset, = struct.unpack_from(">H", header, idxt + 4 + 2 * group)
+            length = header[offset]
+            geometry.append((header[offset + 1:offset + 1 + length], *struct.unpack_from(">H", header, offset + 1 + length)))
+
+        entries = []
+        for record_number in range(number + 1, number + 1 + groups):
+            record = self.records[record_number]
+            if record[:4] != b"INDX":
+                raise ValueError(f"Index record {record_number} has no INDX header")
+            idxt, count = struct.unpack_from(">II", record, 20)
+            if record[idxt:idxt + 4] != b"IDXT":
+                raise ValueError(f"Index record {record_number} has no IDXT table")
+            for entry in range(count):
+                offset, = struct.unpack_from(">H", record, idxt + 4 + 2 * entry)
+                length = record[offset]
+                entries.append((record[offset + 1:offset + 1 + length], record, offset + 1 + length))
+        return entries, geometry
+
+    def index(self):
+        """
+        Read the orth index.
+        Returns:
+            tuple: The (key, start, length, group) tuples in index order, with None for entries without
+            an inflection group, and the (last key, entry count) pairs of the entry records.
+        """
+        entries, geometry = self.read_index(self.orth_index, ORTH_TAGX, "orth")
+        index = []
+        for key, record, offset in entries:
+            control = record[offset]
+            if control & ~GROUP_FLAG != BOTH_TAGS:
+                raise ValueError(f"Index entry {key!r} does not have a start and a length")
+            start, offset = decode_number(record, offset + 1)
+            size, offset = decode_number(record, offset)
+            group = decode_number(record, offset)[0] if control & GROUP_FLAG else None
+            index.append((key, start, size, group))
+        return index, geometry
+
+    def inflections(self):
+        """
+        Read the inflection index.
+        Returns:
+            dict: The rules of each inflection group, by the number of its entry; empty without an inflection index.
+        """
+        if self.inflection_index == NULL_INDEX:
+            return {}
+        entries, geometry = self.read_index(self.inflection_index, INFLECTION_TAGX, "inflection")
+        names = self.records[self.inflection_index + 1 + len(geometry)]
+        if names != INFLECTION_NAMES:
+            raise ValueError("The inflection index has no record of rule names")
+        groups = {}
+        for number, (key, record, offset) in enumerate(entries):
+            if key:
+                continue  # A rule
+            control = record[offset]
+            offset += 1
+            if control == 0xFF:
+                count, offset = decode_number(record, offset)  # Byte size of the name offsets, one byte each
+                _, offset = decode_number(record, offset)
+            else:
+                count = control & 0x0F
+                if control >> 4 != count:
+                    raise ValueError(f"Inflection group {number} has {count} names and {control >> 4} rules")
+            offset += count  # The name offsets
+            rules = []
+            for _ in range(count):
+                rule, offset = decode_number(record, offset)
+                if rule >= len(entries) or not entries[rule][0]:
+                    raise ValueError(f"Inflection group {number} points at entry {rule}, which is not a rule")
+                rules.append(entries[rule][0])
+            groups[number] = rules
+        return groups
+
+    def forms(self, index, groups):
+        """Return the positions in the orth index of the headwords each inflection is made from."""
+        forms = {}
+        for position, (key, _, _, group) in enumerate(index):
+            if group is None:
+                continue
+            if group not in groups:
+                raise ValueError(f"Index entry {key!r} points at a missing inflection group {group}")
+            for rule in groups[group]:
+                forms.setdefault(apply_rule(key, rule), []).append(position)
+        return forms
+
+    def lookup(self, word, text=None, index=None, forms=None):
+        """Return the HTML of the articles a word leads to, as a headword or as an inflection of one."""
+        text = self.text() if text is None else text
+        index = self.index()[0] if index is None else index
+        forms = self.forms(index, self.inflections()) if forms is None else forms
+        key = word.encode("utf-8")
+        position = bisect.bisect_left(index, (key,))
+        positions = []
+        while position < len(index) and index[position][0] == key:
+            positions.append(position)
+            position += 1
+        starts = {}  # Articles by their position in the text, headword matches first
+        for position in positions + forms.get(key, []):
+            _, start, length, _ = index[position]
+            starts.setdefault(start, text[start:start + length].decode("utf-8"))
+        return list(starts.values())
+
+
+def check_mobi(path, entries=None):
+    """
+    Check the structure of a MOBI dictionary written by write_mobi(), without a Kindle.
+    Every text record is decompressed, the orth index must be sorted, every key must point at a
+    whole article and every inflection rule must apply to the headwords of its groups. Given the
+    entries the file was written from, every headword and inflection must also lead to the article
+    of its entry.
+    Args:
+        path (str): Path of the .mobi file.
+        entries (iterable): Entries of the cleaned dictionary, optional.
+    Returns:
+        dict: Counts of the checked file.
+    Raises:
+        ValueError: The file is not consistent; the message lists what is wrong.
+    """
+    book = MobiFile(path)
+    problems = []
+    if book.compression != PALMDOC_COMPRESSION or book.record_size != RECORD_SIZE or book.encoding != UTF8:
+        problems.append("record 0 does not describe UTF-8 PalmDOC text")
+    if book.title != TITLE:
+        problems.append(f"the title is {book.title!r}")
+    expected = {EXTH_CREATOR: CREATOR, EXTH_PUBLISHER: PUBLISHER, EXTH_TITLE: TITLE,
+                EXTH_DICTIONARY_IN: IN_LANGUAGE, EXTH_DICTIONARY_OUT: OUT_LANGUAGE}
+    problems += [f"EXTH record {kind} is {book.metadata.get(kind)!r}" for kind, value in expected.items()
+                 if book.metadata.get(kind) != value]
+
+    chunks = []
+    for number in range(1, book.text_count + 1):
+        chunk, tail = book.text_record(number)
+        if chunks and not chunk.startswith(chunks[-1][1]):
+            problems.append(f"the bytes after text record {number - 1} do not start text record {number}")
+        if number < book.text_count and len(chunk) != RECORD_SIZE:
+            problems.append(f"text record {number} holds {len(chunk)} bytes")
+        chunks.append((chunk, tail))
+    text = b"".join(chunk for chunk, _ in chunks)
+    if len(text) != book.text_length:
+        problems.append(f"the text has {len(text)} bytes, record 0 gives {book.text_length}")
+    try:
+        text.decode("utf-8")
+    except UnicodeDecodeError as e:
+        problems.append(f"the text is not UTF-8: {e}")
+
+    if book.first_other != book.orth_index or book.orth_index != book.text_count + 1:
+        problems.append("the orth index does not follow the text records")
+    index, geometry = book.index()
+    if any(previous[0] > key[0] for previous, key in zip(index, index[1:])):
+        problems.append("the orth index is not sorted")
+    seen = 0
+    for last_key, count in geometry:
+        seen += count
+        if seen > len(index) or index[seen - 1][0] != last_key:
+            problems.append(f"the index header ends an index record at {last_key!r}")
+    if seen != len(index):
+        problems.append(f"the index header counts {seen} entries, the index records {len(index)}")
+    for key, start, length, _ in index:
+        article = text[start:start + length]
+        if not (article.startswith(ARTICLE_START) and article.endswith(ARTICLE_END)):
+            problems.append(f"{key.decode('utf-8', 'replace')} does not point at an article")
+    if book.inflection_index not in (NULL_INDEX, book.orth_index + 1 + len(geometry)):
+        problems.append("the inflection index does not follow the orth index")
+    forms = book.forms(index, book.inflections())
+    if book.records[book.flis][:4] != b"FLIS" or book.records[book.fcis][:4] != b"FCIS":
+        problems.append("the FLIS and FCIS records are missing")
+    if book.records[-1] != EOF_RECORD:
+        problems.append("the end of file record is missing")
+
+    if entries is not None:
+        for entry in entries:
+            if not entry.definition:
+                continue
+            article = render_article(entry.headwords, entry.definition)
+            for headword in entry.headwords:
+                headword = headword.strip()
+                if headword and len(headword.encode("utf-8")) <= 255 and article not in book.lookup(headword, text, index, forms):
+                    problems.append(f"{headword} does not lead to its article")
+
+    if problems:
+        raise ValueError(f"{path}: " + "; ".join(problems[:20]) + (f" and {len(problems) - 20} more" if len(problems) > 20 else ""))
+    return {
+        "keys": len(index),
+        "inflections": sum(len(positions) for positions in forms.values()),
+        "text_bytes": len(text),
+        "records": len(book.records),
+    }
+
+
+# Check a MOBI dictionary, or look up words in it, without a Kindle
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a MOBI dictionary or look up words in it.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check = commands.add_parser("check", help="check the structure of the file")
+    check.add_argument("mobi_path")
+    check.add_argument("entries_path", nargs="?", help="intermediate file the dictionary was built from")
+    lookup = commands.add_parser("lookup", help="print the articles of words")
+    lookup.add_argument("mobi_path")
+    lookup.add_argument("words", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        entries = iter_entries(args.entries_path) if args.entries_path else None
+        counts = check_mobi(args.mobi_path, entries)
+        print(
+            f"{args.mobi_path}: {counts['keys']} keys, {counts['inflections']} inflections, "
+            f"{counts['text_bytes']} bytes of text, {counts['records']} records"
+        )
+    else:
+        book = MobiFile(args.mobi_path)
+        text, index = book.text(), book.index()[0]
+        forms = book.forms(index, book.inflections())
+        for word in args.words:
+            articles = book.lookup(word, text, index, forms)
+            print(f"{word}: " + ("\n".join(articles) if articles else "not found"))
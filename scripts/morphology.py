@@ -0,0 +1,201 @@
+import os
+from array import array
+from entries import EntryFile
+from links import PAST, PAST_PARTICIPLE, PLURAL
+
+# Link tags grouped by each stage
+NOUN_LINKS = (PLURAL,)
+VERB_LINKS = (PAST, PAST_PARTICIPLE)
+
+
+class DisjointSet:
+    """Union-find over node ids 0..size-1, with path compression and union by rank."""
+    __slots__ = ("parent", "rank")
+
+    def __init__(self, size):
+        self.parent = array("I", range(size))
+        self.rank = array("B", bytes(size))
+
+    def find(self, node):
+        """Return the root of a node's set, pointing every node on the way directly at it."""
+        parent = self.parent
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    def union(self, first, second):
+        """Merge the sets of two nodes and return the root of the merged set."""
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return first
+        if self.rank[first] < self.rank[second]:
+            first, second = second, first
+        self.parent[second] = first
+        if self.rank[first] == self.rank[second]:
+            self.rank[first] += 1
+        return first
+
+
+class MorphologyGraph:
+    """
+    The headwords and plural, past and p.p. link lines of one dictionary snapshot, indexed in a single pass.
+    Every distinct word gets an id; the headwords of each entry, and the key and base
+    forms of each link line, are kept as flat arrays of ids. Stages group words into
+    components over the link kinds they care about, optionally joining the headwords
+    of each regular entry, with a DisjointSet built on demand.
+    """
+    __slots__ = ("words", "ids", "kinds", "link_keys", "headword_offsets", "headword_ids", "target_offsets", "target_ids")
+
+    def __init__(self):
+        self.words = []  # Word of each id
+        self.ids = {}  # Id of each word
+        self.kinds = array("B")  # Link tag of each entry, see links.py
+        self.link_keys = array("I")  # Id of the "|"-joined key of each entry, for link lines only
+        self.headword_offsets = array("I", [0])
+        self.headword_ids = array("I")
+        self.target_offsets = array("I", [0])
+        self.target_ids = array("I")
+
+    @classmethod
+    def build(cls, entries):
+        """
+        Index a dictionary in one pass.
+        Args:
+            entries (iterable): Dictionary entries.
+        Returns:
+            MorphologyGraph: The graph.
+        """
+        graph = cls()
+        for entry in entries:
+            graph.add(entry)
+        return graph
+
+    def word_id(self, word):
+        """Return the id of a word, assigning the next one to a new word."""
+        try:
+            return self.ids[word]
+        except KeyError:
+            self.ids[word] = len(self.words)
+            self.words.append(word)
+            return self.ids[word]
+
+    def add(self, entry):
+        """Index the next entry of the dictionary."""
+        word_id = self.word_id
+        headword_ids = self.headword_ids
+        for headword in entry.headwords:
+            headword_ids.append(word_id(headword))
+        self.headword_offsets.append(len(headword_ids))
+
+        kind = entry.tag
+        self.kinds.append(kind)
+        if kind in NOUN_LINKS or kind in VERB_LINKS:
+            self.link_keys.append(word_id(entry.key))
+            for target in entry.link_target().split("|"):
+                self.target_ids.append(word_id(target.strip()))
+        else:
+            self.link_keys.append(0)
+        self.target_offsets.append(len(self.target_ids))
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def regular_entries(self, kinds):
+        """
+        Iterate over the entries that are not link lines of the given kinds.
+        Args:
+            kinds (tuple): Link kinds, e.g. NOUN_LINKS.
+        Yields:
+            tuple: The position of the entry and the ids of its headwords.
+        """
+        for idx, kind in enumerate(self.kinds):
+            if kind not in kinds:
+                yield idx, self.headword_ids[self.headword_offsets[idx]:self.headword_offsets[idx + 1]]
+
+    def link_entries(self, kinds):
+        """
+        Iterate over the link lines of the given kinds.
+        Args:
+            kinds (tuple): Link kinds, e.g. VERB_LINKS.
+        Yields:
+            tuple: The position of the entry, the id of its key and the ids of its base forms.
+        """
+        for idx, kind in enumerate(self.kinds):
+            if kind in kinds:
+                yield idx, self.link_keys[idx], self.target_ids[self.target_offsets[idx]:self.target_offsets[idx + 1]]
+
+    def components(self, kinds, join_headwords=False):
+        """
+        Group words linked to each other by link lines of the given kinds.
+        Args:
+            kinds (tuple): Link kinds to follow, e.g. NOUN_LINKS.
+            join_headwords (bool): Also group the headwords of each regular entry together,
+                and include words that are not linked to anything.
+        Returns:
+            list: Lists of word ids, one per group. Groups are ordered by the first appearance
+            of any of their words in the dictionary, and so are the words within a group.
+        """
+        sets = DisjointSet(len(self.words))
+        seen = bytearray(len(self.words))
+        order = []  # Ids in order of first appearance
+
+        def see(word_id):
+            if not seen[word_id]:
+                seen[word_id] = 1
+                order.append(word_id)
+
+        for idx, kind in enumerate(self.kinds):
+            if kind in kinds:
+                key = self.link_keys[idx]
+                for target in self.target_ids[self.target_offsets[idx]:self.target_offsets[idx + 1]]:
+                    see(target)
+                    see(key)
+                    sets.union(key, target)
+            elif join_headwords:
+                headwords = self.headword_ids[self.headword_offsets[idx]:self.headword_offsets[idx + 1]]
+                for headword in headwords:
+                    see(headword)
+                    sets.union(headwords[0], headword)
+
+        groups = {}
+        for word_id in order:
+            groups.setdefault(sets.find(word_id), []).append(word_id)
+        return list(groups.values())
+
+
+# Graph of the dictionary snapshot indexed last, reused by the next stage reading the same snapshot
+_last_graph = ((None, None), None)
+
+
+def snapshot(entries):
+    """Return what identifies a dictionary snapshot that can be read again, or None for a one-pass iterable."""
+    if isinstance(entries, EntryFile):
+        stat = os.stat(entries.path)
+        return ("file", os.path.abspath(entries.path), stat.st_mtime_ns, stat.st_size)
+    if isinstance(entries, list):
+        return ("list", id(entries), len(entries))
+    return None
+
+
+def graph_for(entries):
+    """
+    Return the morphology graph of a dictionary. Stages run in one process on the same
+    snapshot, such as 04 and 05 in --in-process or --streaming mode, share one graph.
+    Args:
+        entries (iterable): Dictionary entries; a list or an EntryFile can be reused.
+    Returns:
+        MorphologyGraph: The graph.
+    """
+    global _last_graph
+    key = snapshot(entries)
+    (cached_key, _), graph = _last_graph
+    if key is not None and key == cached_key:
+        return graph
+
+    graph = MorphologyGraph.build(entries)
+    if key is not None:
+        _last_graph = ((key, entries), graph)  # Hold the entries so a list id cannot be reused
+    return graph
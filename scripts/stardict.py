@@ -0,0 +1,381 @@
+import argparse
+import bisect
+import os
+import struct
+import time
+import zlib
+from entries import iter_entries
+from xhtml import CREATOR, IN_LANGUAGE, OUT_LANGUAGE, TITLE
+
+# Files of the dictionary: BOOK_NAME.ifo, .idx, .syn and .dict.dz
+BOOK_NAME = "dictionary"
+IFO_MAGIC = "StarDict's dict ifo file"
+VERSION = "3.0.0"
+TYPE_HTML = "h"  # Every article is a single HTML field
+MAX_WORD_BYTES = 255  # Readers keep words in 256-byte buffers
+IDX_OFFSET = struct.Struct(">II")  # Offset and size of an article in the .dict file
+SYN_INDEX = struct.Struct(">I")  # Position in the .idx file of the word a synonym leads to
+
+# dictzip: a gzip file whose deflate stream is flushed every CHUNK_BYTES, with the compressed
+# chunk sizes in a gzip extra field, so that readers can decompress any chunk on its own
+CHUNK_BYTES = 58315  # The default of dictzip
+GZIP_FEXTRA = 0x04
+GZIP_FNAME = 0x08
+GZIP_OS_UNIX = 3
+GZIP_XFL_BEST = 2
+MAX_EXTRA_BYTES = 0xFFFF
+
+
+def sort_key(word):
+    """
+    Return the key StarDict files are sorted by: the word compared with ASCII letters
+    case-folded, then the bytes as they are (g_ascii_strcasecmp, then strcmp).
+    Args:
+        word (bytes): A UTF-8 encoded word.
+    Returns:
+        tuple: The sort key.
+    """
+    return word.lower(), word  # bytes.lower() only folds ASCII letters, like g_ascii_strcasecmp
+
+
+def build_files(entries):
+    """
+    Lay out the articles of the .dict file and the words of the .idx and .syn files.
+    The first headword of an entry goes to the .idx file; the inflections and variants after
+    the first `|` go to the .syn file, pointing at the .idx position of their main headword.
+    Args:
+        entries (iterable): Entries of the cleaned dictionary; entries without a definition are skipped.
+    Returns:
+        tuple: The .dict bytes, the sorted (word, offset, size) triples of the .idx file, the
+        sorted (word, position) pairs of the .syn file and the number of words too long to index.
+    """
+    articles = bytearray()
+    words = []  # (word, offset, size) in dictionary order
+    synonyms = []  # (word, number of the entry in words)
+    skipped = 0
+    for entry in entries:
+        definition = entry.definition
+        if not definition:
+            continue
+        main = entry.headwords[0].strip().encode("utf-8")
+        if not main or len(main) > MAX_WORD_BYTES:
+            skipped += 1
+            continue
+        article = definition.strip().encode("utf-8")
+        number = len(words)
+        words.append((main, len(articles), len(article)))
+        articles += article
+        for headword in dict.fromkeys(headword.strip() for headword in entry.headwords[1:]):
+            synonym = headword.encode("utf-8")
+            if not synonym or synonym == main:
+                continue
+            if len(synonym) > MAX_WORD_BYTES:
+                skipped += 1
+                continue
+            synonyms.append((synonym, number))
+
+    order = sorted(range(len(words)), key=lambda number: sort_key(words[number][0]))
+    positions = [0] * len(words)
+    for position, number in enumerate(order):
+        positions[number] = position
+    idx = [words[number] for number in order]
+    syn = sorted(((synonym, positions[number]) for synonym, number in synonyms), key=lambda pair: (sort_key(pair[0]), pair[1]))
+    return bytes(articles), idx, syn, skipped
+
+
+def encode_idx(idx):
+    """Encode .idx entries: the word, a NUL byte, then the offset and size of its article."""
+    return b"".join(word + b"\0" + IDX_OFFSET.pack(offset, size) for word, offset, size in idx)
+
+
+def encode_syn(syn):
+    """Encode .syn entries: the synonym, a NUL byte, then the .idx position of its word."""
+    return b"".join(word + b"\0" + SYN_INDEX.pack(position) for word, position in syn)
+
+
+def write_ifo(path, word_count, syn_count, idx_size):
+    """Write the .ifo file describing the dictionary."""
+    lines = [
+        IFO_MAGIC,
+        f"version={VERSION}",
+        f"bookname={TITLE}",
+        f"wordcount={word_count}",
+        f"synwordcount={syn_count}",
+        f"idxfilesize={idx_size}",
+        f"author={CREATOR}",
+        f"description={IN_LANGUAGE}-{OUT_LANGUAGE}",
+        f"sametypesequence={TYPE_HTML}",
+    ]
+    with open(path, "w", encoding="utf-8", newline="\n") as file:
+        file.write("\n".join(lines) + "\n")
+
+
+def write_dictzip(path, data, name, mtime):
+    """
+    Compress data into a dictzip file, which gzip can also decompress as a whole.
+    Every chunk is deflated with a compressor of its own and ends with a full flush, so it
+    does not refer to the chunks before it.
+    Args:
+        path (str): Path of the .dict.dz file.
+        data (bytes): The uncompressed .dict file.
+        name (str): Original file name stored in the gzip header.
+        mtime (int): Modification time stored in the gzip header.
+    Returns:
+        int: Number of chunks.
+    Raises:
+        ValueError: The chunk sizes do not fit in the gzip extra field.
+    """
+    chunks = []
+    for start in range(0, len(data), CHUNK_BYTES):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        chunks.append(compressor.compress(data[start:start + CHUNK_BYTES]) + compressor.flush(zlib.Z_FULL_FLUSH))
+    final = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS).flush(zlib.Z_FINISH)  # An empty last block
+
+    field = struct.pack("<HHH", 1, CHUNK_BYTES, len(chunks)) + b"".join(struct.pack("<H", len(chunk)) for chunk in chunks)
+    if 4 + len(field) > MAX_EXTRA_BYTES:
+        raise ValueError(f"{len(chunks)} chunks of {CHUNK_BYTES} bytes do not fit in a dictzip header")
+    extra = b"RA" + struct.pack("<H", len(field)) + field
+    with open(path, "wb") as file:
+        file.write(struct.pack(
+            "<BBBBIBB", 0x1F, 0x8B, zlib.DEFLATED, GZIP_FEXTRA | GZIP_FNAME, mtime, GZIP_XFL_BEST, GZIP_OS_UNIX,
+        ))
+        file.write(struct.pack("<H", len(extra)) + extra)
+        file.write(name.encode("latin-1", "replace") + b"\0")
+        for chunk in chunks:
+            file.write(chunk)
+        file.write(final)
+        file.write(struct.pack("<II", zlib.crc32(data), len(data) & 0xFFFFFFFF))
+    return len(chunks)
+
+
+def stardict_paths(output_dir):
+    """Return the paths of the .ifo, .idx, .syn and .dict.dz files of the dictionary."""
+    base = os.path.join(output_dir, BOOK_NAME)
+    return f"{base}.ifo", f"{base}.idx", f"{base}.syn", f"{base}.dict.dz"
+
+
+def write_stardict(output_dir, entries):
+    """
+    Write the dictionary in the StarDict format: HTML articles in a dictzip-compressed .dict
+    file, their main headwords sorted in the .idx file and their inflections and variants
+    sorted in the .syn file, so that readers find words by binary search.
+    Args:
+        output_dir (str): Directory to write the files to.
+        entries (iterable): Entries of the cleaned dictionary.
+    Returns:
+        dict: Counts of the written files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    ifo_path, idx_path, syn_path, dict_path = stardict_paths(output_dir)
+    articles, idx, syn, skipped = build_files(entries)
+
+    idx_data = encode_idx(idx)
+    with open(idx_path, "wb") as file:
+        file.write(idx_data)
+    with open(syn_path, "wb") as file:
+        file.write(encode_syn(syn))
+    mtime = int(os.environ.get("SOURCE_DATE_EPOCH") or time.time())  # Reproducible builds set SOURCE_DATE_EPOCH
+    chunks = write_dictzip(dict_path, articles, f"{BOOK_NAME}.dict", mtime)
+    write_ifo(ifo_path, len(idx), len(syn), len(idx_data))
+    return {
+        "words": len(idx),
+        "synonyms": len(syn),
+        "skipped_words": skipped,
+        "dict_bytes": len(articles),
+        "chunks": chunks,
+        "file_bytes": sum(os.path.getsize(path) for path in (ifo_path, idx_path, syn_path, dict_path)),
+    }
+
+
+def report_stardict(output_dir, counts):
+    """Print the counts of a dictionary written by write_stardict()."""
+    if counts["skipped_words"]:
+        print(f"\033[1;33m{counts['skipped_words']} headwords longer than {MAX_WORD_BYTES} bytes left out\033[0m")
+    print(
+        f"\033[1;32m{counts['words']} words and {counts['synonyms']} synonyms written to "
+        f"{os.path.join(output_dir, BOOK_NAME)}.* ({counts['dict_bytes']} bytes of articles in "
+        f"{counts['chunks']} dictzip chunks, {counts['file_bytes']} bytes)\033[0m"
+    )
+
+
+class DictZip:
+    """Random access to the uncompressed bytes of a dictzip file, decompressing only the chunks read."""
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.data = file.read()
+        magic, method, flags = struct.unpack_from("<HBB", self.data, 0)
+        if magic != 0x8B1F or method != zlib.DEFLATED or not flags & GZIP_FEXTRA:
+            raise ValueError(f"{path} is not a dictzip file")
+        extra_length, = struct.unpack_from("<H", self.data, 10)
+        extra = self.data[12:12 + extra_length]
+        self.chunk_bytes = None
+        position = 0
+        while position + 4 <= len(extra):
+            subfield, length = extra[position:position + 2], struct.unpack_from("<H", extra, position + 2)[0]
+            if subfield == b"RA":
+                _, self.chunk_bytes, count = struct.unpack_from("<HHH", extra, position + 4)
+                self.sizes = struct.unpack_from(f"<{count}H", extra, position + 10)
+            position += 4 + length
+        if self.chunk_bytes is None:
+            raise ValueError(f"{path} has no dictzip chunk table")
+        start = 12 + extra_length
+        if flags & GZIP_FNAME:
+            start = self.data.index(b"\0", start) + 1
+        self.offsets = [start]
+        for size in self.sizes:
+            self.offsets.append(self.offsets[-1] + size)
+        self.cache = {}
+
+    def chunk(self, number):
+        """Return the uncompressed bytes of a chunk."""
+        if number not in self.cache:
+            start = self.offsets[number]
+            self.cache[number] = zlib.decompressobj(-zlib.MAX_WBITS).decompress(self.data[start:self.offsets[number + 1]])
+        return self.cache[number]
+
+    def read(self, offset, size):
+        """Return size uncompressed bytes from an offset."""
+        first, last = offset // self.chunk_bytes, (offset + size - 1) // self.chunk_bytes
+        data = b"".join(self.chunk(number) for number in range(first, last + 1))
+        start = offset - first * self.chunk_bytes
+        return data[start:start + size]
+
+
+class StarDict:
+    """A StarDict dictionary read back from its files, to check it and look up words by binary search."""
+
+    def __init__(self, output_dir):
+        ifo_path, idx_path, syn_path, dict_path = stardict_paths(output_dir)
+        with open(ifo_path, encoding="utf-8") as file:
+            lines = file.read().splitlines()
+        if not lines or lines[0] != IFO_MAGIC:
+            raise ValueError(f"{ifo_path} is not a StarDict .ifo file")
+        self.info = dict(line.split("=", 1) for line in lines[1:] if "=" in line)
+        with open(idx_path, "rb") as file:
+            self.idx_size = os.fstat(file.fileno()).st_size
+            self.idx = self.read_words(file.read(), IDX_OFFSET)
+        self.syn = []
+        if os.path.exists(syn_path):
+            with open(syn_path, "rb") as file:
+                self.syn = self.read_words(file.read(), SYN_INDEX)
+        self.idx_keys = [sort_key(word) for word, *_ in self.idx]
+        self.syn_keys = [sort_key(word) for word, _ in self.syn]
+        self.idx_folded = [folded for folded, _ in self.idx_keys]
+        self.syn_folded = [folded for folded, _ in self.syn_keys]
+        self.articles = DictZip(dict_path)
+
+    @staticmethod
+    def read_words(data, values):
+        """Split .idx or .syn data into (word, *values) tuples."""
+        words = []
+        position = 0
+        while position < len(data):
+            end = data.index(b"\0", position)
+            words.append((data[position:end], *values.unpack_from(data, end + 1)))
+            position = end + 1 + values.size
+        return words
+
+    def article(self, position):
+        """Return the HTML article of the word at a position of the .idx file."""
+        _, offset, size = self.idx[position]
+        return self.articles.read(offset, size).decode("utf-8")
+
+    def lookup(self, word):
+        """
+        Return the articles of a word, found by binary search in the .idx and .syn files.
+        Like StarDict readers, the search ignores the case of ASCII letters; words spelled
+        exactly as asked come first. A word not found is retried in lower case, which also
+        folds the case of non-ASCII letters.
+        """
+        for candidate in dict.fromkeys((word, word.lower())):
+            candidate = candidate.encode("utf-8")
+            folded = sort_key(candidate)[0]
+            matches = []  # (spelled differently, .idx position)
+            start = bisect.bisect_left(self.idx_folded, folded)
+            for position in range(start, bisect.bisect_right(self.idx_folded, folded, start)):
+                matches.append((self.idx[position][0] != candidate, position))
+            start = bisect.bisect_left(self.syn_folded, folded)
+            for number in range(start, bisect.bisect_right(self.syn_folded, folded, start)):
+                matches.append((self.syn[number][0] != candidate, self.syn[number][1]))
+            if matches:
+                positions = dict.fromkeys(position for _, position in sorted(matches, key=lambda match: match[0]))
+                return [self.article(position) for position in positions]
+        return []
+
+
+def check_stardict(output_dir, entries=None):
+    """
+    Check a dictionary written by write_stardict(). The .ifo counts must match the files, the
+    .idx and .syn files must be sorted for binary search, and every article must lie within
+    the .dict file. Given the entries it was written from, every headword, inflection and
+    variant must also lead to the definition of its entry.
+    Args:
+        output_dir (str): Directory of the dictionary files.
+        entries (iterable): Entries of the cleaned dictionary, optional.
+    Returns:
+        dict: Counts of the checked dictionary.
+    Raises:
+        ValueError: The dictionary is not consistent; the message lists what is wrong.
+    """
+    book = StarDict(output_dir)
+    problems = []
+    expected = {
+        "version": VERSION, "bookname": TITLE, "sametypesequence": TYPE_HTML,
+        "wordcount": str(len(book.idx)), "synwordcount": str(len(book.syn)), "idxfilesize": str(book.idx_size),
+    }
+    problems += [f".ifo gives {name}={book.info.get(name)}" for name, value in expected.items() if book.info.get(name) != value]
+    if any(previous > key for previous, key in zip(book.idx_keys, book.idx_keys[1:])):
+        problems.append("the .idx file is not sorted")
+    if any(previous > key for previous, key in zip(book.syn_keys, book.syn_keys[1:])):
+        problems.append("the .syn file is not sorted")
+    problems += [f"synonym {word.decode('utf-8', 'replace')} leads past the .idx file"
+                 for word, position in book.syn if position >= len(book.idx)]
+
+    data = zlib.decompress(book.articles.data, zlib.MAX_WBITS | 16)  # The whole file, as gzip reads it
+    if len(data) > len(book.articles.sizes) * book.articles.chunk_bytes:
+        problems.append("the dictzip chunk table does not cover the .dict file")
+    problems += [f"{word.decode('utf-8', 'replace')} leads past the .dict file"
+                 for word, offset, size in book.idx if offset + size > len(data)]
+    for number in range(len(book.articles.sizes)):
+        start = number * book.articles.chunk_bytes
+        if book.articles.chunk(number) != data[start:start + book.articles.chunk_bytes]:
+            problems.append(f"dictzip chunk {number} does not decompress on its own")
+
+    if entries is not None and not problems:
+        for entry in entries:
+            definition = entry.definition
+            main = entry.headwords[0].strip()
+            if not definition or len(main.encode("utf-8")) > MAX_WORD_BYTES:
+                continue
+            for headword in entry.headwords:
+                headword = headword.strip()
+                if headword and len(headword.encode("utf-8")) <= MAX_WORD_BYTES and definition.strip() not in book.lookup(headword):
+                    problems.append(f"{headword} does not lead to its article")
+
+    if problems:
+        raise ValueError(f"{output_dir}: " + "; ".join(problems[:20]) + (f" and {len(problems) - 20} more" if len(problems) > 20 else ""))
+    return {"words": len(book.idx), "synonyms": len(book.syn), "dict_bytes": len(data)}
+
+
+# Check a StarDict dictionary, or look up words in it
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a StarDict dictionary or look up words in it.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check = commands.add_parser("check", help="check the files of the dictionary")
+    check.add_argument("output_dir")
+    check.add_argument("entries_path", nargs="?", help="intermediate file the dictionary was built from")
+    lookup = commands.add_parser("lookup", help="print the articles of words")
+    lookup.add_argument("output_dir")
+    lookup.add_argument("words", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        entries = iter_entries(args.entries_path) if args.entries_path else None
+        counts = check_stardict(args.output_dir, entries)
+        print(f"{args.output_dir}: {counts['words']} words, {counts['synonyms']} synonyms, {counts['dict_bytes']} bytes of articles")
+    else:
+        book = StarDict(args.output_dir)
+        for word in args.words:
+            articles = book.lookup(word)
+            print(f"{word}: " + ("\n".join(articles) if articles else "not found"))
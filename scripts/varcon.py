@@ -0,0 +1,288 @@
+import hashlib
+import os
+import struct
+import sys
+from array import array
+from archives import iter_zip_lines
+
+# Environment variable naming the directory of compiled tables; empty to compile on every build
+CACHE_ENV = "VARCON_CACHE_DIR"
+DEFAULT_CACHE_DIR = os.path.join(".cache", "varcon")
+
+VARCON_MEMBER = "varcon.txt"  # Member of varcon.zip holding the variants
+
+# Modules whose source decides the compiled table: this parser and the archive reader it uses
+COMPILER_SOURCES = [os.path.abspath(__file__), os.path.join(os.path.dirname(os.path.abspath(__file__)), "archives.py")]
+
+# Spelling tags kept from VarCon: American, British, British -ize (Oxford), Canadian, Australian
+TAGS = "ABZCD"
+
+# Compiled table: header, cluster and word index arrays, then the spellings
+TABLE_MAGIC = b"VCON"
+TABLE_VERSION = 1
+TABLE_HEADER = struct.Struct("<4sHHIII")  # magic, version, flags, word count, cluster count, member count
+
+
+def tag_mask(tags):
+    """Return the bit mask of the spelling tags in TAGS found among the given tags."""
+    mask = 0
+    for tag in tags:
+        bit = TAGS.find(tag) if len(tag) == 1 else -1
+        if bit >= 0:
+            mask |= 1 << bit
+    return mask
+
+
+def parse_clusters(lines):
+    """
+    Extract spelling variant clusters from varcon.txt lines.
+    Each line lists the spellings of one word, e.g. "A Z: realize / B: realise". Usage
+    information after a " | " is ignored, and so are spellings that only carry variant
+    or questionable tags (such as "Av" or "B-"). Lines left with fewer than two
+    distinct spellings are skipped.
+    Args:
+        lines (iterable): Lines of varcon.txt.
+    Yields:
+        list: (spelling, tag mask) pairs of a cluster, in the order they appear on the line.
+    """
+    for line in lines:
+        # Skip comments and empty lines
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        # Ignore usage information after "|"
+        line = line.split('|')[0].strip()
+
+        spellings = {}
+        for part in line.split('/'):
+            if ': ' not in part:
+                continue  # Skip invalid parts
+
+            # Split only the first occurrence of ': '
+            tags, word = part.split(': ', 1)
+            word = word.strip()
+            mask = tag_mask(tags.split())
+            if word and mask:
+                spellings[word] = spellings.get(word, 0) | mask
+
+        if len(spellings) > 1:
+            yield list(spellings.items())
+
+
+def little_endian(values):
+    """Return an array converted to (or back from) little-endian byte order."""
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class VariantTable:
+    """
+    Every VarCon spelling cluster, stored in flat arrays indexed by word id: the
+    members and tag masks of each cluster, and for each spelling the clusters it
+    belongs to. The compiled form loads with a few array copies, without parsing.
+    """
+    __slots__ = ("words", "cluster_offsets", "members", "tags", "word_offsets", "word_clusters", "_ids")
+
+    def __init__(self, words, cluster_offsets, members, tags, word_offsets, word_clusters):
+        self.words = words
+        self.cluster_offsets = cluster_offsets
+        self.members = members
+        self.tags = tags
+        self.word_offsets = word_offsets
+        self.word_clusters = word_clusters
+        self._ids = None
+
+    @classmethod
+    def from_clusters(cls, clusters):
+        """
+        Build a table from parsed clusters.
+        Args:
+            clusters (iterable): Lists of (spelling, tag mask) pairs, see parse_clusters().
+        Returns:
+            VariantTable: The table.
+        """
+        ids = {}
+        cluster_offsets = array("I", [0])
+        members = array("I")
+        tags = array("B")
+        for cluster in clusters:
+            for word, mask in cluster:
+                members.append(ids.setdefault(word, len(ids)))
+                tags.append(mask)
+            cluster_offsets.append(len(members))
+
+        # Invert the clusters into the clusters of each word
+        word_lists = [[] for _ in ids]
+        for cluster in range(len(cluster_offsets) - 1):
+            for position in range(cluster_offsets[cluster], cluster_offsets[cluster + 1]):
+                word_lists[members[position]].append(cluster)
+        word_offsets = array("I", [0])
+        word_clusters = array("I")
+        for word_list in word_lists:
+            word_clusters.extend(word_list)
+            word_offsets.append(len(word_clusters))
+
+        table = cls(list(ids), cluster_offsets, members, tags, word_offsets, word_clusters)
+        table._ids = ids
+        return table
+
+    def __len__(self):
+        return len(self.cluster_offsets) - 1
+
+    def word_id(self, word):
+        """Return the id of a spelling, or None if VarCon does not list it."""
+        if self._ids is None:
+            self._ids = {word: idx for idx, word in enumerate(self.words)}
+        return self._ids.get(word)
+
+    def cluster(self, idx):
+        """
+        Return a cluster.
+        Args:
+            idx (int): Index of the cluster.
+        Returns:
+            list: (spelling, tags) pairs, where tags is a string of the TAGS letters.
+        """
+        return [
+            (self.words[self.members[position]], "".join(tag for bit, tag in enumerate(TAGS) if self.tags[position] >> bit & 1))
+            for position in range(self.cluster_offsets[idx], self.cluster_offsets[idx + 1])
+        ]
+
+    def variants(self, word):
+        """
+        Return the other spellings of a word.
+        Args:
+            word (str): A spelling.
+        Returns:
+            list: The other spellings of every cluster holding the word, in VarCon order.
+        """
+        word_id = self.word_id(word)
+        if word_id is None:
+            return []
+        found = []
+        for position in range(self.word_offsets[word_id], self.word_offsets[word_id + 1]):
+            cluster = self.word_clusters[position]
+            for member in self.members[self.cluster_offsets[cluster]:self.cluster_offsets[cluster + 1]]:
+                if member != word_id and self.words[member] not in found:
+                    found.append(self.words[member])
+        return found
+
+
+def pack_table(table):
+    """
+    Encode a variant table in its compiled form: TABLE_HEADER, the little-endian 32-bit
+    cluster offsets, cluster members and word offsets, the word clusters, the 8-bit tag
+    masks and finally the UTF-8 spellings separated by newlines.
+    Args:
+        table (VariantTable): The table to encode.
+    Returns:
+        bytes: The compiled table.
+    """
+    header = TABLE_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, 0, len(table.words), len(table), len(table.members))
+    parts = [header]
+    for values in (table.cluster_offsets, table.members, table.word_offsets, table.word_clusters):
+        parts.append(little_endian(array("I", values)).tobytes())
+    parts.append(table.tags.tobytes())
+    parts.append("\n".join(table.words).encode("utf-8"))
+    return b"".join(parts)
+
+
+def unpack_table(data):
+    """
+    Decode a compiled variant table.
+    Args:
+        data (bytes): The compiled table, see pack_table().
+    Returns:
+        VariantTable: The table.
+    """
+    magic, version, _, word_count, cluster_count, member_count = TABLE_HEADER.unpack_from(data)
+    if magic != TABLE_MAGIC or version != TABLE_VERSION:
+        raise ValueError(f"Unsupported variant table (magic {magic!r}, version {version})")
+
+    offset = TABLE_HEADER.size
+    arrays = []
+    for count in (cluster_count + 1, member_count, word_count + 1, member_count):
+        values = array("I")
+        values.frombytes(data[offset:offset + count * values.itemsize])
+        arrays.append(little_endian(values))
+        offset += count * values.itemsize
+    cluster_offsets, members, word_offsets, word_clusters = arrays
+
+    tags = array("B", data[offset:offset + member_count])
+    offset += member_count
+    words = data[offset:].decode("utf-8").split("\n") if word_count else []
+    return VariantTable(words, cluster_offsets, members, tags, word_offsets, word_clusters)
+
+
+def load_table(path):
+    """Read a compiled variant table from a file."""
+    with open(path, 'rb') as file:
+        return unpack_table(file.read())
+
+
+def write_table(path, table):
+    """Write a variant table to a file in its compiled form."""
+    with open(path, 'wb') as file:
+        file.write(pack_table(table))
+
+
+def compile_archive(zip_path):
+    """
+    Parse varcon.txt straight out of its zip archive into a variant table.
+    Args:
+        zip_path (str): Path to the zip file containing varcon.txt.
+    Returns:
+        VariantTable: The table.
+    """
+    return VariantTable.from_clusters(parse_clusters(iter_zip_lines(zip_path, encoding='latin-1', names=[VARCON_MEMBER])))
+
+
+def archive_digest(zip_path):
+    """Return the SHA-256 hex digest of the VarCon archive."""
+    digest = hashlib.sha256()
+    with open(zip_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compiler_digest():
+    """Return the SHA-256 hex digest of the sources in COMPILER_SOURCES, so that editing the parser recompiles tables."""
+    digest = hashlib.sha256()
+    for path in COMPILER_SOURCES:
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def cached_table(zip_path, cache_dir=None):
+    """
+    Return the variant table of a VarCon archive, compiling it only the first time the
+    archive is seen with the current parser. Compiled tables are cached by the hashes of the
+    archive and of the parser's source (see compiler_digest()), and by TABLE_VERSION.
+    Args:
+        zip_path (str): Path to the zip file containing varcon.txt.
+        cache_dir (str): Directory of compiled tables; by default taken from the CACHE_ENV
+            environment variable, falling back to DEFAULT_CACHE_DIR. Empty to disable the cache.
+    Returns:
+        VariantTable: The table.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get(CACHE_ENV, DEFAULT_CACHE_DIR)
+    if not cache_dir:
+        return compile_archive(zip_path)
+
+    path = os.path.join(cache_dir, f"{archive_digest(zip_path)}.{compiler_digest()[:16]}.v{TABLE_VERSION}.bin")
+    try:
+        return load_table(path)
+    except (OSError, ValueError, struct.error):
+        pass  # Not compiled yet, or unreadable: compile it again
+
+    table = compile_archive(zip_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    partial_path = f"{path}.{os.getpid()}.tmp"
+    write_table(partial_path, table)
+    os.replace(partial_path, path)  # Concurrent builds never see a partial table
+    return table
@@ -0,0 +1,316 @@
+import os
+import re
+
+# Environment variable with the target size of an XHTML shard in bytes
+SHARD_BYTES_ENV = "XHTML_SHARD_BYTES"
+# Environment variable with the number of processes 13.convert-to-xhtml.py renders shards on
+WORKERS_ENV = "XHTML_WORKERS"
+# About 15000 entries of the full dictionary per shard, the batch size used before shards were sized
+DEFAULT_SHARD_BYTES = 6 << 20
+
+# Metadata of the dictionary, written to dictionary.opf and to the EXTH header of dictionary.mobi
+TITLE = "Англо-український словник М.І.Балла"
+CREATOR = "М. Балла"
+PUBLISHER = "Освіта"
+IN_LANGUAGE = "en"  # Language of the headwords
+OUT_LANGUAGE = "uk"  # Language of the definitions
+
+OPF_NAME = "dictionary.opf"
+SHARD_PATTERN = re.compile(r"dictionary-(\d+)\.xhtml")
+
+XHTML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<html xmlns:math="http://exslt.org/math" xmlns:svg="http://www.w3.org/2000/svg"\n'
+    '  xmlns:tl="https://kindlegen.s3.amazonaws.com/AmazonKindlePublishingGuidelines.pdf"\n'
+    '  xmlns:saxon="http://saxon.sf.net/" xmlns:xs="http://www.w3.org/2001/XMLSchema"\n'
+    '  xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"\n'
+    '  xmlns:cx="https://kindlegen.s3.amazonaws.com/AmazonKindlePublishingGuidelines.pdf"\n'
+    '  xmlns:dc="http://purl.org/dc/elements/1.1/"\n'
+    '  xmlns:mbp="https://kindlegen.s3.amazonaws.com/AmazonKindlePublishingGuidelines.pdf"\n'
+    '  xmlns:mmc="https://kindlegen.s3.amazonaws.com/AmazonKindlePublishingGuidelines.pdf"\n'
+    '  xmlns:idx="https://kindlegen.s3.amazonaws.com/AmazonKindlePublishingGuidelines.pdf">\n'
+    '<head><link rel="stylesheet" href="style.css" /></head>\n'
+    '<body>\n'
+    '<mbp:frameset>\n'
+)
+XHTML_FOOTER = (
+    '</mbp:frameset>\n'
+    '</body>\n'
+    '</html>\n'
+)
+
+# The package file of kindlegen; the manifest, spine and guide list the shards actually written
+OPF_TEMPLATE = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="2.0" unique-identifier="BookID">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>{title}</dc:title>
+    <dc:language>{in_language}</dc:language>
+    <!-- <dc:identifier id="BookID">urn:uuid:12345-67890-nothing</dc:identifier> -->
+    <dc:creator>{creator}</dc:creator>
+    <dc:publisher>{publisher}</dc:publisher>
+    <!-- <meta name="cover" content="cover-image" /> --> <!-- Optional: Reference a cover image -->
+  </metadata>
+
+
+  <x-metadata>
+    <!-- The language of the dictionary's source words (English) -->
+    <DictionaryInLanguage>{in_language}</DictionaryInLanguage>
+
+    <!-- The language of the dictionary's definitions (Ukrainian) -->
+    <DictionaryOutLanguage>{out_language}</DictionaryOutLanguage>
+
+    <DefaultLookupIndex>default</DefaultLookupIndex>
+
+    <!-- Explicitly marks this as a dictionary -->
+    <CdeType>DICTIONARY</CdeType>
+
+    <!-- UTF-8 encoding for Cyrillic compatibility -->
+    <output encoding="UTF-8" />
+
+    <!-- Human-readable title -->
+    <Title>{title}</Title>
+  </x-metadata>
+
+  <manifest>
+    <!-- Main dictionary file -->
+{manifest}
+
+    <!-- Optional: Table of Contents (not required for dictionaries) -->
+    <!-- <item id="toc" href="toc.ncx" media-type="application/x-dtbncx+xml" /> -->
+
+    <!-- Optional: Cover image -->
+    <!-- <item id="cover-image" href="cover.jpg" media-type="image/jpeg" /> -->
+  </manifest>
+
+  <spine>
+{spine}
+  </spine>
+
+  <guide>
+{guide}
+  </guide>
+</package>
+"""
+
+
+def shard_bytes():
+    """Return the target size of an XHTML shard in bytes, from SHARD_BYTES_ENV (default: DEFAULT_SHARD_BYTES)."""
+    return max(1, int(os.environ.get(SHARD_BYTES_ENV) or DEFAULT_SHARD_BYTES))
+
+
+def xhtml_workers():
+    """Return the number of processes to render XHTML shards on, from WORKERS_ENV (default: 1, inline)."""
+    return max(1, int(os.environ.get(WORKERS_ENV) or 1))
+
+
+def shard_name(number):
+    """Return the file name of the XHTML shard with the given number, counted from 1."""
+    return f"dictionary-{number}.xhtml"
+
+
+def render_fields(headwords, definition):
+    """
+    Render the headwords and definition of a dictionary entry as a Kindle <idx:entry> element.
+    The first headword is the one looked up; the others are listed as its inflections.
+    Args:
+        headwords (list): Headwords of the entry.
+        definition (str): The definition, in the cleaned markup.
+    Returns:
+        str: The element, followed by a newline.
+    """
+    main_headword = headwords[0].strip()
+    inflections = ""
+    if len(headwords) > 1:
+        inflections = "".join(f'<idx:iform value="{inflection.strip()}" />' for inflection in headwords[1:])
+        inflections = f"<idx:infl>{inflections}</idx:infl>"
+    return (
+        f'<idx:entry name="default" scriptable="yes" spell="yes"><h5><dt><idx:orth value="{main_headword}">'
+        f'{main_headword}{inflections}</idx:orth></dt></h5><dd>{definition.strip()}</dd><mbp:pagebreak /></idx:entry>\n'
+    )
+
+
+def render_entry(entry):
+    """Render a dictionary entry with a definition as a Kindle <idx:entry> element, see render_fields()."""
+    return render_fields(entry.headwords, entry.definition)
+
+
+# Bytes render_fields() adds around the text of an entry, of its inflection list and of each inflection
+ENTRY_MARKUP_BYTES = len(render_fields([""], ""))
+INFLECTION_MARKUP_BYTES = len(render_fields(["", "", ""], "")) - len(render_fields(["", ""], ""))
+INFLECTIONS_MARKUP_BYTES = len(render_fields(["", ""], "")) - ENTRY_MARKUP_BYTES - INFLECTION_MARKUP_BYTES
+
+
+def utf8_size(text):
+    """Return the length of a string in UTF-8 bytes."""
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+def entry_size(headwords, definition):
+    """Return the size in bytes of render_fields(headwords, definition), without rendering it."""
+    size = ENTRY_MARKUP_BYTES + 2 * utf8_size(headwords[0].strip()) + utf8_size(definition.strip())
+    if len(headwords) > 1:
+        size += INFLECTIONS_MARKUP_BYTES
+        for inflection in headwords[1:]:
+            size += INFLECTION_MARKUP_BYTES + utf8_size(inflection.strip())
+    return size
+
+
+class ShardWriter:
+    """
+    Writes rendered entries to dictionary-N.xhtml files of about a target size each.
+    A shard is closed before the entry that would take it over the target, so a shard
+    only exceeds the target when a single entry does.
+    """
+
+    def __init__(self, output_dir, target_bytes):
+        """
+        Args:
+            output_dir (str): Directory to write the shards to.
+            target_bytes (int): Target size of a shard, including its header and footer.
+        """
+        self.output_dir = output_dir
+        self.target_bytes = target_bytes
+        self.header = XHTML_HEADER.encode("utf-8")
+        self.footer = XHTML_FOOTER.encode("utf-8")
+        self.shards = []  # (path, entries, bytes) of every closed shard
+        self.file = None
+        self.path = None
+        self.entries = 0
+        self.size = 0
+
+    def open_shard(self):
+        """Start the next shard."""
+        self.path = os.path.join(self.output_dir, shard_name(len(self.shards) + 1))
+        self.file = open(self.path, "wb")
+        self.file.write(self.header)
+        self.entries = 0
+        self.size = len(self.header) + len(self.footer)
+
+    def close_shard(self):
+        """Finish the current shard and record its entry and byte counts."""
+        self.file.write(self.footer)
+        self.file.close()
+        self.file = None
+        self.shards.append((self.path, self.entries, self.size))
+
+    def write(self, xhtml_entry):
+        """Append a rendered entry, starting a new shard when it would take the current one over the target."""
+        data = xhtml_entry.encode("utf-8")
+        if self.file is not None and self.entries and self.size + len(data) > self.target_bytes:
+            self.close_shard()
+        if self.file is None:
+            self.open_shard()
+        self.file.write(data)
+        self.entries += 1
+        self.size += len(data)
+
+    def close(self):
+        """
+        Finish the last shard; a dictionary without entries still gets one empty shard.
+        Returns:
+            list: (path, entries, bytes) of every shard, in order.
+        """
+        if self.file is None and not self.shards:
+            self.open_shard()
+        if self.file is not None:
+            self.close_shard()
+        return self.shards
+
+
+def plan_shards(entries, output_dir, target_bytes):
+    """
+    Assign dictionary entries to shards of about a target size, by the same rule as ShardWriter,
+    before any of them is rendered.
+    Args:
+        entries (iterable): Entries of the cleaned dictionary; entries without a definition are skipped.
+        output_dir (str): Directory of the shards.
+        target_bytes (int): Target size of a shard, including its header and footer.
+    Yields:
+        tuple: The path of a shard, the (headwords, definition) pairs of its entries and its size in bytes.
+    """
+    empty_size = utf8_size(XHTML_HEADER) + utf8_size(XHTML_FOOTER)
+    number = 1
+    fields = []
+    size = empty_size
+    for entry in entries:
+        definition = entry.definition
+        if not definition:
+            continue
+        added = entry_size(entry.headwords, definition)
+        if fields and size + added > target_bytes:
+            yield os.path.join(output_dir, shard_name(number)), fields, size
+            number += 1
+            fields = []
+            size = empty_size
+        fields.append((entry.headwords, definition))
+        size += added
+    if fields or number == 1:
+        yield os.path.join(output_dir, shard_name(number)), fields, size
+
+
+def render_shard(path, fields):
+    """
+    Process pool worker: render the entries of a shard into one buffer and write it with a single write.
+    Args:
+        path (str): Path of the shard.
+        fields (list): (headwords, definition) pairs of the entries of the shard.
+    Returns:
+        tuple: The path, the number of entries and the size in bytes of the shard.
+    """
+    parts = [XHTML_HEADER]
+    parts.extend(render_fields(headwords, definition) for headwords, definition in fields)
+    parts.append(XHTML_FOOTER)
+    data = "".join(parts).encode("utf-8")
+    with open(path, "wb") as file:
+        file.write(data)
+    return path, len(fields), len(data)
+
+
+def remove_stale_shards(output_dir, count):
+    """Delete dictionary-N.xhtml files numbered above count, left over from a build with more shards."""
+    for name in os.listdir(output_dir):
+        match = SHARD_PATTERN.fullmatch(name)
+        if match and int(match.group(1)) > count:
+            os.remove(os.path.join(output_dir, name))
+
+
+def write_opf(output_dir, count):
+    """
+    Write the package file listing the XHTML shards in its manifest, spine and guide.
+    Args:
+        output_dir (str): Directory of the shards.
+        count (int): Number of shards.
+    Returns:
+        str: Path of the written file.
+    """
+    numbers = range(1, count + 1)
+    path = os.path.join(output_dir, OPF_NAME)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(OPF_TEMPLATE.format(
+            title=TITLE,
+            creator=CREATOR,
+            publisher=PUBLISHER,
+            in_language=IN_LANGUAGE,
+            out_language=OUT_LANGUAGE,
+            manifest="\n".join(
+                f'    <item id="dictionary{number}" href="{shard_name(number)}" media-type="application/xhtml+xml" />'
+                for number in numbers
+            ),
+            spine="\n".join(f'    <itemref idref="dictionary{number}" />' for number in numbers),
+            guide="\n".join(
+                f'    <reference type="index" title="IndexName" href="{shard_name(number)}" />' for number in numbers
+            ),
+        ))
+    return path
+
+
+def report_shards(shards):
+    """Print the entry and byte counts of every shard."""
+    for path, entries, size in shards:
+        print(f"Written {entries} entries ({size} bytes) to {path}")
+    sizes = [size for _, _, size in shards]
+    print(
+        f"\033[1;32m{len(shards)} XHTML shards of {sum(entries for _, entries, _ in shards)} entries, "
+        f"{min(sizes)} to {max(sizes)} bytes\033[0m"
+    )
@@ -0,0 +1,47 @@
+import os
+import shutil
+import cache
+from conftest import ROOT_DIR
+from main import scripts
+
+
+def stage_keys():
+    """Return the cache key of every stage, for the same (empty) inputs and options."""
+    return {script_name: cache.stage_key(script_name, []) for script_name in scripts}
+
+
+def edited_keys(tmp_path, monkeypatch, module):
+    """Return the stage keys before and after appending a comment to a module of a copy of scripts/."""
+    scripts_dir = tmp_path / "scripts"
+    shutil.copytree(os.path.join(ROOT_DIR, cache.SCRIPTS_DIR), scripts_dir, ignore=shutil.ignore_patterns("__pycache__"))
+    monkeypatch.setattr(cache, "SCRIPTS_DIR", str(scripts_dir))
+    before = stage_keys()
+    with open(scripts_dir / module, "a", encoding="utf-8") as file:
+        file.write("\n# An edit that does not change the output\n")
+    return before, stage_keys()
+
+
+def changed_stages(before, after):
+    return {script_name for script_name in before if before[script_name] != after[script_name]}
+
+
+def test_markup_edit_only_misses_clean_markup(tmp_path, monkeypatch):
+    # Later stages only rebuild if the output of 12 changes, which their input digests cover
+    assert changed_stages(*edited_keys(tmp_path, monkeypatch, "markup.py")) == {"12.clean-markup.py"}
+
+
+def test_output_format_edits_leave_pipeline_stages_cached(tmp_path, monkeypatch):
+    before, after = edited_keys(tmp_path, monkeypatch, "xhtml.py")
+    assert changed_stages(before, after) == {
+        "13.convert-to-xhtml.py", "14.convert-to-mobi.py", "15.convert-to-stardict.py",
+    }
+
+
+def test_entries_edit_misses_every_stage_reading_entries(tmp_path, monkeypatch):
+    assert changed_stages(*edited_keys(tmp_path, monkeypatch, "entries.py")) == set(scripts) - {"02.varcon-csv.py"}
+
+
+def test_stage_modules_follow_imports_through_helpers():
+    assert cache.stage_modules("07.adjectives.py") == [
+        "07.adjectives.py", "entries.py", "inflection.py", "inflection_cache.py", "links.py",
+    ]
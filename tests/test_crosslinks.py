@@ -0,0 +1,33 @@
+import importlib.util
+import os
+from conftest import ROOT_DIR
+from entries import parse_entries
+
+
+def crosslink(key, target):
+    """A cross-link line of the sanitized dictionary: key, see target."""
+    return (
+        f'{key}\t<div style="margin-left:1em"><i class="p"><font color="green">див.</font></i> '
+        f"&lt;&lt;{target}&gt;&gt;</div>"
+    )
+
+
+def resolve(lines):
+    spec = importlib.util.spec_from_file_location("crosslinks", os.path.join(ROOT_DIR, "scripts", "01.crosslinks.py"))
+    stage = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(stage)
+    return [(entry.headwords, entry.definition) for entry in stage.run(list(parse_entries(lines)))]
+
+
+def test_two_hop_chain(capsys):
+    lines = [crosslink("hue", "colour"), crosslink("colour|color", "paint"), "paint\tфарба", "red\tчервоний"]
+    assert resolve(lines) == [(["paint", "colour", "color", "hue"], "фарба"), (["red"], "червоний")]
+    assert "Unresolved" not in capsys.readouterr().out
+
+
+def test_cycle_and_missing_target(capsys):
+    lines = [crosslink("a", "b"), crosslink("b", "a"), crosslink("x", "nowhere"), "paint\tфарба"]
+    assert resolve(lines) == [(["paint"], "фарба")]  # Unresolved cross-links are dropped
+    out = capsys.readouterr().out
+    assert "Unresolved cross-links: 3" in out
+    assert out.splitlines()[-3:] == ["a -> b (cycle)", "b -> a (cycle)", "x -> nowhere (missing)"]
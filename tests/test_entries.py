@@ -0,0 +1,141 @@
+import io
+import struct
+from entries import (
+    BINARY_HEADER, FLAG_TAGS, Entry, EntryFile, is_binary, iter_binary, iter_entries, line_ranges, pack_entries,
+    parse_entries, read_entries, read_lines, serialize_entries, write_entries,
+)
+from links import CROSSLINK, PLURAL, REGULAR
+
+CROSSLINK_LINE = (
+    'colour|color\t<div style="margin-left:1em"><i class="p"><font color="green">див.</font></i> '
+    "&lt;&lt;paint&gt;&gt;</div>"
+)
+PLURAL_LINE = (
+    'mice\t<div style="margin-left:1em"><i class="p"><font color="green">pl</font></i> від '
+    "&lt;&lt;mouse&gt;&gt;</div>"
+)
+LINES = [
+    "go|went|gone\t<b>go</b> <i>v</i> іти, їхати",
+    CROSSLINK_LINE,
+    PLURAL_LINE,
+    "orphan",  # A headword without a definition
+    "naïve|naive\tнаївний\tз табуляцією",  # The definition is everything after the first tab
+]
+TSV = "".join(f"{line}\n" for line in LINES)
+
+
+def as_tuples(entries):
+    return [(entry.headwords, entry.definition, entry.tag) for entry in entries]
+
+
+def strip_tags(data):
+    """Rewrite a binary file without its link tag bytes, as written before FLAG_TAGS existed."""
+    magic, version, flags, count, headwords_size = BINARY_HEADER.unpack_from(data)
+    tags_start = BINARY_HEADER.size + 8 * (count + 1)
+    header = BINARY_HEADER.pack(magic, version, flags & ~FLAG_TAGS, count, headwords_size)
+    return header + data[BINARY_HEADER.size:tags_start] + data[tags_start + count:]
+
+
+def test_tsv_round_trip():
+    entries = list(parse_entries(io.StringIO(TSV)))
+    assert serialize_entries(entries, binary=False).decode("utf-8") == TSV
+
+
+def test_parsed_fields():
+    go, colour, mice, orphan, naive = parse_entries(io.StringIO(TSV))
+    assert go.headwords == ["go", "went", "gone"]
+    assert go.key == "go|went|gone"
+    assert go.definition == "<b>go</b> <i>v</i> іти, їхати"
+    assert (go.tag, colour.tag, mice.tag) == (REGULAR, CROSSLINK, PLURAL)
+    assert colour.link_target() == "paint"
+    assert naive.definition == "наївний\tз табуляцією"
+
+
+def test_entry_without_definition():
+    entry = Entry.from_line("orphan\n")
+    assert entry.headwords == ["orphan"]
+    assert entry.definition == ""
+    assert entry.to_line() == "orphan"
+    assert entry.encoded_definition() == b""
+
+
+def test_parse_skips_blank_lines_and_strips_whitespace():
+    entries = list(parse_entries(["\n", "  go|went\tіти  \r\n", "   \n"]))
+    assert as_tuples(entries) == [(["go", "went"], "іти", REGULAR)]
+
+
+def test_binary_round_trip():
+    entries = list(parse_entries(io.StringIO(TSV)))
+    data = pack_entries(entries)
+    assert BINARY_HEADER.unpack_from(data)[2] & FLAG_TAGS
+    restored = list(iter_binary(io.BytesIO(data)))
+    assert as_tuples(restored) == as_tuples(entries)
+    assert [entry._tag for entry in restored] == [entry.tag for entry in entries]  # Tags come from the file
+    assert serialize_entries(restored, binary=False).decode("utf-8") == TSV
+
+
+def test_binary_without_tags():
+    entries = list(parse_entries(io.StringIO(TSV)))
+    restored = list(iter_binary(io.BytesIO(strip_tags(pack_entries(entries)))))
+    assert [entry._tag for entry in restored] == [None] * len(entries)  # Tags are classified on demand
+    assert as_tuples(restored) == as_tuples(entries)
+
+
+def test_binary_offsets_are_little_endian():
+    data = pack_entries(list(parse_entries(["a\txy", "b\tz"])))
+    assert struct.unpack_from("<3Q", data, BINARY_HEADER.size) == (0, 2, 3)
+
+
+def test_empty_dictionary():
+    assert list(iter_binary(io.BytesIO(pack_entries([])))) == []
+    assert serialize_entries([], binary=False) == b""
+
+
+def test_files_in_both_formats(tmp_path):
+    entries = list(parse_entries(io.StringIO(TSV)))
+    tsv_path, binary_path = tmp_path / "entries.txt", tmp_path / "entries.bin"
+    write_entries(tsv_path, entries, binary=False)
+    write_entries(binary_path, entries, binary=True)
+
+    assert tsv_path.read_text(encoding="utf-8") == TSV
+    assert not is_binary(tsv_path) and is_binary(binary_path)
+    assert as_tuples(read_entries(tsv_path)) == as_tuples(entries)
+    assert as_tuples(iter_entries(binary_path)) == as_tuples(entries)
+    assert as_tuples(EntryFile(binary_path)) == as_tuples(EntryFile(binary_path))  # Iterable more than once
+
+    write_entries(tmp_path / "back.txt", read_entries(binary_path), binary=False)
+    assert (tmp_path / "back.txt").read_bytes() == tsv_path.read_bytes()
+
+
+def read_ranges(path, chunk_size):
+    ranges = line_ranges(path, chunk_size)
+    return ranges, [line for start, end in ranges for line in read_lines(path, start, end)]
+
+
+def test_line_ranges_at_chunk_boundaries(tmp_path):
+    path = tmp_path / "entries.txt"
+    path.write_bytes(TSV.encode("utf-8"))
+    size = path.stat().st_size
+    lines = TSV.splitlines(keepends=True)
+    line_ends = {sum(len(line.encode("utf-8")) for line in lines[:number]) for number in range(1, len(lines) + 1)}
+    for chunk_size in [1, 2, 7, len(lines[0].encode("utf-8")), len(lines[0].encode("utf-8")) + 1, size - 1, size, 10 * size]:
+        ranges, read = read_ranges(path, chunk_size)
+        assert ranges[0][0] == 0 and ranges[-1][1] == size
+        assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+        assert {end for _, end in ranges} <= line_ends  # Ranges never split a line
+        assert read == lines
+
+
+def test_line_ranges_with_crlf_and_no_final_newline(tmp_path):
+    path = tmp_path / "entries.txt"
+    path.write_bytes("go\tіти\r\nsee|saw\tбачити\r\nlast\tостанній".encode("utf-8"))
+    for chunk_size in [1, 3, 9, 100]:
+        _, read = read_ranges(path, chunk_size)
+        assert read == ["go\tіти\n", "see|saw\tбачити\n", "last\tостанній"]  # Newlines translated as in text mode
+        assert as_tuples(parse_entries(read)) == as_tuples(iter_entries(path))
+
+
+def test_line_ranges_of_empty_file(tmp_path):
+    path = tmp_path / "entries.txt"
+    path.write_bytes(b"")
+    assert line_ranges(path, 10) == []
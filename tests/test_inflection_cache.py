@@ -0,0 +1,36 @@
+import importlib.util
+from inflection import Inflector
+
+STAGE = '''
+def inflect(word):
+    return [word + "{suffix}"]
+'''
+
+
+def load_stage(path, suffix):
+    path.write_text(STAGE.format(suffix=suffix), encoding="utf-8")
+    spec = importlib.util.spec_from_file_location(f"stage_{suffix}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.inflect
+
+
+def inflect(stage_path, suffix):
+    """Inflect one word with the table backend, returning its library key, the forms and the number of cache hits."""
+    inflector = Inflector(("VBD",), load_stage(stage_path, suffix), None, backend="pyinflect")
+    forms = inflector("walk")
+    inflector.close()
+    return inflector.table_cache.library, forms, inflector.table_cache.hits
+
+
+def test_table_answers_are_keyed_on_the_stage_source(tmp_path, monkeypatch):
+    monkeypatch.setenv("INFLECTION_CACHE", str(tmp_path / "inflections.sqlite"))
+    stage_path = tmp_path / "stage.py"
+    library, forms, hits = inflect(stage_path, "ed")
+    assert (forms, hits) == (["walked"], 0)
+    assert inflect(stage_path, "ed") == (library, ["walked"], 1)
+
+    # Editing the rules of the stage must not return the answers cached before the edit
+    edited_library, forms, hits = inflect(stage_path, "t")
+    assert edited_library != library
+    assert (forms, hits) == (["walkt"], 0)
@@ -0,0 +1,84 @@
+import re
+from markup import MarkupCleaner
+
+
+def old_chain(content):
+    """The ordered chain of replacements 12.clean-markup.py applied before the rule table, verbatim."""
+    content = content.replace('\\n', '<br>')
+    content = content.replace('[m1]', '')
+    content = content.replace('<font color="brown">□</font>', '•')
+    content = re.sub(r'<font color="green">(.*?)</font>', r'\1', content)
+    content = re.sub(r'<font color="steelblue">(.*?)</font>', r'\1', content)
+    content = re.sub(r'<font color="darkred">(.*?)</font>', r'\1', content)
+    content = re.sub(r'<font color="darkslateblue">(.*?)</font>', r'\1', content)
+    content = re.sub(r"&lt;&lt;(.*?)&gt;&gt;", r'<a href="#\1">\1</a>', content)
+    content = re.sub(r'<div style="margin-left:1em">(.*?)</div>', r'&ensp;\1', content, flags=re.DOTALL)
+    content = re.sub(r'<div style="margin-left:2em">(.*?)</div>', r'&ensp;&ensp;\1', content, flags=re.DOTALL)
+    content = re.sub(
+        r'<div style="margin-left:3em"><span class="sec">(.*?)</span></div>', r'&ensp;&ensp;&ensp;\1', content,
+        flags=re.DOTALL,
+    )
+    content = re.sub(r'<span class="ex">(.*?)</span>', r'<span>\1</span>', content, flags=re.DOTALL)
+    content = re.sub(r'<i class="p">(.*?)</i>', r'<em>\1</em>', content, flags=re.DOTALL)
+    content = re.sub(
+        r'<font color="(royalblue|red|dodgerblue|saddlebrown)">(.*?)</font>', r'<span>\2</span>', content,
+        flags=re.DOTALL,
+    )
+    return content
+
+
+# Lines the single pass rewrites on its own
+SINGLE_PASS_LINES = [
+    "plain\tтекст без розмітки",
+    'go|went\t[m1]<div style="margin-left:1em"><i class="p"><font color="green">v</font></i> іти\\nїхати</div>',
+    'x\t<div style="margin-left:3em"><span class="sec">1.</span></div><span class="ex">an example</span>',
+    'x\t<font color="royalblue">a <font color="green">b</font> c</font>',  # Same group, rewritten by an earlier rule
+    'x\t<font color="brown">□</font> <font color="red">r</font> &lt;&lt;word&gt;&gt; &amp; &#39;',
+    'x\t<div><span class="sec">kept</span></div> <b>bold</b>',
+    "x\t1 < 2 and 3 > 2",  # Reads as a tag no rule rewrites
+    'x\t<font color="blue">a <font color="green">b</font> c</font>',  # Inside a font no rule rewrites
+    'x\t<div style="margin-left:2em">a <div style="margin-left:1em">b</div> c</div>',  # Inner rule comes first
+]
+
+# Lines that fall back to the ordered rules
+FALLBACK_LINES = [
+    'x\t<font color="green">unclosed',
+    'x\t<div style="margin-left:1em">unclosed <i class="p">n</i>',
+    "x\tunopened</font> and </div>",
+    'x\t<span class="ex">ex</span></div>',
+    "x\ta < b",
+    "x\ta > b",
+    "x\ta &gt; b, c &lt; d",
+    "x\t&lt;&lt;unclosed link",
+    "x\tstray &gt;&gt; closer",
+    "x\t&lt;&lt;a&gt;&gt; &lt;&lt;b",
+    'x\t<font color="red">a <font color="royalblue">b</font> c</font>',  # Nested tags of one rule
+    'x\t<font color="green">a <font color="red">b</font> c</font>',  # Inner tag of a later rule
+    'x\t<div style="margin-left:1em">a <div style="margin-left:2em">b</div> c</div>',
+    'x\t<span class="ex">a <span class="ex">b</span> c</span>',
+    'x\t<i class="p">a <i class="p">b</i></i>',
+    'x\t<font color="brown">□ unclosed brown',
+    'x\t<div style="margin-left:3em">no span</div>',
+    'x\t<span class="sec">a</span></div>',
+    "x\t&lt;<&gt;",
+    "x\t& bare ampersand",
+]
+
+
+def test_single_pass_lines():
+    cleaner = MarkupCleaner()
+    for line in SINGLE_PASS_LINES:
+        assert cleaner.single_pass(line) is not None, line
+
+
+def test_fallback_lines():
+    cleaner = MarkupCleaner()
+    for line in FALLBACK_LINES:
+        assert cleaner.single_pass(line) is None, line
+
+
+def test_same_output_as_old_chain():
+    cleaner = MarkupCleaner()
+    for line in SINGLE_PASS_LINES + FALLBACK_LINES:
+        assert cleaner.clean(line) == old_chain(line), line
+    assert cleaner.fallbacks == len(FALLBACK_LINES)
@@ -0,0 +1,46 @@
+import io
+from entries import parse_entries
+from mobi import MobiFile, apply_rule, check_mobi, inflection_rule, write_mobi
+
+LINES = [
+    "walk|walks|walked|walking\tходити",
+    "talk|talks|talked|talking\tговорити",  # Same endings as walk, so the same inflection group
+    "go|went|gone|undergo\tіти",
+    "кіт|коти|котів\tcat",
+    "many|" + "|".join(f"form{number}" for number in range(20)) + "\tбагато",  # More rules than the control byte counts
+    "orphan",  # No definition, so not exported
+    "x" * 300 + "|xs\tдовге",  # Headword too long for the index; its inflection is indexed on its own
+]
+
+
+def entries():
+    return list(parse_entries(io.StringIO("".join(f"{line}\n" for line in LINES))))
+
+
+def test_inflection_rules():
+    for headword, inflection in [("walk", "walked"), ("walks", "walk"), ("go", "went"), ("go", "undergo"), ("кіт", "котів")]:
+        rule = inflection_rule(headword, inflection)
+        assert apply_rule(headword.encode("utf-8"), rule) == inflection.encode("utf-8")
+    assert inflection_rule("walk", "walked") == b"\x02de"  # Inserted bytes are written last first
+    assert inflection_rule("go", "went") == b"\x03og\x02tnew"
+    assert inflection_rule("go", "go\x01") is None
+
+
+def test_write_check_and_lookup(tmp_path):
+    path = tmp_path / "dictionary.mobi"
+    counts = write_mobi(path, entries())
+    assert (counts["articles"], counts["keys"], counts["skipped_keys"]) == (6, 6, 1)
+    assert counts["inflections"] == 3 + 3 + 3 + 2 + 20
+    assert check_mobi(path, entries())["inflections"] == counts["inflections"]
+
+    book = MobiFile(path)
+    index = book.index()[0]
+    assert [key for key, *_ in index] == [b"go", b"many", b"talk", b"walk", b"xs", "кіт".encode("utf-8")]
+    groups = book.inflections()
+    assert index[2][3] == index[3][3] and len(groups) == 4  # walk and talk share a group
+    assert len(groups[index[1][3]]) == 20
+    assert index[4][3] is None
+    for word, meaning in [("went", "іти"), ("undergo", "іти"), ("walking", "ходити"), ("котів", "cat"), ("form19", "багато"), ("xs", "довге")]:
+        articles = book.lookup(word)
+        assert len(articles) == 1 and meaning in articles[0]
+    assert book.lookup("orphan") == book.lookup("walke") == []
@@ -0,0 +1,35 @@
+import gzip
+from entries import Entry
+from stardict import StarDict, check_stardict, stardict_paths, write_stardict
+
+ENTRIES = [
+    Entry(["bebens", "Bebenses"], "<b>bebens</b> слово"),
+    Entry(["Apple"], "яблуко"),
+    Entry(["pear"], ""),  # No definition, so not exported
+    Entry(["Їжак"], "їжак"),
+]
+
+
+def test_lookup_ignores_case(tmp_path):
+    write_stardict(tmp_path, ENTRIES)
+    book = StarDict(tmp_path)
+    for word in ["bebens", "BEBENS", "Bebens", "BEBENSES", "bebenses"]:
+        assert book.lookup(word) == ["<b>bebens</b> слово"]
+    assert book.lookup("APPLE") == book.lookup("apple") == ["яблуко"]
+    assert book.lookup("Їжак") == ["їжак"]
+    assert book.lookup("zzz") == []
+
+
+def test_exact_spelling_comes_first(tmp_path):
+    write_stardict(tmp_path, [Entry(["us"], "ми"), Entry(["US"], "США")])
+    book = StarDict(tmp_path)
+    assert book.lookup("US") == ["США", "ми"]
+    assert book.lookup("us") == ["ми", "США"]
+
+
+def test_files_check_and_decompress(tmp_path):
+    counts = write_stardict(tmp_path, ENTRIES)
+    assert (counts["words"], counts["synonyms"]) == (3, 1)
+    assert check_stardict(tmp_path, ENTRIES)["words"] == 3
+    with gzip.open(stardict_paths(tmp_path)[3]) as file:
+        assert "яблуко".encode("utf-8") in file.read()
@@ -0,0 +1,49 @@
+import os
+import shutil
+import zipfile
+import varcon
+
+VARCON_LINES = [
+    "# A comment",
+    "A Z: realize / B: realise",
+    "A: color / B: colour | usage notes",
+]
+
+
+def make_archive(path):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(varcon.VARCON_MEMBER, "\n".join(VARCON_LINES).encode("latin-1"))
+    return str(path)
+
+
+def cached_files(cache_dir):
+    return sorted(os.listdir(cache_dir))
+
+
+def test_cached_table_is_reused(tmp_path):
+    zip_path, cache_dir = make_archive(tmp_path / "varcon.zip"), str(tmp_path / "cache")
+    table = varcon.cached_table(zip_path, cache_dir)
+    assert sorted(table.variants("realize")) == ["realise"]
+    files = cached_files(cache_dir)
+    assert len(files) == 1
+    assert varcon.pack_table(varcon.cached_table(zip_path, cache_dir)) == varcon.pack_table(table)
+    assert cached_files(cache_dir) == files
+
+
+def test_parser_edit_compiles_the_table_again(tmp_path, monkeypatch):
+    zip_path, cache_dir = make_archive(tmp_path / "varcon.zip"), str(tmp_path / "cache")
+    sources = []
+    for path in varcon.COMPILER_SOURCES:
+        sources.append(str(tmp_path / os.path.basename(path)))
+        shutil.copyfile(path, sources[-1])
+    monkeypatch.setattr(varcon, "COMPILER_SOURCES", sources)
+    varcon.cached_table(zip_path, cache_dir)
+    first = cached_files(cache_dir)
+
+    # A stale table must not be found under the new name, even if TABLE_VERSION is unchanged
+    with open(sources[0], "a", encoding="utf-8") as file:
+        file.write("\n# A change to parse_clusters()\n")
+    varcon.cached_table(zip_path, cache_dir)
+    files = cached_files(cache_dir)
+    assert len(files) == 2 and first[0] in files
+    assert {name.split(".")[0] for name in files} == {varcon.archive_digest(zip_path)}
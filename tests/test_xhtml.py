@@ -0,0 +1,37 @@
+import importlib.util
+import os
+from conftest import ROOT_DIR
+from entries import Entry
+from xhtml import OPF_NAME, plan_shards
+
+SHARD_BYTES = 2000
+
+ENTRIES = [
+    Entry([f"word{number}", f"word{number}s"] if number % 3 else [f"слово{number}"], f"<b>визначення</b> {'ї' * number}")
+    for number in range(60)
+]
+ENTRIES.insert(10, Entry(["orphan"], ""))  # No definition
+
+
+def convert(output_dir, workers):
+    spec = importlib.util.spec_from_file_location("convert_to_xhtml", os.path.join(ROOT_DIR, "scripts", "13.convert-to-xhtml.py"))
+    stage = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(stage)
+    os.makedirs(output_dir)
+    return stage.convert_to_xhtml(ENTRIES, str(output_dir), SHARD_BYTES, workers)
+
+
+def test_pool_writes_the_same_files_as_one_process(tmp_path):
+    serial = convert(tmp_path / "serial", 1)
+    pooled = convert(tmp_path / "pooled", 2)
+    assert len(serial) > 3  # Several shards at this size
+    assert [os.path.basename(path) for path in pooled] == [os.path.basename(path) for path in serial]
+    for name in [os.path.basename(path) for path in serial] + [OPF_NAME]:
+        assert (tmp_path / "pooled" / name).read_bytes() == (tmp_path / "serial" / name).read_bytes(), name
+
+
+def test_planned_sizes_are_the_file_sizes(tmp_path):
+    paths = convert(tmp_path / "serial", 1)
+    plan = list(plan_shards(ENTRIES, str(tmp_path / "serial"), SHARD_BYTES))
+    assert [path for path, _, _ in plan] == paths
+    assert [size for _, _, size in plan] == [os.path.getsize(path) for path in paths]
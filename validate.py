@@ -9,31 +9,65 @@ def count_repeated_occurrences(filename):
         tuple: Number of repeated items, a dictionary of repeated items with their counts,
                and a list of keys with empty second columns.
     """
+    with open(filename, 'r') as file:
+        return count_repeated_occurrences_in_lines(file)
+
+
+def count_repeated_occurrences_in_lines(lines):
+    """
+    Count repeated occurrences of items in the first column and find keys with empty second columns.
+    Args:
+        lines (iterable): Tab-separated dictionary lines.
+    Returns:
+        tuple: Number of repeated items, a dictionary of repeated items with their counts,
+               and a list of keys with empty second columns.
+    """
     repeated_occurrences = {}
     keys_with_empty_second_column = []
 
-    with open(filename, 'r') as file:
-        for line in file:
-            columns = line.strip().split('\t')
-
-            # Process the first column for repeated occurrences
-            if len(columns) > 0:
-                first_column = columns[0].split('|')
-                for item in first_column:
-                    if item in repeated_occurrences:
-                        repeated_occurrences[item] += 1
-                    else:
-                        repeated_occurrences[item] = 1
-
-            # Check if the second column is empty
-            if len(columns) < 2 or not columns[1].strip():
-                keys_with_empty_second_column.extend(columns[0].split('|'))
+    for line in lines:
+        columns = line.strip().split('\t')
+
+        # Process the first column for repeated occurrences
+        if len(columns) > 0:
+            first_column = columns[0].split('|')
+            for item in first_column:
+                if item in repeated_occurrences:
+                    repeated_occurrences[item] += 1
+                else:
+                    repeated_occurrences[item] = 1
+
+        # Check if the second column is empty
+        if len(columns) < 2 or not columns[1].strip():
+            keys_with_empty_second_column.extend(columns[0].split('|'))
 
     # Filter repeated items (count > 1)
     repeated_items = {item: count for item, count in repeated_occurrences.items() if count > 1}
     return len(repeated_items), repeated_items, keys_with_empty_second_column
 
 
+def print_report(num_repeated, repeated_list, empty_second_column_keys):
+    """
+    Print repeated occurrences and keys with empty second columns, if any.
+    Args:
+        num_repeated (int): Number of repeated items.
+        repeated_list (dict): Repeated items with their counts.
+        empty_second_column_keys (list): Keys with empty second columns.
+    """
+    # Display repeated occurrences if any
+    if num_repeated > 0:
+        print(f'Number of repeated occurrences: {num_repeated}')
+        print('Full list of repeated occurrences:')
+        for item, count in repeated_list.items():
+            print(f'{item}: {count}')
+
+    # Display keys with empty second columns if any
+    if empty_second_column_keys:
+        print('\nKeys with empty second column:')
+        for key in empty_second_column_keys:
+            print(key)
+
+
 def main():
     # Check if filename is provided as an argument
     if len(sys.argv) < 2:
@@ -43,20 +77,7 @@ def main():
     filename = sys.argv[1]
 
     try:
-        num_repeated, repeated_list, empty_second_column_keys = count_repeated_occurrences(filename)
-
-        # Display repeated occurrences if any
-        if num_repeated > 0:
-            print(f'Number of repeated occurrences: {num_repeated}')
-            print('Full list of repeated occurrences:')
-            for item, count in repeated_list.items():
-                print(f'{item}: {count}')
-
-        # Display keys with empty second columns if any
-        if empty_second_column_keys:
-            print('\nKeys with empty second column:')
-            for key in empty_second_column_keys:
-                print(key)
+        print_report(*count_repeated_occurrences(filename))
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found.")
     except Exception as e:
@@ -64,4 +85,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()